@@ -1,15 +1,230 @@
 # -*- coding: utf-8 -*-
+'''
+Allowed messages and resources of object for sender.
+
+Results of :py:func:`get_allowed` can be cached by backend set with
+``ALLOWED_CACHE_BACKEND`` setting:
+
+>>> YAWF_CONFIG = {
+...     'ALLOWED_CACHE_BACKEND': 'yawf.allowed.LRUAllowedCache',
+...     'ALLOWED_CACHE_OPTIONS': {'max_size': 10000},
+... }
+
+Cache key consists of workflow id, object pk, object revision, sender and
+active language, so only objects with revision support are cached and
+every transition makes old entries unreachable (they are also dropped on
+:py:data:`yawf.signals.message_handled`). Checkers that depend on other
+data should be marked with :py:func:`yawf.permissions.not_cacheable` or
+supply extra key with :py:func:`yawf.permissions.cache_key`.
+'''
+import hashlib
+import threading
+
+from django.utils.translation import get_language
+
 from yawf import get_workflow_by_instance
+from yawf.config import REVISION_ATTR, ALLOWED_CACHE_BACKEND,\
+        ALLOWED_CACHE_OPTIONS
+from yawf.permissions import BasePermissionChecker
+from yawf.signals import message_handled, bulk_transition_handled
+from yawf.utils import LRUCache
+
+__all__ = ['get_allowed', 'get_allowed_cache', 'get_sender_key',
+           'LRUAllowedCache', 'DjangoAllowedCache']
+
+
+class BaseAllowedCache(object):
+    '''
+    Backend of :py:func:`get_allowed` cache.
+
+    Keys are tuples ``(workflow_id, pk, revision, subkey)``.
+    '''
+
+    def __init__(self):
+        message_handled.connect(self._handle_message)
+        bulk_transition_handled.connect(self._handle_bulk_transition)
+        super(BaseAllowedCache, self).__init__()
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def invalidate(self, workflow_id, pk):
+        '''
+        Drops all entries of object.
+        '''
+        raise NotImplementedError
+
+    def _handle_message(self, sender, **kwargs):
+        self.invalidate(sender, kwargs['instance'].pk)
+
+    def _handle_bulk_transition(self, sender, **kwargs):
+        for pk in kwargs['object_ids']:
+            self.invalidate(sender, pk)
+
+
+class LRUAllowedCache(BaseAllowedCache):
+    '''
+    In-process cache of at most `max_size` objects.
+
+    Only entries of the latest seen revision of object are kept.
+    '''
+
+    def __init__(self, max_size=1000):
+        self._objects = LRUCache(max_size)
+        super(LRUAllowedCache, self).__init__()
+
+    def get(self, key):
+        workflow_id, pk, revision, subkey = key
+        entry = self._objects.get((workflow_id, pk))
+        if entry is None or entry[0] != revision:
+            return None
+        return entry[1].get(subkey)
+
+    def set(self, key, value):
+        workflow_id, pk, revision, subkey = key
+        entry = self._objects.get((workflow_id, pk))
+        if entry is None or entry[0] != revision:
+            entry = (revision, {})
+            self._objects.set((workflow_id, pk), entry)
+        entry[1][subkey] = value
+
+    def invalidate(self, workflow_id, pk):
+        self._objects.delete((workflow_id, pk))
+
+
+class DjangoAllowedCache(BaseAllowedCache):
+    '''
+    Cache backed by django cache `alias`.
+
+    Entries can't be enumerated by object, so :py:meth:`invalidate` relies
+    on revision in the key: entries of old revisions are never read again
+    and expire after `timeout`.
+    '''
+
+    key_prefix = 'yawf:allowed'
 
+    def __init__(self, alias='default', timeout=None):
+        from django.core.cache import get_cache
 
-def get_allowed(sender, obj):
+        self.cache = get_cache(alias)
+        self.timeout = timeout
+        super(DjangoAllowedCache, self).__init__()
+
+    def make_key(self, key):
+        workflow_id, pk, revision, subkey = key
+        return '%s:%s:%s:%s:%s' % (self.key_prefix, workflow_id, pk,
+            revision, hashlib.md5(repr(subkey)).hexdigest())
+
+    def get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def set(self, key, value):
+        self.cache.set(self.make_key(key), value, self.timeout)
+
+    def invalidate(self, workflow_id, pk):
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_allowed_cache():
+    '''
+    Returns cache backend configured with ``ALLOWED_CACHE_BACKEND``
+    setting or None.
+    '''
+    global _cache
+    if _cache is None and ALLOWED_CACHE_BACKEND is not None:
+        from yawf.creation import class_by_dotted_name
+
+        with _cache_lock:
+            if _cache is None:
+                _cache = class_by_dotted_name(ALLOWED_CACHE_BACKEND)(
+                    **ALLOWED_CACHE_OPTIONS)
+    return _cache
+
+
+def get_sender_key(sender):
+    '''
+    Returns hashable key of sender: model instances (and anonymous user)
+    are identified by class name and pk, other senders are used as is.
+    '''
+    for attr in ('pk', 'id'):
+        if hasattr(sender, attr):
+            return (type(sender).__name__, getattr(sender, attr))
+    return sender
+
+
+def get_cache_key(workflow, obj, sender, checkers):
+    '''
+    Returns cache key of :py:func:`get_allowed` result or None if result
+    can't be cached.
+    '''
+    if not getattr(obj, '_has_revision_support', False) or obj.pk is None:
+        return None
+
+    extra = []
+    for checker in _iter_checkers(checkers):
+        if not getattr(checker, 'cacheable', True):
+            return None
+        key_func = getattr(checker, 'cache_key_func', None)
+        if key_func is not None:
+            extra.append((getattr(checker, '__name__', ''),
+                           key_func(obj, sender)))
+
+    subkey = (get_sender_key(sender), get_language(), tuple(sorted(extra)))
+    try:
+        hash(subkey)
+    except TypeError:
+        return None
+
+    return (workflow.id, obj.pk, getattr(obj, REVISION_ATTR), subkey)
+
+
+def _iter_checkers(checkers):
+    for checker in checkers:
+        yield checker
+        if isinstance(checker, BasePermissionChecker):
+            for child in checker.get_atomical_checkers():
+                yield child
+
+
+def get_allowed(sender, obj, cache=None):
+    '''
+    Returns dict with allowed messages and resources of `obj` for
+    `sender`. Result may be shared between calls and shouldn't be
+    modified.
+
+    :param cache:
+        cache backend to use instead of :py:func:`get_allowed_cache`
+    '''
     workflow = get_workflow_by_instance(obj)
 
     obj_state = getattr(obj, workflow.state_attr_name)
+    checkers = workflow.get_checkers_by_state(obj_state)
+
+    if cache is None:
+        cache = get_allowed_cache()
+    if cache is None:
+        return _get_allowed(workflow, sender, obj, obj_state, checkers)
+
+    key = get_cache_key(workflow, obj, sender, checkers)
+    if key is None:
+        return _get_allowed(workflow, sender, obj, obj_state, checkers)
+
+    result = cache.get(key)
+    if result is None:
+        result = _get_allowed(workflow, sender, obj, obj_state, checkers)
+        cache.set(key, result)
+    return result
+
 
-    check_result = dict(
-        (c, c(obj, sender))
-        for c in workflow.get_checkers_by_state(obj_state))
+def _get_allowed(workflow, sender, obj, obj_state, checkers):
+    check_result = dict((c, c(obj, sender)) for c in checkers)
 
     messages = []
     for checker, message in workflow.get_available_messages(obj_state):
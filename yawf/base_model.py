@@ -2,6 +2,8 @@ from django.utils.encoding import force_unicode
 
 from yawf import get_workflow_by_instance
 
+__all__ = ['WorkflowAwareModelBase', 'clarify_instances']
+
 
 class WorkflowAwareModelBase(object):
 
@@ -26,3 +28,37 @@ class WorkflowAwareModelBase(object):
             return self
         else:
             return workflow.model_class.objects.get(id=self.id)
+
+
+def clarify_instances(objects):
+    '''
+    The same as calling ``get_clarified_instance`` of every object, but
+    objects to clarify are fetched with one query per workflow model class.
+
+    :return: list of clarified objects in the same order
+    :raise DoesNotExist: if some objects are gone
+    '''
+    objects = list(objects)
+    to_fetch = {}
+
+    for index, obj in enumerate(objects):
+        if not isinstance(obj, WorkflowAwareModelBase):
+            if hasattr(obj, 'get_clarified_instance'):
+                objects[index] = obj.get_clarified_instance()
+            continue
+        model_class = obj.workflow.model_class
+        if model_class is not obj.__class__:
+            to_fetch.setdefault(model_class, []).append(index)
+
+    for model_class, indexes in to_fetch.iteritems():
+        fetched = model_class.objects.in_bulk(
+            [objects[index].id for index in indexes])
+        for index in indexes:
+            try:
+                objects[index] = fetched[objects[index].id]
+            except KeyError:
+                raise model_class.DoesNotExist(
+                    "%s with id %s does not exist" % (
+                        model_class.__name__, objects[index].id))
+
+    return objects
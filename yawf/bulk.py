@@ -0,0 +1,228 @@
+'''
+Set-based bulk transitions.
+
+>>> bulk_transition(
+...     Ticket.objects.filter(closed_at__lt=year_ago), 'archive', user)
+
+For every source state where the message is handled by a static handler
+(see :py:attr:`yawf.handlers.Handler.static_state_to`) objects are moved
+with chunked ``UPDATE ... SET state=..., revision=revision+1`` instead of
+dispatching message to every object. Message log records are written with
+one bulk insert per chunk and share the same ``group_uuid``.
+:py:data:`yawf.signals.bulk_transition_handled` is sent per chunk instead
+of per-object signals and no revisions of objects are created. Side effects
+of the transition are performed with one
+:py:meth:`yawf.effects.SideEffect.perform_batch` call per chunk (in the
+chunk transaction for transactional effects, after commit for others).
+
+Objects in other states are dispatched one by one, each message is cleaned
+against its object and committed on its own. Objects that fail to handle
+the message (permission denied, validation error, concurrent update, etc.)
+are logged and skipped.
+
+Bulk transition is not atomic: chunks and single dispatches that succeeded
+stay committed if a later one fails with unexpected error.
+'''
+import copy
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from yawf import get_workflow
+from yawf.base_model import clarify_instances
+from yawf.config import WORKFLOW_TYPE_ATTR, REVISION_ATTR,\
+        MESSAGE_LOG_ENABLED
+from yawf.dispatch import dispatch_message
+from yawf.effects import PendingEffects
+from yawf.exceptions import WorkflowNotLoadedError, YawfException
+from yawf.messages import Message
+from yawf.message_log.models import MessageLog, build_log_record
+from yawf.signals import bulk_transition_handled
+from yawf.state_transition import get_effect_kwargs
+from yawf.utils import select_for_update
+
+__all__ = ['bulk_transition']
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_transition(queryset, message_id, sender, raw_params=None,
+        chunk_size=500):
+    '''
+    Sends message to every object of `queryset`.
+
+    Objects in states where message is not handled at all are left
+    untouched, objects that failed to handle the message are skipped.
+
+    :return: number of objects that have handled the message
+    '''
+    model = queryset.model
+    count = 0
+
+    for workflow, workflow_queryset in _split_by_workflow(queryset):
+        spec = workflow.get_message_spec(message_id)
+        message = Message(sender, spec.id, raw_params)
+
+        states = workflow_queryset\
+            .order_by()\
+            .values_list(workflow.state_attr_name, flat=True)\
+            .distinct()
+
+        for state in list(states):
+            state_queryset = workflow_queryset.filter(
+                **{workflow.state_attr_name: state})
+
+            if not workflow.library.get_handlers(state, message.id,
+                                                 safe=True):
+                continue
+
+            state_to = _get_bulk_state_to(workflow, state, spec)
+            if state_to is None:
+                count += _dispatch_each(state_queryset, message)
+                continue
+
+            if message.params is None:
+                # UPDATE doesn't depend on object, so message is cleaned
+                # only once and without object
+                message.clean(workflow, None)
+
+            ids = list(state_queryset.values_list('pk', flat=True))
+            for start in xrange(0, len(ids), chunk_size):
+                count += _update_chunk(workflow, model, message,
+                    ids[start:start + chunk_size], state, state_to)
+
+    return count
+
+
+def _split_by_workflow(queryset):
+    model = queryset.model
+    field_names = set(f.name for f in model._meta.fields)
+
+    if WORKFLOW_TYPE_ATTR in field_names:
+        workflow_ids = list(queryset
+            .order_by()
+            .values_list(WORKFLOW_TYPE_ATTR, flat=True)
+            .distinct())
+        querysets = (queryset.filter(**{WORKFLOW_TYPE_ATTR: workflow_id})
+            for workflow_id in workflow_ids)
+    else:
+        workflow_ids = [getattr(model, WORKFLOW_TYPE_ATTR)]
+        querysets = [queryset]
+
+    for workflow_id, workflow_queryset in zip(workflow_ids, querysets):
+        workflow = get_workflow(workflow_id)
+        if workflow is None:
+            raise WorkflowNotLoadedError(workflow_id)
+        yield workflow, workflow_queryset
+
+
+def _get_bulk_state_to(workflow, state, spec):
+    '''
+    Returns target state if objects in `state` can be moved with single
+    UPDATE, or None.
+    '''
+    library = workflow.library
+
+    state_to = library.get_static_transition(state, spec.id)
+    if state_to is None or not workflow.is_valid_state(state_to):
+        return None
+
+    # dehydrated params depend on object
+    if not spec.skip_dehydration:
+        return None
+
+    return state_to
+
+
+def _dispatch_each(queryset, message):
+    count = 0
+    for obj in clarify_instances(queryset):
+        # cleaned against every object, validators may depend on it
+        obj_message = Message(message.sender, message.id,
+            raw_params=message.raw_params,
+            message_group=message.message_group)
+        try:
+            dispatch_message(obj, obj_message)
+        except YawfException as e:
+            logger.info(u"Bulk message %s skipped object %s: %r",
+                message.id, obj.pk, e)
+            continue
+        count += 1
+    return count
+
+
+def _update_chunk(workflow, model, message, ids, state, state_to):
+    updates = {workflow.state_attr_name: state_to}
+    has_revision = getattr(model, '_has_revision_support', False)
+    if has_revision:
+        updates[REVISION_ATTR] = F(REVISION_ATTR) + 1
+
+    transactional_effects, deferrable_effects = workflow.library\
+        .get_effects_for_transition(state, state_to, message.id)
+    need_objects = bool(transactional_effects or deferrable_effects)
+
+    with transaction.commit_on_success():
+        # state could be changed since ids were fetched
+        queryset = select_for_update(model.objects
+            .filter(pk__in=ids, **{workflow.state_attr_name: state}))
+        if need_objects:
+            old_objs = list(queryset)
+            ids = [obj.pk for obj in old_objs]
+        else:
+            ids = list(queryset.values_list('pk', flat=True))
+        if not ids:
+            return 0
+
+        model.objects.filter(pk__in=ids).update(**updates)
+
+        if MESSAGE_LOG_ENABLED:
+            MessageLog.objects.bulk_create(
+                list(_build_log_records(workflow, model, message, ids)))
+
+        bulk_transition_handled.send(
+            sender=workflow.id,
+            workflow=workflow,
+            message=message,
+            model_class=model,
+            object_ids=ids,
+            state_from=state,
+            state_to=state_to)
+
+        if need_objects:
+            contexts = []
+            for old_obj in old_objs:
+                new_obj = copy.copy(old_obj)
+                setattr(new_obj, workflow.state_attr_name, state_to)
+                if has_revision:
+                    setattr(new_obj, REVISION_ATTR,
+                        getattr(old_obj, REVISION_ATTR) + 1)
+                contexts.append(get_effect_kwargs(old_obj, new_obj, message,
+                    handler_result=new_obj))
+
+            if transactional_effects:
+                PendingEffects(
+                    ((effect, kwargs) for effect in transactional_effects
+                     for kwargs in contexts),
+                    message_group=message.message_group)(concurrent=False)
+
+    if need_objects and deferrable_effects:
+        PendingEffects.from_plan(
+            workflow.library.get_effect_plan(state, state_to, message.id),
+            contexts, message_group=message.message_group)()
+
+    logger.debug(u"Bulk transition %s of %d objects: %s -> %s",
+        message.id, len(ids), state, state_to)
+    return len(ids)
+
+
+def _build_log_records(workflow, model, message, ids):
+    for pk in ids:
+        obj_message = copy.copy(message)
+        # every object gets it's own message uuid, group is shared
+        obj_message._unique_id = None
+        yield build_log_record(workflow.id,
+            message=obj_message,
+            # unsaved stub is enough for generic foreign key
+            new_instance=model(pk=pk),
+            transition_result=None)
@@ -0,0 +1,80 @@
+'''
+Process pool for CPU-heavy compute steps of handlers and effects.
+
+Handler (or effect) declares ``compute`` -- a pure module-level function
+with picklable arguments and result -- and ``get_compute_args`` method
+that extracts arguments from object and message. Compute step of handler
+runs before object is locked. Effects with compute step are always
+performed after the transaction of the transition is committed (even
+with ``TRANSACTIONAL_SIDE_EFFECT``), transactional effects can't have it.
+Result of compute step is passed to handler (effect) as ``computed``
+keyword argument, so message params can't be named so:
+
+>>> def calculate_price(items, discount):
+...     return sum(price for _, price in items) * (1 - discount)
+...
+>>> class Checkout(ComplexStateTransition):
+...     message_id = 'checkout'
+...     compute = staticmethod(calculate_price)
+...
+...     def get_compute_args(self, obj, sender, discount):
+...         return (list(obj.items.values_list('id', 'price')), discount)
+...
+...     def transition(self, obj, sender, computed, **kwargs):
+...         obj.total = computed
+...         obj.save()
+
+So the lock is held only for writing the result.
+
+By default compute steps run inline in the calling process. Set
+``COMPUTE_POOL_SIZE`` setting to the number of processes (None for the
+number of CPUs) to run them in a process pool. Pool forks the process, so
+it's better created at startup, before any threads and database
+connections are opened, by calling :py:func:`get_compute_pool` (e.g. in
+wsgi module).
+'''
+import multiprocessing
+import threading
+
+from yawf.config import COMPUTE_POOL_SIZE
+
+__all__ = ['run_compute', 'run_compute_many', 'get_compute_pool']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_compute_pool():
+    '''
+    Returns process pool of ``COMPUTE_POOL_SIZE`` processes, creating it
+    on first call.
+    '''
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = multiprocessing.Pool(COMPUTE_POOL_SIZE)
+    return _pool
+
+
+def run_compute(func, args):
+    '''
+    Runs ``func(*args)`` in compute pool and returns result.
+    '''
+    return run_compute_many(func, [args])[0]
+
+
+def run_compute_many(func, args_list):
+    '''
+    Runs ``func(*args)`` for each args in `args_list` in compute pool and
+    returns list of results.
+    '''
+    # function assigned in class body becomes a method
+    func = getattr(func, 'im_func', func)
+
+    if COMPUTE_POOL_SIZE == 0:
+        return [func(*args) for args in args_list]
+
+    results = [get_compute_pool().apply_async(func, tuple(args))
+               for args in args_list]
+    return [result.get() for result in results]
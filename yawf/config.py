@@ -10,6 +10,22 @@ DEFAULT_CONFIG = {
     'MESSAGE_LOG_ENABLED': False,
     'TRANSACTIONAL_SIDE_EFFECT': True,
     'USE_SELECT_FOR_UPDATE': True,
+    # number of threads to perform independent deferred effects after
+    # commit, 1 means that effects are performed one by one in the calling
+    # thread (as they always are inside transaction of the transition)
+    'EFFECTS_POOL_SIZE': 1,
+    # number of threads used by yawf.executor.adispatch
+    'DISPATCH_POOL_SIZE': 4,
+    # number of processes to run compute steps of handlers and effects,
+    # 0 -- run in calling process, None means number of CPUs
+    'COMPUTE_POOL_SIZE': 0,
+    # dotted name of yawf.allowed cache backend class (e.g.
+    # 'yawf.allowed.LRUAllowedCache'), None disables caching
+    'ALLOWED_CACHE_BACKEND': None,
+    # keyword arguments for cache backend class
+    'ALLOWED_CACHE_OPTIONS': {},
+    # directory to keep rendered workflow graphs in, shared by processes
+    'GRAPH_CACHE_DIR': None,
     'REVISION_BACKEND':
         'yawf.revision.backends.reversion.ReversionRevisionManager',
 }
@@ -71,9 +71,18 @@ def start_workflow(obj, sender, start_message_params=None):
                                                 start_message_params)
 
 
+# form classes are built and imported once, see form_for_model and
+# class_by_dotted_name
+_model_forms = {}
+_classes_by_dotted_name = {}
+
+
 def form_for_model(model_cls):
-    from django.forms.models import modelform_factory
-    return modelform_factory(model_cls)
+    form_cls = _model_forms.get(model_cls)
+    if form_cls is None:
+        from django.forms.models import modelform_factory
+        form_cls = _model_forms[model_cls] = modelform_factory(model_cls)
+    return form_cls
 
 
 class InvalidDottedNameError(ValueError):
@@ -81,6 +90,10 @@ class InvalidDottedNameError(ValueError):
 
 
 def class_by_dotted_name(dotted_name):
+    cls = _classes_by_dotted_name.get(dotted_name)
+    if cls is not None:
+        return cls
+
     from django.utils import importlib
     try:
         # Trying to import the given backend, in case it's a dotted path
@@ -90,4 +103,5 @@ def class_by_dotted_name(dotted_name):
     except (AttributeError, ImportError, ValueError):
         raise InvalidDottedNameError("Could not find class '%s'" % dotted_name)
     else:
+        _classes_by_dotted_name[dotted_name] = cls
         return cls
@@ -0,0 +1,132 @@
+'''
+Precomputed description of workflow for introspection tools.
+
+Description is built from library indexes once per library version (and
+active language, as verbose names may be translated):
+
+>>> description = get_description(workflow)
+>>> [state['id'] for state in description.data['states']]
+['init', 'normal', 'closed']
+
+``description.json`` is the serialized data and ``description.etag`` is
+its digest to answer conditional requests.
+'''
+import hashlib
+from collections import namedtuple
+
+from django.utils.encoding import force_unicode
+from django.utils.translation import get_language
+
+from yawf.serialize_utils import dumps
+from yawf.utils import LRUCache
+
+__all__ = ['get_description', 'build_description', 'WorkflowDescription']
+
+WorkflowDescription = namedtuple('WorkflowDescription', 'data json etag')
+
+_cache = LRUCache(100)
+
+
+def get_description(workflow):
+    '''
+    Returns cached :py:class:`WorkflowDescription` of `workflow`.
+    '''
+    key = (workflow.id, workflow.library.version, get_language())
+    description = _cache.get(key)
+    if description is None:
+        data = build_description(workflow)
+        content = dumps(data, sort_keys=True)
+        description = WorkflowDescription(data, content,
+            hashlib.md5(content).hexdigest())
+        _cache.set(key, description)
+    return description
+
+
+def build_description(workflow):
+    library = workflow.library
+    verbose_state_names = workflow.verbose_state_names or {}
+
+    model_class = getattr(workflow, 'model_class', None)
+    if model_class is not None:
+        model = '%s.%s' % (model_class._meta.app_label,
+                           model_class._meta.object_name)
+    else:
+        model = None
+
+    states = []
+    for state in sorted(workflow._valid_states):
+        verbose_name = verbose_state_names.get(state)
+        states.append({
+            'id': state,
+            'verbose_name': force_unicode(verbose_name)
+                if verbose_name is not None else None,
+            'messages': sorted(set(
+                message_id for _checker, message_id
+                in library.get_available_messages(state))),
+        })
+
+    messages = []
+    for message_id, spec in sorted(library.get_message_specs().iteritems()):
+        messages.append({
+            'id': message_id,
+            'verb': force_unicode(spec.verb)
+                if spec.verb is not None else None,
+            'title': force_unicode(spec),
+            'rank': spec.rank,
+            'group_path': spec.group_path,
+            'states_from': sorted(
+                library.get_handlers_index_for_message(message_id).keys()),
+        })
+
+    handlers = []
+    for (state_from, message_id), state_handlers in sorted(
+            library.iter_handlers()):
+        for handler in state_handlers:
+            handlers.append({
+                'state_from': state_from,
+                'message_id': message_id,
+                'handler': type(handler).__name__,
+                'state_to': getattr(handler, 'state_to', None),
+                'states_to': getattr(handler, 'states_to', None),
+            })
+
+    effects = []
+    for (state_from, state_to, message_id), transition_effects in sorted(
+            library.iter_effects()):
+        effects.append({
+            'state_from': state_from,
+            'state_to': state_to,
+            'message_id': message_id,
+            'effects': [{
+                    'name': effect.name,
+                    'transactional': effect.is_transactional,
+                    'depends_on': list(effect.depends_on),
+                } for effect in transition_effects],
+        })
+
+    resources = []
+    for resource_id, resource in sorted(library._resources.iteritems()):
+        resources.append({
+            'id': resource_id,
+            'slug': resource.slug,
+            'description': force_unicode(resource.description)
+                if resource.description is not None else None,
+            'states': sorted(
+                state for state, state_resources
+                in library._resources_by_state.iteritems()
+                if resource_id in state_resources),
+        })
+
+    return {
+        'id': workflow.id,
+        'verbose_name': force_unicode(workflow.verbose_name)
+            if workflow.verbose_name is not None else None,
+        'version': library.version,
+        'model': model,
+        'initial_state': workflow.initial_state,
+        'states': states,
+        'messages': messages,
+        'handlers': handlers,
+        'effects': effects,
+        'resources': resources,
+    }
@@ -1,22 +1,27 @@
 # -*- coding: utf-8 -*-
 import logging
 import copy
+import time
 from itertools import ifilter
+from contextlib import contextmanager
 
+from django.db import transaction
 from django.utils.encoding import smart_unicode
 
-from yawf.message_log.models import log_message
-
 from yawf.config import STATE_TYPE_CONSTRAINT,\
          TRANSACTIONAL_SIDE_EFFECT, USE_SELECT_FOR_UPDATE, MESSAGE_LOG_ENABLED
 from yawf.exceptions import IllegalStateError,\
          WrongHandlerResultError, PermissionDeniedError,\
          MessageIgnored
-from yawf.signals import message_handled
+from yawf.signals import message_handled, message_retried
 from yawf import get_workflow_by_instance
 from yawf.messages import Message
-from yawf.state_transition import transition, transactional_transition
-from yawf.revision import default_revision_manager
+from yawf.state_transition import transition, transactional_transition,\
+         predict_transition, lock_object
+from yawf.store import default_store, SessionStore
+from yawf.revision.backends.dummy import DummyRevisionManager
+from yawf.effects import perform_pending
+from yawf.compute import run_compute
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +55,86 @@ class Dispatcher(object):
         self.obj = new_obj
         return new_obj, handler_result, effects_result
 
+    @contextmanager
+    def session(self):
+        '''
+        Context manager to pass several messages to the object under a
+        single lock and transaction.
+
+        Example:
+
+        >>> with Dispatcher(obj, user).session() as d:
+        ...     d.edit(foo='bar')
+        ...     d.submit()
+        >>> d.results
+
+        Object is locked once on enter and every message is applied to the
+        locked instance. Message log records are written with one bulk
+        insert before commit. Side effects of all messages are deferred
+        until commit, so inside the block dispatching returns None instead
+        of side effect results; ``results`` attribute of session holds
+        ``(new_obj, handler_result, effect_result)`` for each message after
+        the block.
+
+        If exception is raised inside the block, all changes are rolled
+        back and no side effects are performed.
+
+        Log records passed to :py:data:`yawf.signals.message_handled`
+        receivers inside the block are not saved yet (and have no pk):
+        they are written on exit from the block.
+        '''
+        workflow = get_workflow_by_instance(self.obj)
+        revision_manager = self.options.get('revision_manager')
+        if revision_manager is None:
+            revision_manager = default_store.revision_manager
+
+        with transaction.commit_on_success():
+            with revision_manager() as revision_context:
+                locked_obj = lock_object(workflow, self.obj)
+                session = DispatcherSession(locked_obj, self.sender,
+                    store=SessionStore(workflow, locked_obj),
+                    extra_context=self.options.get('extra_context'))
+                yield session
+                session.store.flush(revision_context)
+
+        self.obj = session.obj
+        session.perform_side_effects()
+
+
+class DispatcherSession(Dispatcher):
+    '''
+    Dispatcher bound to a locked object, see :py:meth:`Dispatcher.session`.
+    '''
+
+    def __init__(self, obj, sender, store, extra_context=None):
+        super(DispatcherSession, self).__init__(obj, sender,
+            extra_context=extra_context)
+        self.store = store
+        self.results = []
+
+    def _dispatch(self, message_id, **raw_params):
+        return self.dispatch_message(
+            Message(self.sender, message_id, raw_params))
+
+    def dispatch_message(self, message):
+        new_obj, handler_result, side_effect_performer = dispatch_message(
+            self.obj, message,
+            extra_context=self.options['extra_context'],
+            need_lock_object=True,
+            defer_side_effect=True,
+            revision_manager=DummyRevisionManager,
+            store=self.store)
+        self.obj = new_obj
+        self.results.append([new_obj, handler_result, side_effect_performer])
+        return new_obj, handler_result, None
+
+    def perform_side_effects(self):
+        # invocations of the same effect are batched across messages
+        effect_results = perform_pending(
+            [performer for _, _, performer in self.results])
+        for result, effect_result in zip(self.results, effect_results):
+            result[2] = effect_result
+
 
 def dispatch(obj, sender, message_id, raw_params=None,
              **dispatch_options):
@@ -62,6 +147,18 @@ def dispatch(obj, sender, message_id, raw_params=None,
     return dispatch_message(obj, message, **dispatch_options)
 
 
+def predict(obj, sender, message_id, raw_params=None,
+            **dispatch_options):
+    '''
+    Shortcut to find out what will happen if message is dispatched,
+    without performing anything.
+
+    See `dry_run` parameter of :py:func:`dispatch_message`.
+    '''
+    message = Message(sender, message_id, raw_params)
+    return dispatch_message(obj, message, dry_run=True, **dispatch_options)
+
+
 def dispatch_no_clean(obj, sender, message_id, params=None,
                       **dispatch_options):
     message = Message(sender, message_id, clean_params=params)
@@ -73,7 +170,10 @@ def dispatch_message(obj, message,
                      transactional_side_effect=TRANSACTIONAL_SIDE_EFFECT,
                      need_lock_object=USE_SELECT_FOR_UPDATE,
                      defer_side_effect=False,
-                     revision_manager=None):
+                     revision_manager=None,
+                     store=None,
+                     dry_run=False,
+                     retry_policy=None):
     '''
     Gets an object and message and performs all actions specified by
     object's workflow.
@@ -83,16 +183,33 @@ def dispatch_message(obj, message,
         :py:class:`yawf.base_model.WorkflowAwareModelBase`
     :param message:
         :py:class:`yawf.messages.Message` instance that incapsulates message sender and parameters
+    :param store:
+        :py:class:`yawf.store.BaseStore` instance to fetch, lock and save
+        objects and to write message log. Pass
+        :py:class:`yawf.store.memory.InMemoryStore` to simulate workflow
+        without a database.
+    :param dry_run:
+        If True, message is cleaned and handled against a detached copy of
+        object with saving disabled. Nothing is locked, logged or written,
+        no signals are sent and no side effects are performed. See
+        :py:func:`yawf.state_transition.predict_transition`.
+    :param retry_policy:
+        :py:class:`yawf.retry.RetryPolicy` instance. If given, transition
+        that failed because object was changed concurrently is repeated
+        with fresh object (and the same cleaned message) according to the
+        policy.
 
     :return:
         Tuple of three values:
          * new object instance (after state transition)
          * transition result (returned by handler object)
-         * side effects results
+         * side effects results (tuple of transactional and deferrable
+           effect lists for the transition in case of `dry_run`)
     '''
-    logger.debug(u"Backend got message from %s to %s: %s %s",
-            smart_unicode(message.sender), smart_unicode(obj),
-            message.id, smart_unicode(message.raw_params))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(u"Backend got message from %s to %s: %s %s",
+                smart_unicode(message.sender), smart_unicode(obj),
+                message.id, smart_unicode(message.raw_params))
 
     # can raise WorkflowNotLoadedError
     workflow = get_workflow_by_instance(obj)
@@ -100,14 +217,116 @@ def dispatch_message(obj, message,
     # validate data and filter out trash
     message.clean(workflow, obj)
 
-    # dehydrate message params for serializing
-    message.dehydrate_params(workflow, obj)
+    if dry_run:
+        state_transition = get_state_transition(workflow, message, obj)
+        return predict_transition(workflow, obj, message, state_transition)
+
+    # dehydrate message params for serializing, before object is changed;
+    # without message log nothing may need them, so they are computed on
+    # first access
+    message.dehydrate_params(workflow, obj, lazy=not MESSAGE_LOG_ENABLED)
 
+    state_transition = get_state_transition(workflow, message, obj)
+
+    if defer_side_effect:
+        transition_ = transactional_transition
+        transactional_side_effect = False
+    else:
+        transition_ = transition
+
+    if store is None:
+        store = default_store
+
+    if revision_manager is None:
+        revision_manager = store.revision_manager
+
+    retry_on = retry_policy.retry_on if retry_policy is not None else ()
+    attempt = 1
+    started_at = time.time()
+
+    while True:
+        try:
+            with revision_manager() as m:
+                new_obj, transition_result, side_effect_result =\
+                    transition_(
+                        workflow, obj, message, state_transition,
+                        extra_context=extra_context,
+                        transactional_side_effect=transactional_side_effect,
+                        need_lock_object=need_lock_object,
+                        store=store)
+
+                if MESSAGE_LOG_ENABLED:
+                    log_record = store.log_message(
+                        sender=workflow.id,
+                        workflow=workflow,
+                        message=message,
+                        instance=obj,
+                        new_instance=new_obj,
+                        transition_result=transition_result)
+
+                    m.bind_revision(log_record)
+                else:
+                    log_record = None
+        except retry_on as e:
+            if not retry_policy.can_retry(attempt, started_at):
+                raise
+
+            logger.info(u"Retrying message %s to object %s after %r",
+                    message.id, obj.id, e)
+            message_retried.send(
+                    sender=workflow.id,
+                    workflow=workflow,
+                    message=message,
+                    instance=obj,
+                    attempt=attempt,
+                    exception=e)
+
+            retry_policy.wait(attempt, started_at)
+
+            # message is already cleaned, but handler must be chosen again
+            # according to the fresh state of object
+            obj = store.refresh(workflow, obj)
+            message.dehydrate_params(workflow, obj,
+                lazy=not MESSAGE_LOG_ENABLED)
+            state_transition = get_state_transition(workflow, message, obj)
+            attempt += 1
+        else:
+            break
+
+    # TODO: send_robust + logging?
+    message_handled.send(
+            sender=workflow.id,
+            workflow=workflow,
+            message=message,
+            instance=obj,
+            new_instance=new_obj,
+            transition_result=transition_result,
+            side_effect_result=side_effect_result,
+            log_record=log_record,
+            retries=attempt - 1)
+
+    return new_obj, transition_result, side_effect_result
+
+
+def get_state_transition(workflow, message, obj):
+    '''
+    Finds a handler for cleaned message and returns callable that performs
+    all changes of object state.
+    '''
     # find a transition handler, can raise handler-related errors
     handler = get_handler(workflow, message, obj)
 
+    params = message.params
+    if handler.compute is not None:
+        if 'computed' in params:
+            raise ValueError("Message param 'computed' is reserved for "
+                             "result of compute step")
+        # heavy computation is done before object is locked
+        params = dict(params, computed=run_compute(handler.compute,
+            handler.get_compute_args(obj, message.sender, **params)))
+
     # fetch a transition, can raise app-specific handler errors
-    handler_result = apply(handler, (obj, message.sender), message.params)
+    handler_result = apply(handler, (obj, message.sender), params)
 
     # if handler returns None - do nothing
     if handler_result is None:
@@ -129,48 +348,7 @@ def dispatch_message(obj, message,
     else:
         raise WrongHandlerResultError(handler_result)
 
-    if defer_side_effect:
-        transition_ = transactional_transition
-        transactional_side_effect = False
-    else:
-        transition_ = transition
-
-    if revision_manager is None:
-        revision_manager = default_revision_manager
-
-    with revision_manager() as m:
-        new_obj, transition_result, side_effect_result =\
-            transition_(
-                workflow, obj, message, state_transition,
-                extra_context=extra_context,
-                transactional_side_effect=transactional_side_effect,
-                need_lock_object=need_lock_object)
-
-        if MESSAGE_LOG_ENABLED:
-            log_record = log_message(
-                sender=workflow.id,
-                workflow=workflow,
-                message=message,
-                instance=obj,
-                new_instance=new_obj,
-                transition_result=transition_result)
-
-            m.bind_revision(log_record)
-        else:
-            log_record = None
-
-    # TODO: send_robust + logging?
-    message_handled.send(
-            sender=workflow.id,
-            workflow=workflow,
-            message=message,
-            instance=obj,
-            new_instance=new_obj,
-            transition_result=transition_result,
-            side_effect_result=side_effect_result,
-            log_record=log_record)
-
-    return new_obj, transition_result, side_effect_result
+    return state_transition
 
 
 def get_handler(workflow, message, obj):
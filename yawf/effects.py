@@ -1,6 +1,17 @@
 import collections
+import inspect
+import threading
+from types import GeneratorType
 
-__all__ = ['SideEffect']
+from yawf.config import EFFECTS_POOL_SIZE
+from yawf.compute import run_compute, run_compute_many
+from yawf.exceptions import EffectDependencyCycleError
+
+__all__ = ['SideEffect', 'PendingEffects', 'perform_pending',
+           'get_effect_levels']
+
+_pool = None
+_pool_lock = threading.Lock()
 
 
 class SideEffect(object):
@@ -34,6 +45,16 @@ class SideEffect(object):
       * `extra_context`: extra context thas was passed to
             :py:func:`yawf.dispatch.dispatch`;
       * `handler_result`: result of the state transition routine.
+
+    Deferred effects of a transition are performed in order of their
+    dependencies (``depends_on``, names of other effects; effects
+    registered from functions are named after the function), independent
+    effects are performed concurrently after commit if
+    ``EFFECTS_POOL_SIZE`` setting is greater than one.
+
+    Deferred effects of several transitions (submessages, messages of a
+    dispatcher session, bulk transitions) are performed together, so that
+    effect overriding :py:meth:`perform_batch` gets all of them at once.
     '''
 
     message_id = None
@@ -41,11 +62,25 @@ class SideEffect(object):
     states_from = None
     states_to = None
     is_transactional = False
+    # function with the same arguments as ``perform`` that returns
+    # deduplication key (or None), e.g.
+    # ``dedupe_key = lambda obj, **kwargs: obj.parent_id`` (or a method
+    # taking ``self``). Within one message group effect is performed only
+    # once per key.
+    dedupe_key = None
+    # names of effects that must be performed before this one
+    depends_on = ()
+    # pure module-level function to run in process pool, see yawf.compute
+    compute = None
 
     def __init__(self, message_id=None,
             states_from=None, states_to=None,
-            message_group=None):
+            message_group=None, depends_on=None, dedupe_key=None):
 
+        if depends_on is not None:
+            self.depends_on = depends_on
+        if dedupe_key is not None:
+            self.dedupe_key = dedupe_key
         if message_id is not None:
             self.message_id = message_id
         if message_group is not None:
@@ -63,17 +98,281 @@ class SideEffect(object):
             else:
                 assert isinstance(message_group, collections.Iterable)
 
+        # function assigned in class body becomes a method, but may not
+        # take self
+        func = getattr(self.dedupe_key, 'im_func', None)
+        if func is not None and inspect.getargspec(func).args[:1] != ['self']:
+            self.dedupe_key = func
+
         super(SideEffect, self).__init__()
 
     def perform(self, **kwargs):
         return kwargs
 
+    def perform_batch(self, contexts):
+        '''
+        Performs effect for several transitions at once.
+
+        `contexts` is a list of keyword arguments dicts (the same as passed
+        to :py:meth:`perform`), result must be a list of results in the
+        same order. By default :py:meth:`perform` is called for each
+        context, override to make one call for a batch (e.g. one request to
+        search index).
+        '''
+        if self.compute is not None:
+            computed = run_compute_many(self.compute,
+                [self.get_compute_args(**kwargs) for kwargs in contexts])
+            return [self.perform(computed=result, **kwargs)
+                    for kwargs, result in zip(contexts, computed)]
+        return [self(**kwargs) for kwargs in contexts]
+
+    def get_compute_args(self, **kwargs):
+        '''
+        Returns tuple of picklable arguments for ``compute``, message params
+        dict by default.
+        '''
+        return (kwargs['params'],)
+
+    def get_dedupe_key(self, kwargs):
+        if self.dedupe_key is None:
+            return None
+        return self.dedupe_key(**kwargs)
+
     def set_performer(self, performer):
         self.perform = lambda **kwargs: performer(**kwargs)
+        self._name = performer.__name__
 
     def __call__(self, **kwargs):
+        if self.compute is not None:
+            kwargs['computed'] = run_compute(self.compute,
+                self.get_compute_args(**kwargs))
         return self.perform(**kwargs)
 
     @property
     def name(self):
-        return self.__class__.__name__
+        return getattr(self, '_name', self.__class__.__name__)
+
+
+class PendingEffects(object):
+    '''
+    Deferred side effects of a transition.
+
+    Holds effect invocations of the transition and pending effects of its
+    submessages. Calling the object performs all of them (see
+    :py:func:`perform_pending`) and returns the list of results:
+    ``performed`` results, then results of own effects, then one list
+    for each child.
+    '''
+
+    def __init__(self, invocations=(), children=(), performed=(),
+            message_group=None, levels=None):
+        # list of (effect, kwargs) pairs
+        self.invocations = list(invocations)
+        # dependency level of each invocation, see get_effect_levels
+        self.levels = list(levels) if levels is not None\
+            else [0] * len(self.invocations)
+        # effects with the same dedupe key are performed once per group
+        self.message_group = message_group
+        # PendingEffects instances or arbitrary callables
+        self.children = list(children)
+        self.performed = list(performed)
+        self.results = None
+        super(PendingEffects, self).__init__()
+
+    @property
+    def is_done(self):
+        return self.results is not None
+
+    @property
+    def has_compute(self):
+        '''
+        True if any of effects (including children) has compute step.
+        '''
+        return any(effect.compute is not None for effect, _kwargs in self)
+
+    def __iter__(self):
+        '''
+        Iterates over all (effect, kwargs) pairs, including children.
+        '''
+        for invocation in self.invocations:
+            yield invocation
+        for child in self.children:
+            if isinstance(child, PendingEffects):
+                for invocation in child:
+                    yield invocation
+
+    def __call__(self, concurrent=True):
+        if not self.is_done:
+            perform_pending([self], concurrent=concurrent)
+        return self.results
+
+    @classmethod
+    def from_plan(cls, plan, contexts, **kwargs):
+        '''
+        Creates pending effects for every context from effects plan (see
+        :py:meth:`yawf.library.Library.get_effect_plan`).
+        '''
+        invocations = []
+        levels = []
+        for level, effects in plan:
+            for effect in effects:
+                for context in contexts:
+                    invocations.append((effect, context))
+                    levels.append(level)
+        return cls(invocations, levels=levels, **kwargs)
+
+
+def perform_pending(pending_list, concurrent=True):
+    '''
+    Performs several :py:class:`PendingEffects` at once.
+
+    Invocations of the same effect from all transitions (including
+    submessages) are grouped and passed to
+    :py:meth:`SideEffect.perform_batch` with a single call, results are
+    mapped back to each transition.
+
+    Effects are performed level by level of their dependencies, groups of
+    the same level are independent and are performed concurrently on a
+    thread pool if ``EFFECTS_POOL_SIZE`` setting is greater than one and
+    `concurrent` is True. Pool threads have their own database
+    connections, so pass ``concurrent=False`` when effects are performed
+    inside transaction of the transition: they must see its uncommitted
+    changes and must not wait for rows it locked.
+
+    Invocations of effect with :py:attr:`SideEffect.dedupe_key` within one
+    message group are performed only once per key, the others get the
+    same result.
+
+    :return: list of results of each pending effects object
+    '''
+    groups = collections.OrderedDict()
+    slots = {}
+
+    def collect(pending):
+        if id(pending) in slots:
+            return
+        slots[id(pending)] = [None] * len(pending.invocations)
+        for index, (effect, kwargs) in enumerate(pending.invocations):
+            group = groups.setdefault(effect, {'level': 0, 'calls': []})
+            group['level'] = max(group['level'], pending.levels[index])
+            group['calls'].append((pending, index, kwargs))
+        for child in pending.children:
+            if isinstance(child, PendingEffects) and not child.is_done:
+                collect(child)
+
+    for pending in pending_list:
+        if not pending.is_done:
+            collect(pending)
+
+    levels = collections.defaultdict(list)
+    for effect, group in groups.iteritems():
+        levels[group['level']].append((effect, group['calls']))
+
+    for level in sorted(levels):
+        level_groups = levels[level]
+        if concurrent and EFFECTS_POOL_SIZE > 1 and len(level_groups) > 1:
+            pool = _get_pool()
+            async_results = [
+                pool.apply_async(_perform_group, group)
+                for group in level_groups]
+            results = [async_result.get() for async_result in async_results]
+        else:
+            results = [_perform_group(*group) for group in level_groups]
+
+        for (_effect, calls), (group_results, positions) in zip(
+                level_groups, results):
+            for (pending, index, _), position in zip(calls, positions):
+                slots[id(pending)][index] = group_results[position]
+
+    def finish(pending):
+        child_results = []
+        for child in pending.children:
+            if isinstance(child, PendingEffects):
+                if not child.is_done:
+                    finish(child)
+                child_results.append(child.results)
+            else:
+                child_results.append(child())
+        pending.results = (pending.performed + slots[id(pending)] +
+                           child_results)
+
+    for pending in pending_list:
+        if not pending.is_done:
+            finish(pending)
+
+    return [pending.results for pending in pending_list]
+
+
+def _perform_group(effect, calls):
+    contexts = []
+    # position of every invocation result in contexts
+    positions = []
+    seen = {}
+    for pending, _index, kwargs in calls:
+        key = effect.get_dedupe_key(kwargs)
+        if key is not None:
+            key = (pending.message_group, key)
+            if key in seen:
+                positions.append(seen[key])
+                continue
+            seen[key] = len(contexts)
+        positions.append(len(contexts))
+        contexts.append(kwargs)
+
+    results = effect.perform_batch(contexts)
+    results = [list(result) if isinstance(result, GeneratorType)
+               else result for result in results]
+    return results, positions
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        from multiprocessing.pool import ThreadPool
+
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPool(EFFECTS_POOL_SIZE)
+    return _pool
+
+
+def get_effect_levels(effects):
+    '''
+    Returns {effect: level} dict, where level is the length of the longest
+    chain of ``depends_on`` dependencies of effect. Effect depends on all
+    effects with names listed in its ``depends_on``, so effects sharing a
+    name are scheduled independently. Effects of the same level don't
+    depend on each other. Dependencies on effects missing in `effects` are
+    ignored.
+
+    :raise EffectDependencyCycleError: if dependencies have a cycle
+    '''
+    effects = list(effects)
+    effects_by_name = collections.defaultdict(list)
+    for effect in effects:
+        effects_by_name[effect.name].append(effect)
+
+    levels = {}
+    visiting = []
+
+    def visit(effect):
+        if effect in levels:
+            return levels[effect]
+        if effect in visiting:
+            cycle = visiting[visiting.index(effect):] + [effect]
+            raise EffectDependencyCycleError(
+                ' -> '.join(e.name for e in cycle))
+
+        visiting.append(effect)
+        level = 0
+        for dependency_name in effect.depends_on:
+            for dependency in effects_by_name.get(dependency_name, ()):
+                level = max(level, visit(dependency) + 1)
+        visiting.pop()
+
+        levels[effect] = level
+        return level
+
+    for effect in effects:
+        visit(effect)
+    return levels
@@ -83,3 +83,19 @@ class ResourceNotFoundError(YawfException):
 
 class ConcurrentRevisionUpdate(YawfException):
     pass
+
+
+class MailboxMessageFailedError(YawfException):
+    pass
+
+
+class EffectDependencyCycleError(YawfException):
+    pass
+
+
+class GroupRolledBackError(YawfException):
+    pass
+
+
+class GraphRenderError(YawfException):
+    pass
@@ -0,0 +1,241 @@
+'''
+Executors to dispatch messages out of the calling flow.
+
+:py:func:`adispatch` dispatches message on a bounded thread pool and
+returns :py:class:`multiprocessing.pool.AsyncResult` immediately:
+
+>>> result = adispatch(obj, user, 'edit', {'title': 'foo'})
+>>> new_obj, handler_result, effect_result = result.get(timeout=5)
+
+Every pool thread uses its own database connection, so pool size
+(``DISPATCH_POOL_SIZE`` setting) bounds the number of concurrent
+transactions.
+
+:py:class:`GroupCommitExecutor` dispatches independent messages in one
+transaction per group of messages to save on commits.
+'''
+import time
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.db import connection, transaction
+
+from yawf.config import DISPATCH_POOL_SIZE
+from yawf.dispatch import dispatch, dispatch_message
+from yawf.effects import perform_pending
+from yawf.exceptions import GroupRolledBackError
+from yawf.messages import Message
+from yawf.store import GroupStore
+
+__all__ = ['adispatch', 'get_dispatch_pool', 'GroupCommitExecutor',
+           'GroupCommitResult']
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_dispatch_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPool(DISPATCH_POOL_SIZE)
+    return _pool
+
+
+def adispatch(obj, sender, message_id, raw_params=None, callback=None,
+        **dispatch_options):
+    '''
+    The same as :py:func:`yawf.dispatch.dispatch`, but message is
+    dispatched in a pool thread.
+
+    :param callback:
+        called in a pool thread with dispatch result if dispatching
+        succeeded
+    :return: :py:class:`multiprocessing.pool.AsyncResult`, its ``get``
+        method returns dispatch result or raises dispatch exception
+    '''
+    return get_dispatch_pool().apply_async(
+        dispatch,
+        (obj, sender, message_id, raw_params),
+        dispatch_options,
+        callback)
+
+
+class GroupCommitResult(object):
+    '''
+    Result of message submitted to :py:class:`GroupCommitExecutor`.
+    '''
+
+    def __init__(self):
+        self._value = None
+        self._exception = None
+        self._ready = False
+        super(GroupCommitResult, self).__init__()
+
+    def ready(self):
+        return self._ready
+
+    def successful(self):
+        return self._ready and self._exception is None
+
+    def get(self):
+        '''
+        Returns dispatch result or raises dispatch exception.
+
+        :raise ValueError: if group is not committed yet
+        '''
+        if not self._ready:
+            raise ValueError('Result is not ready, flush executor first')
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+    def _set(self, value=None, exception=None):
+        self._value = value
+        self._exception = exception
+        self._ready = True
+
+
+class GroupCommitExecutor(object):
+    '''
+    Dispatches independent messages in groups, one transaction per group.
+
+    Every message is dispatched within its own savepoint, so failed message
+    doesn't affect the others. On database backends without savepoints
+    (e.g. sqlite) every message is dispatched in its own transaction
+    instead. With `atomic` flag group is all-or-nothing: failure of
+    any message rolls back the whole group and results of the other
+    messages raise :py:class:`yawf.exceptions.GroupRolledBackError`.
+    Deferred side effects of all messages are performed after
+    the group is committed.
+
+    Group is committed when `max_size` messages are submitted, when
+    message is submitted more than `max_delay` seconds after the first
+    message of the group, on :py:meth:`flush` call and on exit from
+    ``with`` block:
+
+    >>> with GroupCommitExecutor(max_size=100) as executor:
+    ...     for obj in objects:
+    ...         executor.submit(obj, user, 'touch')
+    '''
+
+    def __init__(self, max_size=100, max_delay=None, atomic=False):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.atomic = atomic
+        self._pending = []
+        self._started_at = None
+        super(GroupCommitExecutor, self).__init__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, obj, sender, message_id, raw_params=None,
+            **dispatch_options):
+        '''
+        Adds message to the current group.
+
+        :return: :py:class:`GroupCommitResult`
+        '''
+        result = GroupCommitResult()
+        message = Message(sender, message_id, raw_params)
+        self._pending.append((obj, message, dispatch_options, result))
+
+        if self._started_at is None:
+            self._started_at = time.time()
+
+        if len(self._pending) >= self.max_size or (
+                self.max_delay is not None and
+                time.time() - self._started_at >= self.max_delay):
+            self.flush()
+        return result
+
+    def flush(self):
+        '''
+        Dispatches and commits current group.
+
+        :return: list of :py:class:`GroupCommitResult` of the group
+        '''
+        pending, self._pending = self._pending, []
+        self._started_at = None
+        if not pending:
+            return []
+
+        if not self.atomic and not connection.features.uses_savepoints:
+            # partial writes of failed message can't be rolled back alone
+            return self._flush_each(pending)
+
+        store = GroupStore()
+        dispatched = []
+
+        try:
+            with transaction.commit_on_success():
+                for obj, message, dispatch_options, result in pending:
+                    sid = None if self.atomic else transaction.savepoint()
+                    try:
+                        value = dispatch_message(obj, message,
+                            defer_side_effect=True,
+                            store=store,
+                            **dispatch_options)
+                    except Exception as e:
+                        logger.info(u"Message %s to %s failed: %r",
+                            message.id, obj.pk, e)
+                        result._set(exception=e)
+                        if self.atomic:
+                            raise _GroupFailed(e)
+                        transaction.savepoint_rollback(sid)
+                    else:
+                        if sid is not None:
+                            transaction.savepoint_commit(sid)
+                        dispatched.append((value, result))
+        except _GroupFailed as e:
+            for _, _, _, result in pending:
+                if not result.ready():
+                    result._set(exception=GroupRolledBackError(e.args[0]))
+            return [result for _, _, _, result in pending]
+        except Exception as e:
+            # commit failed, none of messages was applied
+            for _value, result in dispatched:
+                result._set(exception=e)
+            raise
+
+        self._perform_side_effects(dispatched)
+        return [result for _, _, _, result in pending]
+
+    def _flush_each(self, pending):
+        dispatched = []
+        for obj, message, dispatch_options, result in pending:
+            try:
+                value = dispatch_message(obj, message,
+                    defer_side_effect=True,
+                    **dispatch_options)
+            except Exception as e:
+                logger.info(u"Message %s to %s failed: %r",
+                    message.id, obj.pk, e)
+                result._set(exception=e)
+            else:
+                dispatched.append((value, result))
+
+        self._perform_side_effects(dispatched)
+        return [result for _, _, _, result in pending]
+
+    def _perform_side_effects(self, dispatched):
+        effect_results = perform_pending(
+            [performer for (_, _, performer), _ in dispatched])
+        for ((new_obj, handler_result, _), result), effect_result in zip(
+                dispatched, effect_results):
+            result._set((new_obj, handler_result, effect_result))
+
+
+class _GroupFailed(Exception):
+    pass
@@ -7,6 +7,10 @@ from django.template import Context
 from yawf import get_workflow, get_workflow_by_instance
 from yawf.exceptions import WorkflowNotLoadedError, NoAvailableMessagesError
 from yawf.messages.allowed import get_allowed_messages
+from yawf.utils import LRUCache
+
+# composed action form classes, see get_action_form_cls
+_form_cls_cache = LRUCache(256)
 
 
 def get_create_form_html(workflow_type, sender=None):
@@ -14,7 +18,7 @@ def get_create_form_html(workflow_type, sender=None):
     if workflow is None:
         raise WorkflowNotLoadedError(workflow_type)
 
-    form = workflow.create_form_cls()
+    form = workflow.get_create_form_cls()()
     if not workflow.create_form_template:
         t = template_loader.select_template(
                 ('workflows/%s/create_form.html' % workflow_type,
@@ -41,39 +45,63 @@ def get_object_as_html(obj, sender):
     return t.render(context)
 
 
+def get_action_form_cls(workflow, message_specs):
+    '''
+    Returns form class for messages `message_specs` or None if there are no
+    form validators among them.
+
+    Composed classes are cached by the set of validator classes (or by the
+    set of specs if workflow has ``formcls_factory``), so that form class
+    is created only once for every combination.
+    '''
+    formcls_factory = getattr(workflow, 'formcls_factory', None)
+
+    if callable(formcls_factory):
+        key = (formcls_factory, frozenset(message_specs))
+    else:
+        # get all form subclasses from message validators, throw away duplicates
+        validators = frozenset(ms.validator_cls for ms in message_specs
+                               if issubclass(ms.validator_cls, forms.BaseForm))
+        if not validators:
+            return None
+        key = (None, validators)
+
+    form_cls = _form_cls_cache.get(key)
+    if form_cls is None:
+        if callable(formcls_factory):
+            form_cls = formcls_factory(message_specs)
+        else:
+            # join them all in one mixin class
+            form_cls = type('WorkflowObjectMixinForm', tuple(validators), {})
+        _form_cls_cache.set(key, form_cls)
+    return form_cls
+
+
 def get_action_form_html(obj, sender):
     workflow_type = obj.workflow_type
     workflow = get_workflow_by_instance(obj)
-    allowed_context = get_allowed_messages(sender, obj)
+    allowed_messages = [workflow.get_message_spec(message_id)
+                        for message_id in get_allowed_messages(sender, obj)]
 
     t = template_loader.select_template(
             ('workflows/%s/form_%s.html' % (workflow_type, obj.state),
                 'workflows/%s/form.html' % workflow_type,
                 'workflows/form.html'))
 
-    allowed_messages = allowed_context['allowed_messages']
     if not allowed_messages:
         raise NoAvailableMessagesError(obj.id, sender)
 
-    if callable(workflow.formcls_factory):
-        form_cls = workflow.formcls_factory(allowed_messages)
+    form_cls = get_action_form_cls(workflow, allowed_messages)
+    if form_cls is None:
+        form = forms.Form()
+    elif callable(getattr(workflow, 'formcls_factory', None)) or\
+            issubclass(form_cls, forms.ModelForm):
+        # instantiate it and put instance as argument (requires ModelForm subclass to be in bases)
         form = form_cls(instance=obj)
     else:
-        # get all form subclasses from message validators, throw away duplicates
-        bases = tuple(set(ms.validator_cls for ms in allowed_messages
-                            if issubclass(ms.validator_cls, forms.BaseForm)))
-        if bases:
-            # join them all in one mixin class
-            mixin_form_cls = type('WorkflowObjectMixinForm', bases, {})
-            # instantiate it and put instance as argument (requires ModelForm subclass to be in bases)
-            if issubclass(mixin_form_cls, forms.ModelForm):
-                form = mixin_form_cls(instance=obj)
-            else:
-                form = mixin_form_cls(initial=obj.__dict__)
-        else:
-            form = forms.Form()
+        form = form_cls(initial=obj.__dict__)
 
-    dict_context = {'form': form, 'instance': obj}
-    dict_context.update(allowed_context)
+    dict_context = {'form': form, 'instance': obj,
+                    'allowed_messages': allowed_messages}
     context = Context(dict_context)
     return t.render(context)
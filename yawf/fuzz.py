@@ -0,0 +1,261 @@
+'''
+Random-walk fuzzing of workflows.
+
+Walk starts from a fresh object in workflow's ``initial_state``, picks a
+random message among handled in current state (using library handlers
+index), synthesizes message params from validator form fields and
+dispatches message with :py:class:`yawf.store.memory.InMemoryStore`, so
+no database writes are made by the engine itself.
+
+Example:
+
+>>> report = random_walk(get_workflow('simple'), steps=10000, seed=42)
+>>> visited, total = report.handler_coverage
+'''
+import datetime
+import random
+import string
+import time
+import traceback
+import multiprocessing
+
+from django import forms
+from django.db import connection
+
+from yawf import get_workflow
+from yawf.config import WORKFLOW_TYPE_ATTR
+from yawf.dispatch import dispatch_message
+from yawf.exceptions import (
+    PermissionDeniedError,
+    MessageValidationError,
+    MessageIgnored,
+    WorkflowNotLoadedError,
+)
+from yawf.messages import Message
+from yawf.store.memory import InMemoryStore
+
+__all__ = ['WalkReport', 'random_walk', 'run_walks', 'synthesize_params']
+
+# Errors that mean "message was rejected", not "workflow is broken"
+REJECTIONS = (PermissionDeniedError, MessageValidationError, MessageIgnored)
+
+
+class WalkReport(object):
+    '''
+    Picklable result of one or several random walks.
+    '''
+
+    def __init__(self, workflow):
+        self.workflow_id = workflow.id
+        # indexes have keys of message groups too, but only registered
+        # messages are dispatched
+        message_ids = workflow.get_possible_message_ids()
+        self.handler_keys = set(key for key, _ in
+            workflow.library.iter_handlers() if key[-1] in message_ids)
+        self.effect_keys = set(key for key, _ in
+            workflow.library.iter_effects() if key[-1] in message_ids)
+        self.visited_handler_keys = set()
+        self.visited_effect_keys = set()
+        self.steps = 0
+        self.transitions = 0
+        self.restarts = 0
+        self.rejected = {}
+        self.errors = []
+        self.elapsed = 0.0
+        super(WalkReport, self).__init__()
+
+    @property
+    def handler_coverage(self):
+        return (len(self.visited_handler_keys & self.handler_keys),
+                len(self.handler_keys))
+
+    @property
+    def effect_coverage(self):
+        return (len(self.visited_effect_keys & self.effect_keys),
+                len(self.effect_keys))
+
+    @property
+    def transitions_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.transitions / self.elapsed
+
+    def merge(self, other):
+        self.visited_handler_keys.update(other.visited_handler_keys)
+        self.visited_effect_keys.update(other.visited_effect_keys)
+        self.steps += other.steps
+        self.transitions += other.transitions
+        self.restarts += other.restarts
+        for name, count in other.rejected.iteritems():
+            self.rejected[name] = self.rejected.get(name, 0) + count
+        self.errors.extend(other.errors)
+        # walks are run in parallel, so the slowest one defines the time
+        self.elapsed = max(self.elapsed, other.elapsed)
+        return self
+
+
+def random_walk(workflow, steps=1000, seed=None, sender=None,
+        obj_factory=None):
+    '''
+    Performs ``steps`` random messages on workflow object.
+
+    :param obj_factory:
+        callable returning new object in initial state. By default
+        unsaved instance of ``workflow.model_class`` is used. Walk restarts
+        with new object every time it gets to a state without handlers.
+    :return: :py:class:`WalkReport` instance
+    '''
+    if obj_factory is None:
+        obj_factory = lambda: new_object(workflow)
+
+    rnd = random.Random(seed)
+    store = InMemoryStore()
+    library = workflow.library
+    registered_ids = workflow.get_possible_message_ids()
+    report = WalkReport(workflow)
+
+    obj = obj_factory()
+    started_at = time.time()
+
+    for _step in xrange(steps):
+        report.steps += 1
+        state = getattr(obj, workflow.state_attr_name)
+        message_ids = sorted(
+            message_id for message_id
+            in library.get_handlers_index_for_state(state)
+            if message_id in registered_ids)
+
+        if not message_ids:
+            report.restarts += 1
+            obj = obj_factory()
+            continue
+
+        message_id = rnd.choice(message_ids)
+        params = synthesize_params(
+            workflow.get_message_spec(message_id), rnd)
+        message = Message(sender, message_id, params)
+
+        try:
+            new_obj, _handler_result, _effect_result = dispatch_message(
+                obj, message, store=store)
+        except REJECTIONS as e:
+            name = e.__class__.__name__
+            report.rejected[name] = report.rejected.get(name, 0) + 1
+        except Exception:
+            report.errors.append(
+                (state, message_id, params, traceback.format_exc()))
+        else:
+            report.transitions += 1
+            new_state = getattr(new_obj, workflow.state_attr_name)
+            report.visited_handler_keys.add((state, message_id))
+            report.visited_effect_keys.add((state, new_state, message_id))
+            obj = new_obj
+
+    report.elapsed = time.time() - started_at
+    return report
+
+
+def run_walks(workflow_id, processes=1, steps=1000, seed=None,
+        sender=None):
+    '''
+    Runs ``processes`` random walks in parallel processes and returns
+    merged :py:class:`WalkReport`. Walk number ``i`` is seeded with
+    ``seed + i``.
+    '''
+    workflow = get_workflow(workflow_id)
+    if workflow is None:
+        raise WorkflowNotLoadedError(workflow_id)
+
+    tasks = [
+        (workflow_id, steps, seed + i if seed is not None else None, sender)
+        for i in xrange(processes)]
+
+    if processes == 1:
+        reports = map(_walk_worker, tasks)
+    else:
+        # forked children must not share parent's connection
+        connection.close()
+        pool = multiprocessing.Pool(processes)
+        try:
+            reports = pool.map(_walk_worker, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    report = WalkReport(workflow)
+    for walk_report in reports:
+        report.merge(walk_report)
+    return report
+
+
+def _walk_worker(task):
+    workflow_id, steps, seed, sender = task
+    return random_walk(get_workflow(workflow_id),
+                       steps=steps, seed=seed, sender=sender)
+
+
+def new_object(workflow):
+    obj = workflow.model_class()
+    setattr(obj, workflow.state_attr_name, workflow.initial_state)
+    setattr(obj, WORKFLOW_TYPE_ATTR, workflow.id)
+    return obj
+
+
+def synthesize_params(message_spec, rnd):
+    '''
+    Generates raw params for message using validator fields. Fields of
+    unknown types are left out (and may lead to validation rejection).
+    '''
+    fields = getattr(message_spec.validator_cls, 'base_fields', None)
+    if not fields:
+        return {}
+
+    params = {}
+    for name, field in fields.iteritems():
+        if not field.required and rnd.random() < 0.2:
+            continue
+        value = _synthesize_value(field, rnd)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+def _synthesize_value(field, rnd):
+    if isinstance(field, forms.ModelChoiceField):
+        return None
+    elif isinstance(field, forms.BooleanField):
+        return rnd.choice((True, False))
+    elif isinstance(field, forms.ChoiceField):
+        choices = [key for key, _label in _flat_choices(field.choices)
+                   if key != '']
+        return rnd.choice(choices) if choices else None
+    elif isinstance(field, (forms.IntegerField, forms.FloatField,
+                            forms.DecimalField)):
+        low = field.min_value if field.min_value is not None else 0
+        high = field.max_value if field.max_value is not None else low + 1000
+        return rnd.randint(int(low), int(high))
+    elif isinstance(field, forms.DateTimeField):
+        return (datetime.datetime(2000, 1, 1) +
+                datetime.timedelta(seconds=rnd.randint(0, 10 ** 9)))
+    elif isinstance(field, forms.DateField):
+        return (datetime.date(2000, 1, 1) +
+                datetime.timedelta(days=rnd.randint(0, 10 ** 4)))
+    elif isinstance(field, forms.EmailField):
+        return 'user%d@example.com' % rnd.randint(0, 10 ** 6)
+    elif isinstance(field, forms.URLField):
+        return 'http://example.com/%d' % rnd.randint(0, 10 ** 6)
+    elif isinstance(field, forms.CharField):
+        low = field.min_length or 1
+        high = max(low, min(field.max_length or 16, 16))
+        return u''.join(rnd.choice(string.ascii_letters)
+                        for _i in xrange(rnd.randint(low, high)))
+    return None
+
+
+def _flat_choices(choices):
+    for key, label in choices:
+        if isinstance(label, (list, tuple)):
+            for choice in label:
+                yield choice
+        else:
+            yield key, label
@@ -1,38 +1,90 @@
-import pygraphviz
+'''
+Graphs of workflow transitions.
+
+Graphs are emitted as DOT source straight from library indexes, no
+pygraphviz is needed:
+
+>>> print get_graph_dot(workflow, 'handlers')
+
+DOT source is cached by workflow id and library version (see
+:py:attr:`yawf.library.Library.version`). Rendered output
+(:py:func:`render_graph`) is produced by ``dot`` binary and cached by
+digest of DOT source in memory and, if ``GRAPH_CACHE_DIR`` setting is set,
+on disk, so graphs pre-rendered by ``yawf_render_graphs`` management
+command are shared by all processes.
+'''
+import os
+import hashlib
+import subprocess
+import uuid
+from collections import OrderedDict
+
 from django.utils.encoding import smart_str
 
+from yawf.config import GRAPH_CACHE_DIR
+from yawf.exceptions import GraphRenderError
+from yawf.utils import LRUCache
 
-def build_effects_graph(workflow):
+__all__ = ['handlers_dot', 'effects_dot', 'get_graph_dot', 'render_graph',
+           'build_handlers_graph', 'build_effects_graph', 'GRAPH_KINDS']
 
-    g = pygraphviz.AGraph(directed=True, strict=False)
+DOT_BINARY = 'dot'
+UNKNOWN_STATE = '?'
+UNKNOWN_COLOR = 'gray'
 
-    for state in workflow._valid_states:
-        g.add_node(state)
+_dot_cache = LRUCache(100)
+_render_cache = LRUCache(100)
 
-    for (state_from, state_to, message), _effects in workflow.library.iter_effects():
-        state_from, state_to, message = map(smart_str, (state_from, state_to, message))
-        g.add_edge(state_from, state_to, message)
-        e = g.get_edge(state_from, state_to, message)
-        e.attr['label'] = message
 
-    return g
+def _quote(value):
+    return '"%s"' % smart_str(value).replace('\\', '\\\\').replace('"', '\\"')
 
-build_actions_graph = build_effects_graph
 
+def _format_attrs(attrs):
+    if not attrs:
+        return ''
+    return ' [%s]' % ', '.join(
+        '%s=%s' % (name, _quote(value))
+        for name, value in sorted(attrs.iteritems()))
+
+
+def emit_dot(nodes, edges):
+    '''
+    Returns DOT source of directed graph.
+
+    :param nodes: list of ``(node, attrs)``
+    :param edges: list of ``(node_from, node_to, attrs)``
+    '''
+    lines = ['digraph {']
+    for node, attrs in nodes:
+        lines.append('\t%s%s;' % (_quote(node), _format_attrs(attrs)))
+    for node_from, node_to, attrs in edges:
+        lines.append('\t%s -> %s%s;' % (
+            _quote(node_from), _quote(node_to), _format_attrs(attrs)))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def _state_nodes(workflow):
+    return [(state, {}) for state in sorted(workflow._valid_states)]
 
-def build_handlers_graph(workflow):
 
-    g = pygraphviz.AGraph(directed=True, strict=False)
+def effects_dot(workflow):
+    edges = OrderedDict()
+    for (state_from, state_to, message), _effects in sorted(
+            workflow.library.iter_effects()):
+        edges[(state_from, state_to, message)] = {'label': message}
 
-    for state in workflow._valid_states:
-        g.add_node(state)
+    return emit_dot(_state_nodes(workflow),
+        [key[:2] + (attrs,) for key, attrs in edges.iteritems()])
 
-    unknown_color = 'gray'
-    g.add_node('?')
-    unknown_state = g.get_node('?')
-    unknown_state.attr['color'] = unknown_color
 
-    for ((state_from, message), handlers) in workflow.library.iter_handlers():
+def handlers_dot(workflow):
+    # the same edge from several handlers is drawn once, the last wins
+    edges = OrderedDict()
+
+    for (state_from, message), handlers in sorted(
+            workflow.library.iter_handlers()):
         for handler in handlers:
             if hasattr(handler, 'state_to'):
                 states_to = [handler.state_to]
@@ -41,27 +93,126 @@ def build_handlers_graph(workflow):
             else:
                 states_to = None
 
-            if states_to is not None:
-                if len(states_to) > 1:
-                    style = 'dashed'
-                else:
-                    style = 'solid'
+            if states_to is None:
+                edges[(state_from, UNKNOWN_STATE, message)] = {
+                    'label': message, 'color': UNKNOWN_COLOR}
+                continue
+
+            style = 'dashed' if len(states_to) > 1 else 'solid'
+            for state_to in states_to:
+                if state_to == '_':
+                    state_to = state_from
+                edges[(state_from, state_to, message)] = {
+                    'label': message, 'style': style}
+
+    nodes = _state_nodes(workflow) + [
+        (UNKNOWN_STATE, {'color': UNKNOWN_COLOR})]
+    return emit_dot(nodes,
+        [key[:2] + (attrs,) for key, attrs in edges.iteritems()])
+
+
+GRAPH_KINDS = {
+    'handlers': handlers_dot,
+    'effects': effects_dot,
+}
+
+
+def get_graph_dot(workflow, kind):
+    '''
+    Returns cached DOT source of graph `kind` (one of
+    :py:data:`GRAPH_KINDS`).
+    '''
+    key = (workflow.id, kind, workflow.library.version)
+    dot = _dot_cache.get(key)
+    if dot is None:
+        dot = GRAPH_KINDS[kind](workflow)
+        _dot_cache.set(key, dot)
+    return dot
+
+
+def run_dot(dot, format_):
+    '''
+    Lays out and renders DOT source with ``dot`` binary.
+    '''
+    try:
+        process = subprocess.Popen([DOT_BINARY, '-T%s' % format_],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+    except OSError as e:
+        raise GraphRenderError(u"Can't run %s: %s" % (DOT_BINARY, e))
+
+    output, errors = process.communicate(dot)
+    if process.returncode != 0:
+        raise GraphRenderError(errors)
+    return output
+
+
+def render_graph(workflow, kind, format_='png', cache_dir=None):
+    '''
+    Returns graph `kind` of `workflow` rendered to `format_` (DOT source
+    itself for 'dot' format).
+
+    :param cache_dir: directory of rendered files, ``GRAPH_CACHE_DIR``
+        setting by default
+    '''
+    dot = get_graph_dot(workflow, kind)
+    if format_ == 'dot':
+        return dot
+
+    if cache_dir is None:
+        cache_dir = GRAPH_CACHE_DIR
+
+    digest = hashlib.md5(dot).hexdigest()
+    output = _render_cache.get((digest, format_))
+    if output is not None:
+        return output
+
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, '%s.%s' % (digest, format_))
+
+    if path is not None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            output = f.read()
+    else:
+        output = run_dot(dot, format_)
+        if path is not None:
+            _write_file(path, output)
+
+    _render_cache.set((digest, format_), output)
+    return output
+
+
+def _write_file(path, content):
+    # rename is atomic, so concurrent readers never see partial file
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # unlike mkstemp, file isn't readable by owner only (cache is shared by
+    # processes that may run as other users), umask still applies
+    tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0666)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.rename(tmp_path, path)
+
 
-                for state_to in states_to:
+def build_effects_graph(workflow):
+    '''
+    Returns ``pygraphviz.AGraph`` of effects.
+    '''
+    import pygraphviz
 
-                    if state_to == '_':
-                        state_to = state_from
+    return pygraphviz.AGraph(string=get_graph_dot(workflow, 'effects'))
 
-                    state_from, state_to, message = map(smart_str, (state_from, state_to, message))
-                    g.add_edge(state_from, state_to, message)
-                    e = g.get_edge(state_from, state_to, message)
-                    e.attr['label'] = message
-                    e.attr['style'] = style
-            else:
-                state_from, message = smart_str(state_from), smart_str(message)
-                g.add_edge(state_from, unknown_state, message)
-                e = g.get_edge(state_from, unknown_state, message)
-                e.attr['label'] = message
-                e.attr['color'] = unknown_color
+build_actions_graph = build_effects_graph
+
+
+def build_handlers_graph(workflow):
+    '''
+    Returns ``pygraphviz.AGraph`` of handlers.
+    '''
+    import pygraphviz
 
-    return g
+    return pygraphviz.AGraph(string=get_graph_dot(workflow, 'handlers'))
@@ -1,26 +1,31 @@
 from django.http import Http404, HttpResponse
 
 from yawf import get_workflow
-from yawf.graph import build_effects_graph, build_handlers_graph
+from yawf.graph import render_graph
+
+MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'dot': 'text/vnd.graphviz',
+}
 
 
 def handlers_graph(request, workflow_id):
-    return _graph_view(request, workflow_id, build_handlers_graph)
+    return _graph_view(request, workflow_id, 'handlers')
 
 
 def effects_graph(request, workflow_id):
-    return _graph_view(request, workflow_id, build_effects_graph)
+    return _graph_view(request, workflow_id, 'effects')
 
 
-def _graph_view(request, workflow_id, build_func):
+def _graph_view(request, workflow_id, kind):
     w = get_workflow(workflow_id)
     if w is None:
         raise Http404
 
-    response = HttpResponse(mimetype='image/png')
-
-    graph = build_func(w)
-    graph.layout('dot')
-    graph.draw(response, format='png')
+    format_ = request.GET.get('format', 'png')
+    if format_ not in MIMETYPES:
+        raise Http404
 
-    return response
+    return HttpResponse(render_graph(w, kind, format_),
+        mimetype=MIMETYPES[format_])
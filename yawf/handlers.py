@@ -1,7 +1,8 @@
 import logging
 import collections
 
-from yawf.permissions import BasePermissionChecker, OrChecker
+from yawf.permissions import BasePermissionChecker, OrChecker,\
+        is_always_allowed
 from yawf.config import INITIAL_STATE
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,9 @@ class Handler(object):
     defer = True
     replace_if_exists = False
     copy_before_call = False
+    # pure module-level function to run in process pool before locking
+    # object, see yawf.compute
+    compute = None
 
     def __init__(self, message_id=None, states_from=None,
             message_group=None,
@@ -87,6 +91,21 @@ class Handler(object):
         self.perform = lambda obj, sender, **kwargs:\
             handle_func(obj, sender, **kwargs)
 
+    def get_compute_args(self, obj, sender, **kwargs):
+        '''
+        Returns tuple of picklable arguments for ``compute``, message params
+        dict by default.
+        '''
+        return (kwargs,)
+
+    @property
+    def static_state_to(self):
+        '''
+        State this handler moves any object to regardless of object, sender
+        and message params, or None if result depends on them.
+        '''
+        return None
+
 
 class SimpleStateTransition(Handler):
 
@@ -100,6 +119,15 @@ class SimpleStateTransition(Handler):
     def perform(self, obj, sender, **kwargs):
         return self.state_to
 
+    @property
+    def static_state_to(self):
+        if 'perform' in self.__dict__ or type(self).perform.im_func\
+                is not SimpleStateTransition.perform.im_func:
+            return None
+        if not is_always_allowed(self.permission_checker):
+            return None
+        return self.state_to
+
 
 class ComplexStateTransition(Handler):
 
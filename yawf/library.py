@@ -6,7 +6,7 @@ from operator import attrgetter
 from django.utils.datastructures import MergeDict
 from django.utils.importlib import import_module
 
-from yawf.effects import SideEffect
+from yawf.effects import SideEffect, get_effect_levels
 from yawf.handlers import Handler
 from yawf.resources import WorkflowResource
 from yawf.exceptions import (
@@ -68,6 +68,9 @@ class Library(object):
 
     _is_index_built = False
     _is_imported_registrants = False
+    # bumped on every registration, so that anything derived from library
+    # contents can be cached by version
+    version = 0
 
     _containers = (
         ('_resources', dict),
@@ -89,6 +92,8 @@ class Library(object):
         ('_deferrable_effect_index', metadefaultdict(list)),
         ('_transactional_effect_index', metadefaultdict(list)),
         ('_possible_effect_index', metadefaultdict(list)),
+        ('_static_transition_index', dict),
+        ('_effect_plan_index', dict),
     )
 
     def __init__(self, registrants=()):
@@ -159,6 +164,8 @@ class Library(object):
 
             group_dict[final_id] = message_spec
 
+        self.version += 1
+
         if self._is_index_built:
             self.rebuild_index()
 
@@ -224,6 +231,8 @@ class Library(object):
                 self._resource_checkers_index[state].update(
                     permission_checker.get_atomical_checkers())
 
+            self.version += 1
+
             return handler
 
         return registrator
@@ -278,6 +287,13 @@ class Library(object):
                     self._message_checkers_index[state].update(
                         handler.permission_checker.get_atomical_checkers())
 
+        # first registered handler wins, so transition is static if the
+        # first one is static
+        for key, handlers in self._handler_index.iteritems():
+            state_to = handlers[0].static_state_to
+            if state_to is not None:
+                self._static_transition_index[key] = state_to
+
         # Build index for effects
         for pattern in self._effect_patterns:
             message_id_list, group_path, states_to, states_from, effect = pattern
@@ -312,6 +328,17 @@ class Library(object):
                         else:
                             self._deferrable_effect_index[key].append(effect)
 
+        # plan of deferrable effects: (level, effects) pairs in order of
+        # dependencies, effects of the same level are independent
+        levels = get_effect_levels(
+            pattern[-1] for pattern in self._effect_patterns)
+        for key, effects in self._deferrable_effect_index.iteritems():
+            plan = collections.defaultdict(list)
+            for effect in effects:
+                plan[levels[effect]].append(effect)
+            self._effect_plan_index[key] = tuple(
+                (level, tuple(plan[level])) for level in sorted(plan))
+
         self._is_index_built = True
 
     def get_handler(self, state, message_id):
@@ -343,6 +370,15 @@ class Library(object):
 
         return handlers
 
+    @touches_index
+    def get_static_transition(self, state, message_id):
+        '''
+        Returns state that any object in ``state'' moves to on
+        ``message_id'' without calling handler (see
+        :py:attr:`yawf.handlers.Handler.static_state_to`), or None.
+        '''
+        return self._static_transition_index.get((state, message_id))
+
     @touches_index
     def get_handlers_index_for_state(self, state):
         return self._handler_state_index.get(state, {})
@@ -367,6 +403,15 @@ class Library(object):
         return (self._transactional_effect_index.get(key),
                 self._deferrable_effect_index.get(key))
 
+    @touches_index
+    def get_effect_plan(self, from_state, to_state, message_id):
+        '''
+        Returns deferrable effects for transition as a tuple of
+        ``(level, effects)`` pairs ordered by ``depends_on`` dependencies.
+        '''
+        key = (from_state, to_state, message_id)
+        return self._effect_plan_index.get(key, ())
+
     @touches_index
     def get_possible_effects(self, from_state, message_id):
         return self._possible_effect_index.get((from_state, message_id)) or []
@@ -496,6 +541,7 @@ class Library(object):
         self._handler_patterns.append(
             (message_id_list, group_path, handler.states_from, handler)
         )
+        self.version += 1
 
         if self._is_index_built:
             self.rebuild_index()
@@ -504,6 +550,13 @@ class Library(object):
 
     def _register_effect_obj(self, effect):
 
+        if effect.is_transactional and effect.compute is not None:
+            raise ValueError("Transactional effect can't have compute step")
+
+        # raises EffectDependencyCycleError
+        get_effect_levels(
+            [pattern[-1] for pattern in self._effect_patterns] + [effect])
+
         group_path = effect.message_group
         message_id_list = maybe_list(effect.message_id)
         states_to, states_from = effect.states_to, effect.states_from
@@ -511,6 +564,7 @@ class Library(object):
         self._effect_patterns.append(
             (message_id_list, group_path, states_to, states_from, effect)
         )
+        self.version += 1
 
         if self._is_index_built:
             self.rebuild_index()
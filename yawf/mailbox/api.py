@@ -0,0 +1,331 @@
+'''
+Per-object mailboxes.
+
+Instead of dispatching message (and waiting for the lock on a hot object)
+caller can post it to the object's mailbox:
+
+>>> handle = post(obj, user, 'edit', {'title': 'foo'})
+
+Consumer (see ``yawf_mailbox_worker`` management command) processes
+pending messages of each object in order, in batches. Every batch is
+handled by :py:meth:`yawf.dispatch.Dispatcher.session`, i.e. under one
+lock acquisition and one transaction. Failed message is rolled back to its
+savepoint and doesn't affect the others. On database backends without
+savepoints (e.g. sqlite) every message is dispatched in its own session
+instead.
+
+Consecutive messages are coalesced before dispatching according to their
+specs' policies (see :py:mod:`yawf.messages.coalesce`). Records of
+coalesced messages share the result of the message that actually ran.
+
+>>> record = handle.wait(timeout=5)
+>>> record.new_state, record.deserialized_transition_result
+'''
+import time
+import datetime
+import logging
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.contrib.contenttypes.models import ContentType
+
+from yawf import get_workflow_by_instance
+from yawf.config import MESSAGE_LOG_ENABLED
+from yawf.dispatch import Dispatcher
+from yawf.exceptions import MailboxMessageFailedError,\
+        ConcurrentRevisionUpdate, OldStateInconsistenceError
+from yawf.handlers import SerializibleHandlerResult
+from yawf.messages import Message
+from yawf.messages.coalesce import coalesce_messages
+from yawf.utils import select_for_update, filter_handler_result
+from yawf.mailbox.models import MailboxMessage
+
+__all__ = ['post', 'MailboxHandle', 'process_mailbox', 'process_pending']
+
+logger = logging.getLogger(__name__)
+
+
+def post(obj, sender, message_id, raw_params=None):
+    '''
+    Appends message to object's mailbox.
+
+    :return: :py:class:`MailboxHandle` to wait for result
+    '''
+    workflow = get_workflow_by_instance(obj)
+    message = Message(sender, message_id, raw_params)
+
+    record = MailboxMessage(
+        uuid=message.unique_id,
+        workflow_id=workflow.id,
+        instance=obj,
+        message=message_id)
+    record.sender = sender
+    record.deserialized_params = dict(message.raw_params.items())
+    record.save()
+
+    return MailboxHandle(record.pk)
+
+
+class MailboxHandle(object):
+
+    def __init__(self, record_id):
+        self.record_id = record_id
+        super(MailboxHandle, self).__init__()
+
+    def get_record(self):
+        return MailboxMessage.objects.get(pk=self.record_id)
+
+    def ready(self):
+        return self.get_record().is_processed
+
+    def wait(self, timeout=None, interval=0.1):
+        '''
+        Waits until message is processed.
+
+        :return:
+            processed :py:class:`yawf.mailbox.models.MailboxMessage`
+            instance or None if timeout expired.
+        :raise MailboxMessageFailedError: if dispatching has failed.
+        '''
+        if timeout is not None:
+            wait_until = time.time() + timeout
+
+        while True:
+            record = self.get_record()
+            if record.status == MailboxMessage.FAILED:
+                raise MailboxMessageFailedError(record.uuid, record.error)
+            elif record.status == MailboxMessage.DONE:
+                return record
+
+            if timeout is not None and time.time() >= wait_until:
+                return None
+            time.sleep(interval)
+
+
+# object was changed between fetching and locking
+LOCK_ERRORS = (ConcurrentRevisionUpdate, OldStateInconsistenceError)
+LOCK_ATTEMPTS = 3
+
+
+def process_mailbox(content_type_id, object_id, batch_size=100):
+    '''
+    Dispatches up to `batch_size` pending messages of single object in
+    one transaction (one transaction per message on database backends
+    without savepoints).
+
+    If object was changed concurrently before it was locked, it's fetched
+    again and processing is retried. Pending messages of deleted object
+    are marked as failed.
+
+    :return: list of processed records
+    '''
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    processed = []
+
+    if connection.features.uses_savepoints:
+        process = _process_batch
+    else:
+        # failed message can't be rolled back alone
+        process = _process_each
+
+    try:
+        process(content_type, object_id, batch_size, processed)
+    except ObjectDoesNotExist:
+        records = _get_pending(content_type, object_id, batch_size)
+        logger.warning(u"Mailbox of deleted object %s.%s: %d messages failed",
+            content_type.model, object_id, len(records))
+        _finish(records, MailboxMessage.FAILED,
+            error=u'DoesNotExist: object is deleted')
+        processed.extend(records)
+
+    return processed
+
+
+def process_pending(batch_size=100, max_mailboxes=None):
+    '''
+    Drains mailboxes with pending messages.
+
+    :return: number of processed messages
+    '''
+    mailboxes = MailboxMessage.objects\
+        .filter(status=MailboxMessage.PENDING)\
+        .order_by()\
+        .values_list('content_type', 'object_id')\
+        .distinct()
+
+    if max_mailboxes is not None:
+        mailboxes = mailboxes[:max_mailboxes]
+
+    processed = 0
+    for content_type_id, object_id in list(mailboxes):
+        processed += len(
+            process_mailbox(content_type_id, object_id, batch_size))
+    return processed
+
+
+def _fetch(content_type, object_id):
+    obj = content_type.get_object_for_this_type(pk=object_id)
+    if hasattr(obj, 'get_clarified_instance'):
+        obj = obj.get_clarified_instance()
+    return obj
+
+
+def _get_pending(content_type, object_id, batch_size, lock=False):
+    queryset = MailboxMessage.objects.filter(
+        content_type=content_type,
+        object_id=object_id,
+        status=MailboxMessage.PENDING)
+    if lock:
+        queryset = select_for_update(queryset)
+    return list(queryset[:batch_size])
+
+
+def _coalesce(workflow, records):
+    messages = [
+        Message(record.sender, record.message,
+            raw_params=record.deserialized_params,
+            unique_id=record.uuid)
+        for record in records]
+
+    records_by_uuid = dict((record.uuid, record) for record in records)
+    for message, coalesced in coalesce_messages(workflow, messages,
+            [record.created_at for record in records]):
+        group_records = [records_by_uuid[m.unique_id] for m in coalesced]
+        group_records.append(records_by_uuid[message.unique_id])
+        yield message, coalesced, group_records
+
+
+def _process_batch(content_type, object_id, batch_size, processed):
+    for attempt in xrange(1, LOCK_ATTEMPTS + 1):
+        obj = _fetch(content_type, object_id)
+        workflow = get_workflow_by_instance(obj)
+        try:
+            with Dispatcher(obj, None).session() as session:
+                # object is locked now, so no other consumer can take these
+                records = _get_pending(content_type, object_id, batch_size,
+                    lock=True)
+                for message, coalesced, group_records in _coalesce(
+                        workflow, records):
+                    _process_group(session, message, coalesced,
+                        group_records)
+        except LOCK_ERRORS as e:
+            logger.info(u"Mailbox of %s is retried after %r", obj.pk, e)
+        else:
+            processed.extend(records)
+            return
+
+    logger.warning(u"Mailbox of %s is skipped: object is changed "
+        u"concurrently", object_id)
+
+
+def _process_group(session, message, coalesced, records):
+    sid = transaction.savepoint()
+    log_count = len(session.store.log_records)
+    try:
+        new_state, transition_result = _dispatch_group(session, message,
+            coalesced)
+    except Exception as e:
+        transaction.savepoint_rollback(sid)
+        # log records of the failed message and its submessages
+        del session.store.log_records[log_count:]
+        logger.info(u"Mailbox message %s failed: %r", message.unique_id, e)
+        _finish(records, MailboxMessage.FAILED, error=_format_error(e))
+    else:
+        transaction.savepoint_commit(sid)
+        _finish(records, MailboxMessage.DONE, new_state, transition_result)
+
+
+def _process_each(content_type, object_id, batch_size, processed):
+    obj = _fetch(content_type, object_id)
+    workflow = get_workflow_by_instance(obj)
+    records = _get_pending(content_type, object_id, batch_size)
+
+    for message, coalesced, group_records in _coalesce(workflow, records):
+        for attempt in xrange(1, LOCK_ATTEMPTS + 1):
+            dispatcher = Dispatcher(obj, None)
+            # exceptions raised after object was locked are message failures
+            locked = []
+            try:
+                with dispatcher.session() as session:
+                    locked.append(True)
+                    claimed = _claim(group_records)
+                    if claimed:
+                        new_state, transition_result = _dispatch_group(
+                            session, message, coalesced)
+                        _finish(group_records, MailboxMessage.DONE,
+                            new_state, transition_result)
+            except Exception as e:
+                if not locked and isinstance(e, LOCK_ERRORS):
+                    logger.info(u"Mailbox of %s is retried after %r",
+                        obj.pk, e)
+                    obj = _fetch(content_type, object_id)
+                    continue
+                elif not locked:
+                    raise
+                # transaction is rolled back, record failure outside it
+                _fail_group(message, group_records, e)
+                processed.extend(group_records)
+            else:
+                obj = dispatcher.obj
+                if claimed:
+                    processed.extend(group_records)
+            break
+        else:
+            logger.warning(u"Mailbox of %s is skipped: object is changed "
+                u"concurrently", object_id)
+            return
+
+
+def _claim(records):
+    # records could be processed by other consumer before object was locked
+    pks = list(select_for_update(MailboxMessage.objects.filter(
+        pk__in=[record.pk for record in records],
+        status=MailboxMessage.PENDING)).values_list('pk', flat=True))
+    return len(pks) == len(records)
+
+
+def _dispatch_group(session, message, coalesced):
+    obj = session.obj
+    new_obj, handler_result, _ = session.dispatch_message(message)
+
+    workflow = get_workflow_by_instance(new_obj)
+    new_state = getattr(new_obj, workflow.state_attr_name)
+    if isinstance(handler_result, SerializibleHandlerResult):
+        handler_result = [handler_result]
+    transition_result = filter_handler_result(
+        handler_result, SerializibleHandlerResult)
+
+    if MESSAGE_LOG_ENABLED:
+        for coalesced_message in coalesced:
+            session.store.log_message(
+                sender=workflow.id,
+                workflow=workflow,
+                message=coalesced_message,
+                instance=obj,
+                new_instance=new_obj,
+                transition_result=None,
+                coalesced_into=message.unique_id)
+
+    return new_state, transition_result
+
+
+def _fail_group(message, records, e):
+    logger.info(u"Mailbox message %s failed: %r", message.unique_id, e)
+    _finish(records, MailboxMessage.FAILED, error=_format_error(e))
+
+
+def _format_error(e):
+    return u'%s: %r' % (e.__class__.__name__, getattr(e, 'context', e.args))
+
+
+def _finish(records, status, new_state='', transition_result=None,
+        error=''):
+    processed_at = datetime.datetime.now()
+    for record in records:
+        record.status = status
+        record.new_state = new_state
+        if status == MailboxMessage.DONE:
+            record.deserialized_transition_result = transition_result
+        record.error = error
+        record.processed_at = processed_at
+        record.save()
@@ -0,0 +1,33 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from yawf import autodiscover
+from yawf.mailbox.api import process_pending
+
+
+class Command(BaseCommand):
+
+    help = 'Dispatches messages from per-object mailboxes.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', default=100,
+            help='Max number of messages dispatched in one transaction'),
+        make_option('--interval', type='float', default=1.0,
+            help='Seconds to sleep when there are no pending messages'),
+        make_option('--once', action='store_true', default=False,
+            help='Drain mailboxes once and exit'),
+    )
+
+    def handle(self, **options):
+        autodiscover()
+
+        while True:
+            processed = process_pending(batch_size=options['batch_size'])
+            if processed:
+                print 'Processed %d messages' % processed
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
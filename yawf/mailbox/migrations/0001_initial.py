@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'MailboxMessage'
+        db.create_table('mailbox_mailboxmessage', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('uuid', self.gf('django.db.models.fields.CharField')(unique=True, max_length=36, db_index=True)),
+            ('created_at', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, blank=True)),
+            ('processed_at', self.gf('django.db.models.fields.DateTimeField')(null=True, blank=True)),
+            ('status', self.gf('django.db.models.fields.PositiveSmallIntegerField')(default=0, db_index=True)),
+            ('workflow_id', self.gf('django.db.models.fields.CharField')(max_length=64)),
+            ('content_type', self.gf('django.db.models.fields.related.ForeignKey')(related_name='mailbox_messages_instance', to=orm['contenttypes.ContentType'])),
+            ('object_id', self.gf('django.db.models.fields.PositiveIntegerField')(db_index=True)),
+            ('sender_content_type', self.gf('django.db.models.fields.related.ForeignKey')(blank=True, related_name='mailbox_messages_sender', null=True, to=orm['contenttypes.ContentType'])),
+            ('sender_object_id', self.gf('django.db.models.fields.PositiveIntegerField')(null=True, blank=True)),
+            ('sender_value', self.gf('django.db.models.fields.TextField')(default='null')),
+            ('message', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('message_params', self.gf('django.db.models.fields.TextField')()),
+            ('new_state', self.gf('django.db.models.fields.CharField')(default='', max_length=32)),
+            ('transition_result', self.gf('django.db.models.fields.TextField')(default='')),
+            ('error', self.gf('django.db.models.fields.TextField')(default='')),
+        ))
+        db.send_create_signal('mailbox', ['MailboxMessage'])
+
+
+    def backwards(self, orm):
+        # Deleting model 'MailboxMessage'
+        db.delete_table('mailbox_mailboxmessage')
+
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'mailbox.mailboxmessage': {
+            'Meta': {'ordering': "('id',)", 'object_name': 'MailboxMessage'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'mailbox_messages_instance'", 'to': "orm['contenttypes.ContentType']"}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'error': ('django.db.models.fields.TextField', [], {'default': "''"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'message': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'message_params': ('django.db.models.fields.TextField', [], {}),
+            'new_state': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '32'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'processed_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'sender_content_type': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'mailbox_messages_sender'", 'null': 'True', 'to': "orm['contenttypes.ContentType']"}),
+            'sender_object_id': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'sender_value': ('django.db.models.fields.TextField', [], {'default': "'null'"}),
+            'status': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0', 'db_index': 'True'}),
+            'transition_result': ('django.db.models.fields.TextField', [], {'default': "''"}),
+            'uuid': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '36', 'db_index': 'True'}),
+            'workflow_id': ('django.db.models.fields.CharField', [], {'max_length': '64'})
+        }
+    }
+
+    complete_apps = ['mailbox']
\ No newline at end of file
@@ -0,0 +1,82 @@
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes import generic
+
+from yawf import serialize_utils as json
+
+
+class MailboxMessage(models.Model):
+    '''
+    Message waiting in per-object mailbox to be dispatched by consumer.
+    '''
+
+    PENDING = 0
+    DONE = 1
+    FAILED = 2
+
+    STATUS_CHOICES = (
+        (PENDING, 'pending'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+
+    class Meta:
+
+        ordering = ('id',)
+
+    uuid = models.CharField(max_length=36,
+        db_index=True, unique=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES,
+        default=PENDING, db_index=True)
+
+    workflow_id = models.CharField(max_length=64)
+
+    # Generic foreign key to recipient
+    content_type = models.ForeignKey(ContentType,
+            related_name='mailbox_messages_instance')
+    object_id = models.PositiveIntegerField(db_index=True)
+    instance = generic.GenericForeignKey()
+
+    # Sender is either a model instance or json-serializable value
+    sender_content_type = models.ForeignKey(ContentType,
+            related_name='mailbox_messages_sender',
+            null=True, blank=True)
+    sender_object_id = models.PositiveIntegerField(null=True, blank=True)
+    sender_instance = generic.GenericForeignKey(
+            'sender_content_type', 'sender_object_id')
+    sender_value = models.TextField(default='null')
+
+    message = models.CharField(max_length=32)
+    message_params = models.TextField()
+
+    new_state = models.CharField(max_length=32, default='')
+    transition_result = models.TextField(default='')
+    error = models.TextField(default='')
+
+    deserialized_params = json.json_converter(
+        'message_params')
+    deserialized_sender_value = json.json_converter(
+        'sender_value')
+    deserialized_transition_result = json.json_converter(
+        'transition_result')
+
+    def get_sender(self):
+        if self.sender_content_type_id is not None:
+            return self.sender_instance
+        return self.deserialized_sender_value
+
+    def set_sender(self, sender):
+        if isinstance(sender, models.Model):
+            self.sender_instance = sender
+        else:
+            self.deserialized_sender_value = sender
+
+    sender = property(get_sender, set_sender)
+
+    @property
+    def is_processed(self):
+        return self.status != self.PENDING
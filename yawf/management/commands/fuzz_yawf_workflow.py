@@ -0,0 +1,46 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yawf import get_workflow, autodiscover
+from yawf.fuzz import run_walks
+
+
+class Command(BaseCommand):
+
+    args = '<workflow_id>'
+    help = 'Random-walks workflow in memory and reports coverage, '\
+           'errors and throughput.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--steps', type='int', default=1000,
+            help='Number of messages to send in each walk'),
+        make_option('--seed', type='int', default=None,
+            help='Random seed to reproduce a run'),
+        make_option('--processes', type='int', default=1,
+            help='Number of parallel walks'),
+    )
+
+    def handle(self, workflow_id, **options):
+        autodiscover()
+        if get_workflow(workflow_id) is None:
+            raise CommandError('Workflow %s is not loaded' % workflow_id)
+
+        report = run_walks(workflow_id,
+                           processes=options['processes'],
+                           steps=options['steps'],
+                           seed=options['seed'])
+
+        print 'Steps: %d, transitions: %d, restarts: %d' % (
+            report.steps, report.transitions, report.restarts)
+        print 'Handlers coverage: %d/%d' % report.handler_coverage
+        for key in sorted(report.handler_keys - report.visited_handler_keys):
+            print '  not visited: %s, %s' % key
+        print 'Effects coverage: %d/%d' % report.effect_coverage
+        for name, count in sorted(report.rejected.iteritems()):
+            print 'Rejected with %s: %d' % (name, count)
+        print 'Errors: %d' % len(report.errors)
+        for state, message_id, params, tb in report.errors:
+            print '  %s, %s %r:' % (state, message_id, params)
+            print tb
+        print 'Transitions per second: %.1f' % report.transitions_per_second
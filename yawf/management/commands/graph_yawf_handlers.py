@@ -1,11 +1,12 @@
 from django.core.management.base import BaseCommand
 
-from yawf import get_workflow
-from yawf.graph import build_handlers_graph
+from yawf import get_workflow, autodiscover
+from yawf.graph import get_graph_dot
 
 
 class Command(BaseCommand):
 
     def handle(self, workflow_id, **options):
+        autodiscover()
         w = get_workflow(workflow_id)
-        print build_handlers_graph(w).to_string()
+        print get_graph_dot(w, 'handlers'),
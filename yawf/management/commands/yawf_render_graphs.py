@@ -0,0 +1,63 @@
+import os
+import multiprocessing
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yawf import get_workflow, get_workflow_name_map, autodiscover
+from yawf.config import GRAPH_CACHE_DIR
+from yawf.graph import render_graph, GRAPH_KINDS
+
+
+def _render(workflow_id, kind, format_, cache_dir):
+    render_graph(get_workflow(workflow_id), kind, format_,
+        cache_dir=cache_dir)
+    return workflow_id, kind, format_
+
+
+def _render_job(args):
+    return _render(*args)
+
+
+class Command(BaseCommand):
+
+    args = '[<workflow_id> ...]'
+    help = 'Pre-renders graphs of workflows (all by default) to graph '\
+           'cache directory.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format', action='append', dest='formats',
+            help='Output format, may be repeated (png by default)'),
+        make_option('--processes', type='int', default=None,
+            help='Number of render processes (number of CPUs by default)'),
+        make_option('--cache-dir', default=GRAPH_CACHE_DIR,
+            help='Directory of rendered graphs (GRAPH_CACHE_DIR by '
+                 'default)'),
+    )
+
+    def handle(self, *workflow_ids, **options):
+        autodiscover()
+
+        cache_dir = options['cache_dir']
+        if not cache_dir:
+            raise CommandError('Set GRAPH_CACHE_DIR or pass --cache-dir')
+        cache_dir = os.path.abspath(cache_dir)
+
+        if not workflow_ids:
+            workflow_ids = sorted(get_workflow_name_map())
+        for workflow_id in workflow_ids:
+            if get_workflow(workflow_id) is None:
+                raise CommandError('Workflow %s is not loaded' % workflow_id)
+
+        jobs = [(workflow_id, kind, format_, cache_dir)
+                for workflow_id in workflow_ids
+                for kind in sorted(GRAPH_KINDS)
+                for format_ in options['formats'] or ['png']]
+
+        # workflows are loaded before fork, so workers don't import them
+        pool = multiprocessing.Pool(options['processes'])
+        for workflow_id, kind, format_ in pool.imap_unordered(
+                _render_job, jobs):
+            print 'Rendered %s %s graph (%s)' % (workflow_id, kind, format_)
+        pool.close()
+        pool.join()
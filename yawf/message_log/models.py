@@ -51,6 +51,9 @@ class MessageLog(models.Model):
             db_index=True, null=True, blank=True)
     group_uuid = models.CharField(max_length=36,
             db_index=True, null=True, blank=True)
+    # uuid of the message that was dispatched instead of this one
+    coalesced_into = models.CharField(max_length=36,
+            db_index=True, null=True, blank=True)
 
     revision_content_type = models.ForeignKey(ContentType,
             null=True, blank=True, related_name='message_logs_revision')
@@ -71,9 +74,24 @@ class MessageLog(models.Model):
 
 
 def log_message(sender, **kwargs):
+    log_record = build_log_record(sender, **kwargs)
+    log_record.save()
+    return log_record
+
+
+def build_log_record(sender, **kwargs):
+    '''
+    Returns unsaved MessageLog instance, takes the same arguments as
+    :py:func:`log_message`.
+    '''
     message = kwargs['message']
     instance = kwargs['new_instance']
     transition_result = kwargs['transition_result']
+    coalesced_into = kwargs.get('coalesced_into')
+
+    # coalesced message was not cleaned, so log what was queued
+    params = message.params if coalesced_into is None\
+             else dict(message.raw_params.items())
 
     initiator = message.sender\
                 if isinstance(message.sender, models.Model) else None
@@ -81,18 +99,19 @@ def log_message(sender, **kwargs):
     create_dict = dict(
         uuid=message.unique_id,
         message=message.id,
-        message_params=MessageLog.serialize_params(message.params),
+        message_params=MessageLog.serialize_params(params),
         workflow_id=sender,
         instance=instance,
         parent_uuid=message.parent_message_id,
         group_uuid=message.message_group,
+        coalesced_into=coalesced_into,
     )
 
     if initiator:
         create_dict['initiator'] = initiator
 
     log_record = MessageLog(**create_dict)
-    log_record.deserialized_params = message.params
+    log_record.deserialized_params = params
     log_record.deserialized_params_dehydrated = message.dehydrated_params
 
     if isinstance(transition_result, Iterable):
@@ -102,14 +121,19 @@ def log_message(sender, **kwargs):
     elif isinstance(transition_result, SerializibleHandlerResult):
         log_record.deserialized_transition_result = [transition_result]
 
-    log_record.save()
-
     return log_record
 
 
 def main_record_for_revision(revision):
+    '''
+    Returns the earliest top-level log record bound to `revision` (several
+    messages of dispatcher session share one revision).
+    '''
     ct = ContentType.objects.get_for_model(type(revision))
-    return MessageLog.objects.get(
+    records = MessageLog.objects.filter(
         revision_content_type=ct,
         revision_id=revision.pk,
-        parent_uuid__isnull=True)
+        parent_uuid__isnull=True).order_by('created_at', 'id')[:1]
+    if not records:
+        raise MessageLog.DoesNotExist
+    return records[0]
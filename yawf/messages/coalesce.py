@@ -0,0 +1,112 @@
+'''
+Coalescing of queued messages.
+
+Message spec can declare how consecutive messages of the same id (and from
+the same sender) to the same object are merged by a queue consumer before
+dispatching:
+
+  * ``LAST_WINS`` -- messages are merged into one, params with matching
+    keys take value from the latest message (e.g. a series of ``edit``
+    messages where only the last values matter);
+  * ``DROP_DUPLICATES`` -- messages with equal params are dropped if they
+    came within ``coalesce_window`` seconds after the message that is
+    going to run (e.g. repeated no-op messages handled by ``LoopHandler``).
+
+Example:
+
+>>> class EditMessage(MessageSpec):
+...     id = 'edit'
+...     coalesce = LAST_WINS
+'''
+from yawf.exceptions import MessageSpecNotRegisteredError
+from yawf.messages.message import Message
+
+__all__ = ['LAST_WINS', 'DROP_DUPLICATES', 'coalesce_messages']
+
+LAST_WINS = 'last_wins'
+DROP_DUPLICATES = 'drop_duplicates'
+
+
+def coalesce_messages(workflow, messages, timestamps=None):
+    '''
+    Merges consecutive messages according to their specs' coalescing
+    policies. Messages are never reordered.
+
+    :param messages: list of uncleaned messages in queue order
+    :param timestamps:
+        list of datetimes when messages were queued, required for
+        ``DROP_DUPLICATES`` policy with ``coalesce_window``
+    :return:
+        list of ``(message, coalesced)`` pairs, where ``message`` should be
+        dispatched and ``coalesced`` is a list of messages merged into it
+    '''
+    if timestamps is None:
+        timestamps = [None] * len(messages)
+
+    groups = []
+    current = None
+
+    for message, timestamp in zip(messages, timestamps):
+        if current is not None and _can_merge(workflow, current, message,
+                                              timestamp):
+            current['messages'].append(message)
+            continue
+
+        current = {
+            'messages': [message],
+            'started_at': timestamp,
+        }
+        groups.append(current)
+
+    return [_merge(workflow, group['messages']) for group in groups]
+
+
+def _get_policy(workflow, message_id):
+    try:
+        spec = workflow.get_message_spec(message_id)
+    except MessageSpecNotRegisteredError:
+        # will be rejected by dispatcher
+        return None, None
+    return spec.coalesce, spec.coalesce_window
+
+
+def _can_merge(workflow, group, message, timestamp):
+    first = group['messages'][0]
+    if first.id != message.id or first.sender != message.sender:
+        return False
+
+    policy, window = _get_policy(workflow, message.id)
+
+    if policy == LAST_WINS:
+        return True
+    elif policy == DROP_DUPLICATES:
+        if dict(first.raw_params.items()) != dict(message.raw_params.items()):
+            return False
+        if window is None:
+            return True
+        started_at = group['started_at']
+        if started_at is None or timestamp is None:
+            return False
+        delta = timestamp - started_at
+        return delta.days * 86400 + delta.seconds <= window
+    return False
+
+
+def _merge(workflow, messages):
+    if len(messages) == 1:
+        return messages[0], []
+
+    policy, _window = _get_policy(workflow, messages[0].id)
+
+    if policy == DROP_DUPLICATES:
+        return messages[0], messages[1:]
+
+    last = messages[-1]
+    params = {}
+    for message in messages:
+        params.update(message.raw_params.items())
+
+    merged = Message(last.sender, last.id,
+        raw_params=params,
+        unique_id=last.unique_id)
+    return merged, messages[:-1]
@@ -9,14 +9,16 @@ class Message(object):
 
     def __init__(self, sender, message_id,
             raw_params=None, message_group=None, parent_message_id=None,
-            clean_params=None):
+            clean_params=None, unique_id=None):
         self.sender = sender
         self.id = message_id
-        self._unique_id = None
+        self._unique_id = unique_id
         self.raw_params = raw_params if raw_params is not None else {}
         self.clean_params = clean_params if clean_params is not None else None
         self.params = None
-        self.dehydrated_params = None
+        self._dehydrated_params = None
+        # object to dehydrate params against on first access
+        self._dehydration_obj = None
         self.parent_message_id = parent_message_id
         self.message_group = message_group\
             if message_group is not None else self.unique_id
@@ -52,10 +54,37 @@ class Message(object):
 
         return self
 
-    def dehydrate_params(self, workflow, obj):
+    def dehydrate_params(self, workflow, obj, lazy=False):
+        '''
+        Dehydrates params of message against `obj` with spec's
+        ``dehydrate_params`` (never called for specs with
+        ``skip_dehydration``).
+
+        If `lazy` is True, spec's method is called on first access to
+        :py:attr:`dehydrated_params` instead. Note that it can happen after
+        transition is committed, so lookups made by the method see the
+        database state after transition.
+        '''
         if self.params is None:
             raise RuntimeError(
                 'Method dehydrate_params cannot be invoked before clean')
 
-        self.dehydrated_params = self.spec.dehydrate_params(obj, self)
+        if self.spec.skip_dehydration:
+            self.dehydrated_params = None
+        elif lazy:
+            self._dehydration_obj = obj
+        else:
+            self.dehydrated_params = self.spec.dehydrate_params(obj, self)
         return self
+
+    @property
+    def dehydrated_params(self):
+        if self._dehydration_obj is not None:
+            obj, self._dehydration_obj = self._dehydration_obj, None
+            self._dehydrated_params = self.spec.dehydrate_params(obj, self)
+        return self._dehydrated_params
+
+    @dehydrated_params.setter
+    def dehydrated_params(self, value):
+        self._dehydration_obj = None
+        self._dehydrated_params = value
@@ -0,0 +1,184 @@
+'''
+Declarative validators of message params.
+
+Message spec can declare ``params_schema`` instead of a form:
+
+>>> class MoveMessage(MessageSpec):
+...     id = 'move'
+...     params_schema = {
+...         'pos_x': int,
+...         'pos_y': Param(int, min_value=0),
+...         'comment': Param(unicode, required=False, max_length=200),
+...     }
+
+Schema is compiled once, when spec is created, into validator class with
+django form interface (``is_valid``, ``cleaned_data`` and ``errors``), so
+:py:class:`yawf.exceptions.MessageValidationError` works the same way, but
+no form or field objects are created to validate params.
+'''
+from django.core.validators import EMPTY_VALUES, MinValueValidator,\
+        MaxValueValidator, MinLengthValidator, MaxLengthValidator
+from django.forms.fields import Field, IntegerField, FloatField,\
+        ChoiceField
+from django.forms.util import ErrorDict, ErrorList
+from django.utils.encoding import force_unicode
+
+__all__ = ['Param', 'SchemaValidator', 'compile_schema']
+
+
+def _parse_bool(value):
+    # the same as django.forms.BooleanField
+    if isinstance(value, basestring) and value.lower() in ('false', '0'):
+        return False
+    return bool(value)
+
+
+# type -> (parser, message for unparsable value)
+_PARSERS = {
+    int: (lambda value: int(str(value)),
+          IntegerField.default_error_messages['invalid']),
+    long: (lambda value: long(str(value)),
+           IntegerField.default_error_messages['invalid']),
+    float: (float, FloatField.default_error_messages['invalid']),
+    bool: (_parse_bool, Field.default_error_messages['invalid']),
+    unicode: (force_unicode, Field.default_error_messages['invalid']),
+    str: (force_unicode, Field.default_error_messages['invalid']),
+}
+
+
+class Param(object):
+    '''
+    Declaration of single param: its type and constraints.
+    '''
+
+    def __init__(self, type_=unicode, required=True, default=None,
+            min_value=None, max_value=None,
+            min_length=None, max_length=None,
+            choices=None):
+        if type_ not in _PARSERS:
+            raise TypeError('Unsupported param type: %r' % (type_,))
+        self.type_ = type_
+        self.required = required
+        self.default = default
+        self.min_value = min_value
+        self.max_value = max_value
+        self.min_length = min_length
+        self.max_length = max_length
+        self.choices = choices
+        super(Param, self).__init__()
+
+
+class _Invalid(Exception):
+
+    def __init__(self, message, params=None):
+        super(_Invalid, self).__init__(message, params)
+        self.message = message
+        self.params = params
+
+    def __unicode__(self):
+        message = force_unicode(self.message)
+        return message % self.params if self.params else message
+
+
+def _compile_param(param):
+    parse, invalid_message = _PARSERS[param.type_]
+
+    # (check, message, get message params) in order of django validators
+    checks = []
+    if param.min_value is not None:
+        checks.append((lambda value, limit=param.min_value: value >= limit,
+            MinValueValidator.message,
+            lambda value, limit=param.min_value: {'limit_value': limit}))
+    if param.max_value is not None:
+        checks.append((lambda value, limit=param.max_value: value <= limit,
+            MaxValueValidator.message,
+            lambda value, limit=param.max_value: {'limit_value': limit}))
+    if param.min_length is not None:
+        checks.append((
+            lambda value, limit=param.min_length: len(value) >= limit,
+            MinLengthValidator.message,
+            lambda value, limit=param.min_length: {
+                'limit_value': limit, 'show_value': len(value)}))
+    if param.max_length is not None:
+        checks.append((
+            lambda value, limit=param.max_length: len(value) <= limit,
+            MaxLengthValidator.message,
+            lambda value, limit=param.max_length: {
+                'limit_value': limit, 'show_value': len(value)}))
+    if param.choices is not None:
+        choices = frozenset(param.choices)
+        checks.append((lambda value: value in choices,
+            ChoiceField.default_error_messages['invalid_choice'],
+            lambda value: {'value': value}))
+
+    required, default = param.required, param.default
+
+    def clean(value):
+        if value in EMPTY_VALUES:
+            if required:
+                raise _Invalid(Field.default_error_messages['required'])
+            return default
+
+        try:
+            value = parse(value)
+        except (TypeError, ValueError):
+            raise _Invalid(invalid_message)
+
+        for check, message, get_params in checks:
+            if not check(value):
+                raise _Invalid(message, get_params(value))
+        return value
+
+    return clean
+
+
+class SchemaValidator(object):
+    '''
+    Base class of compiled schema validators, see :py:func:`compile_schema`.
+    '''
+
+    # tuple of (param name, clean function)
+    params = ()
+
+    def __init__(self, data=None, *args, **kwargs):
+        self.data = data if data is not None else {}
+        self._errors = None
+        super(SchemaValidator, self).__init__()
+
+    @property
+    def errors(self):
+        if self._errors is None:
+            self.full_clean()
+        return self._errors
+
+    def is_valid(self):
+        return not self.errors
+
+    def full_clean(self):
+        data = self.data
+        cleaned_data = {}
+        errors = ErrorDict()
+
+        for name, clean in self.params:
+            try:
+                cleaned_data[name] = clean(data.get(name))
+            except _Invalid as e:
+                errors[name] = ErrorList([unicode(e)])
+
+        self._errors = errors
+        if not errors:
+            self.cleaned_data = cleaned_data
+
+
+def compile_schema(schema, name='SchemaValidator'):
+    '''
+    Returns validator class for `schema` -- dict of param name to type or
+    :py:class:`Param`.
+    '''
+    params = []
+    for param_name, param in sorted(schema.iteritems()):
+        if not isinstance(param, Param):
+            param = Param(param)
+        params.append((param_name, _compile_param(param)))
+
+    return type(name, (SchemaValidator,), {'params': tuple(params)})
@@ -1,3 +1,9 @@
+from yawf.messages.schema import compile_schema
+
+# param names passed to handlers besides message params
+RESERVED_PARAMS = frozenset(['computed'])
+
+
 class EmptyValidator(object):
     '''
     Class with django-form behaviour that filters out all incoming data,
@@ -23,7 +29,8 @@ class MessageSpec(object):
     Message spec knows:
       * it's unique ``id'';
       * how to represent spec for humans (using ``verb'' in __unicode__);
-      * how to validate parameters for this message (using ``validator_cls'');
+      * how to validate parameters for this message (using ``validator_cls''
+        or ``params_schema'');
       * priority (``rank'' attribute).
     '''
     # unique (in scope of single workflow) message id (typically str)
@@ -32,8 +39,18 @@ class MessageSpec(object):
     verb = None
     # validator class -- with django.forms.Form interface
     validator_cls = EmptyValidator
+    # dict of param name to type or yawf.messages.schema.Param, compiled
+    # to validator_cls
+    params_schema = None
+    # True if dehydrate_params isn't needed, set automatically for specs
+    # that don't override it
+    skip_dehydration = False
     # rank used to sort specs
     rank = 0
+    # policy to merge queued messages, see yawf.messages.coalesce
+    coalesce = None
+    # time window (in seconds) for DROP_DUPLICATES policy
+    coalesce_window = None
 
     id_grouper = '__'
     is_grouped = False
@@ -47,6 +64,21 @@ class MessageSpec(object):
         for attr, value in attrs.iteritems():
             setattr(self, attr, value)
 
+        if getattr(self.dehydrate_params, 'im_func', None) is\
+                MessageSpec.dehydrate_params.im_func:
+            self.skip_dehydration = True
+
+        if self.params_schema is not None:
+            self.validator_cls = compile_schema(self.params_schema,
+                '%sValidator' % self.__class__.__name__)
+
+        param_names = set(self.params_schema or ())
+        param_names.update(getattr(self.validator_cls, 'base_fields', ()))
+        reserved = param_names & RESERVED_PARAMS
+        if reserved:
+            raise ValueError('Message params can\'t be named %s' %
+                ', '.join(sorted(reserved)))
+
         grouper = self.id_grouper
         message_id = self.id
 
@@ -23,14 +23,15 @@ class Submessage(object):
             message_group=parent.message_group,
         )
 
-    def dispatch(self, parent_obj, parent_message):
+    def dispatch(self, parent_obj, parent_message, **dispatch_options):
         from yawf.dispatch import dispatch_message
         message = self.as_message(parent_message)
         return dispatch_message(
             self.obj,
             message=message,
             defer_side_effect=True,
-            need_lock_object=self.need_lock_object)
+            need_lock_object=self.need_lock_object,
+            **dispatch_options)
 
 
 class RecursiveSubmessage(Submessage):
@@ -41,11 +42,12 @@ class RecursiveSubmessage(Submessage):
             sender=sender, message_id=message_id,
             params=params, raw_params=raw_params)
 
-    def dispatch(self, parent_obj, parent_message):
+    def dispatch(self, parent_obj, parent_message, **dispatch_options):
         from yawf.dispatch import dispatch_message
         message = self.as_message(parent_message)
         return dispatch_message(
             parent_obj,
             message=message,
             defer_side_effect=True,
-            need_lock_object=False)
+            need_lock_object=False,
+            **dispatch_options)
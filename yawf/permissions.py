@@ -103,3 +103,43 @@ C = AndChecker
 # basic checkers
 allow_to_all = OrChecker(lambda obj, sender: True)
 restrict_to_all = OrChecker(lambda obj, sender: False)
+
+
+def is_always_allowed(checker):
+    '''
+    Returns True if checker is known to pass for any object and sender
+    without calling it (i.e. it is built from ``allow_to_all``).
+    '''
+    if checker is allow_to_all:
+        return True
+    if type(checker) is OrChecker:
+        return any(is_always_allowed(c) for c in checker._checkers)
+    if type(checker) is AndChecker:
+        return all(is_always_allowed(c) for c in checker._checkers)
+    return False
+
+
+def not_cacheable(checker):
+    '''
+    Marks checker that depends on data other than object and sender, so
+    that :py:func:`yawf.allowed.get_allowed` result is not cached for
+    states where the checker is used.
+    '''
+    checker.cacheable = False
+    return checker
+
+
+def cache_key(key_func):
+    '''
+    Decorator for checkers that depend on external data. ``key_func`` takes
+    object and sender and returns hashable value that is added to
+    :py:func:`yawf.allowed.get_allowed` cache key:
+
+    >>> @cache_key(lambda obj, sender: obj.owner.is_active)
+    ... def is_owner_active(obj, sender):
+    ...     return obj.owner.is_active
+    '''
+    def decorator(checker):
+        checker.cache_key_func = key_func
+        return checker
+    return decorator
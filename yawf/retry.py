@@ -0,0 +1,63 @@
+import random
+import time
+
+from yawf.exceptions import OldStateInconsistenceError,\
+         ConcurrentRevisionUpdate
+
+__all__ = ['RetryPolicy']
+
+
+class RetryPolicy(object):
+    '''
+    Describes how :py:func:`yawf.dispatch.dispatch_message` retries
+    transitions failed because of concurrent object update.
+
+    Delay before attempt ``n + 1`` is ``backoff * 2 ** (n - 1)`` seconds
+    (but no more than ``max_backoff``). With ``jitter`` enabled actual delay
+    is a random value between zero and that number, so concurrent callers
+    don't retry in lockstep. If ``deadline`` (in seconds, counting from the
+    first attempt) is given, no retry is made after it.
+
+    Policy keeps no state, so single instance can be shared between
+    threads.
+
+    Example:
+
+    >>> dispatch(obj, user, 'edit', params,
+    ...     retry_policy=RetryPolicy(max_attempts=5, deadline=2))
+    '''
+
+    retry_on = (ConcurrentRevisionUpdate, OldStateInconsistenceError)
+
+    def __init__(self, max_attempts=3, backoff=0.05, max_backoff=1.0,
+            jitter=True, deadline=None):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        super(RetryPolicy, self).__init__()
+
+    def get_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def can_retry(self, attempt, started_at):
+        if attempt >= self.max_attempts:
+            return False
+
+        if self.deadline is not None:
+            return time.time() < started_at + self.deadline
+
+        return True
+
+    def wait(self, attempt, started_at):
+        delay = self.get_delay(attempt)
+
+        if self.deadline is not None:
+            delay = min(delay, max(0, started_at + self.deadline - time.time()))
+
+        if delay > 0:
+            time.sleep(delay)
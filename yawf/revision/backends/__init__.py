@@ -8,3 +8,6 @@ class RevisionManager(object):
 
     def bind_revision(self, obj, attrname='revision'):
         pass
+
+    def bind_revision_many(self, queryset, attrname='revision'):
+        pass
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 import reversion
+from django.contrib.contenttypes.models import ContentType
 
 from . import RevisionManager
 
@@ -23,6 +24,23 @@ class ReversionMerger(object):
         return self
 
 
+class ReversionBulkMerger(ReversionMerger):
+
+    def __init__(self, queryset, attrname):
+        self.queryset = queryset
+        super(ReversionBulkMerger, self).__init__(attrname)
+
+    def create(self, revision):
+        # generic foreign keys cannot be used in update(), so we are
+        # updating underlying fields
+        gfk = [f for f in self.queryset.model._meta.virtual_fields
+               if f.name == self.attrname][0]
+        self.queryset.update(**{
+            gfk.ct_field: ContentType.objects.get_for_model(revision),
+            gfk.fk_field: revision.pk,
+        })
+
+
 class ReversionRevisionManager(RevisionManager):
 
     def __enter__(self):
@@ -35,3 +53,6 @@ class ReversionRevisionManager(RevisionManager):
 
     def bind_revision(self, obj, attrname='revision'):
         reversion.add_meta(ReversionMerger(attrname), obj=obj)
+
+    def bind_revision_many(self, queryset, attrname='revision'):
+        reversion.add_meta(ReversionBulkMerger(queryset, attrname))
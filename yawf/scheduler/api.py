@@ -0,0 +1,189 @@
+'''
+Timed transitions.
+
+Workflow declares messages to dispatch when object stays in a state for
+too long:
+
+>>> class OrderWorkflow(WorkflowBase):
+...     timeouts = {'pending': (timedelta(hours=48), 'cancel')}
+
+Every transition entering or leaving such a state maintains
+:py:class:`yawf.scheduler.models.ScheduledTimeout` records, and
+``yawf_scheduler`` management command dispatches due messages:
+
+>>> fire_due(batch_size=100)
+'''
+import datetime
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.contrib.contenttypes.models import ContentType
+
+from yawf import get_workflow
+from yawf.dispatch import dispatch
+from yawf.utils import select_for_update
+from yawf.scheduler.models import ScheduledTimeout
+
+__all__ = ['update_timeouts', 'update_timeouts_bulk', 'claim_due',
+           'fire_due']
+
+logger = logging.getLogger(__name__)
+
+
+def update_timeouts(workflow, old_obj, new_obj, now=None):
+    '''
+    Removes timeout of the state `old_obj` leaves and schedules timeout of
+    the state `new_obj` enters.
+    '''
+    update_timeouts_bulk(workflow, type(new_obj), [new_obj.pk],
+        getattr(old_obj, workflow.state_attr_name),
+        getattr(new_obj, workflow.state_attr_name),
+        now=now)
+
+
+def update_timeouts_bulk(workflow, model_class, object_ids,
+        old_state, new_state, now=None):
+    '''
+    The same as :py:func:`update_timeouts` for several objects moved from
+    `old_state` to `new_state` at once.
+    '''
+    if old_state == new_state:
+        return
+
+    old_timeout = workflow.get_timeout(old_state)
+    new_timeout = workflow.get_timeout(new_state)
+    if old_timeout is None and new_timeout is None:
+        return
+
+    content_type = ContentType.objects.get_for_model(model_class)
+    timeouts = ScheduledTimeout.objects.filter(
+        workflow_id=workflow.id,
+        content_type=content_type,
+        object_id__in=object_ids)
+
+    if old_timeout is not None:
+        timeouts.filter(state=old_state).delete()
+
+    if new_timeout is not None:
+        delta, message_id = new_timeout
+        if now is None:
+            now = datetime.datetime.now()
+        timeouts.filter(state=new_state).delete()
+        ScheduledTimeout.objects.bulk_create([
+            ScheduledTimeout(
+                workflow_id=workflow.id,
+                content_type=content_type,
+                object_id=object_id,
+                state=new_state,
+                message=message_id,
+                due_at=now + delta)
+            for object_id in object_ids])
+
+
+def claim_due(batch_size=100, lease=300, now=None):
+    '''
+    Claims up to `batch_size` due timeouts for `lease` seconds.
+
+    On postgresql rows are selected with ``FOR UPDATE SKIP LOCKED``, so
+    concurrent workers don't wait for each other.
+
+    :return: list of claimed records ordered by due time
+    '''
+    if now is None:
+        now = datetime.datetime.now()
+    claimed_until = now + datetime.timedelta(seconds=lease)
+
+    with transaction.commit_on_success():
+        ids = _select_due_ids(now, batch_size)
+        if not ids:
+            return []
+        ScheduledTimeout.objects.filter(id__in=ids)\
+            .update(claimed_until=claimed_until)
+
+    return list(ScheduledTimeout.objects
+        .filter(id__in=ids, claimed_until=claimed_until)
+        .order_by('due_at'))
+
+
+def fire_due(batch_size=100, sender=None, now=None):
+    '''
+    Dispatches messages of due timeouts.
+
+    Timeout is done when message moves object to other state. If object
+    stays in the state (message failed, was ignored or kept the state),
+    timeout is scheduled again from `now`, failure is logged.
+
+    :return: number of fired timeouts
+    '''
+    if now is None:
+        now = datetime.datetime.now()
+
+    records = claim_due(batch_size, now=now)
+
+    for record in records:
+        _fire(record, sender, now)
+
+    return len(records)
+
+
+def _fire(record, sender, now):
+    workflow = get_workflow(record.workflow_id)
+    obj = record.instance
+
+    if workflow is None or obj is None:
+        logger.warning(u"Dropping timeout %s: workflow or object is gone",
+            record.id)
+    else:
+        if hasattr(obj, 'get_clarified_instance'):
+            obj = obj.get_clarified_instance()
+
+        state = getattr(obj, workflow.state_attr_name)
+        if state != record.state:
+            logger.info(u"Dropping timeout %s: object %s left state %s",
+                record.id, obj.pk, record.state)
+        else:
+            try:
+                obj, _, _ = dispatch(obj, sender, record.message)
+            except Exception as e:
+                logger.warning(u"Timeout message %s to object %s failed: %r",
+                    record.message, obj.pk, e)
+
+            timeout = workflow.get_timeout(record.state)
+            if getattr(obj, workflow.state_attr_name) == record.state and\
+                    timeout is not None:
+                # timeout of the state still applies, record is already
+                # deleted if object has moved concurrently
+                ScheduledTimeout.objects.filter(id=record.id).update(
+                    due_at=now + timeout[0], claimed_until=None)
+                return
+
+    # transition to other state has already deleted it, if succeeded
+    ScheduledTimeout.objects.filter(id=record.id).delete()
+
+
+def _select_due_ids(now, batch_size):
+    if connection.vendor == 'postgresql':
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT %(id)s FROM %(table)s'
+            ' WHERE %(due_at)s <= %%s'
+            ' AND (%(claimed_until)s IS NULL OR %(claimed_until)s <= %%s)'
+            ' ORDER BY %(due_at)s LIMIT %%s'
+            ' FOR UPDATE SKIP LOCKED' % {
+                'id': qn('id'),
+                'table': qn(ScheduledTimeout._meta.db_table),
+                'due_at': qn('due_at'),
+                'claimed_until': qn('claimed_until'),
+            },
+            [now, now, batch_size])
+        return [row[0] for row in cursor.fetchall()]
+
+    return list(select_for_update(
+        ScheduledTimeout.objects
+            .filter(due_at__lte=now)
+            .filter(Q(claimed_until__isnull=True) |
+                    Q(claimed_until__lte=now))
+            .order_by('due_at')
+            .values_list('id', flat=True))[:batch_size])
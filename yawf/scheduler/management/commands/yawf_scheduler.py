@@ -0,0 +1,33 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from yawf import autodiscover
+from yawf.scheduler.api import fire_due
+
+
+class Command(BaseCommand):
+
+    help = 'Dispatches messages of workflow states timeouts.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', default=100,
+            help='Max number of timeouts claimed at once'),
+        make_option('--interval', type='float', default=10.0,
+            help='Seconds to sleep when there are no due timeouts'),
+        make_option('--once', action='store_true', default=False,
+            help='Fire due timeouts once and exit'),
+    )
+
+    def handle(self, **options):
+        autodiscover()
+
+        while True:
+            fired = fire_due(batch_size=options['batch_size'])
+            if fired:
+                print 'Fired %d timeouts' % fired
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
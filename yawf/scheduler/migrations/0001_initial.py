@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'ScheduledTimeout'
+        db.create_table('scheduler_scheduledtimeout', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('workflow_id', self.gf('django.db.models.fields.CharField')(max_length=64)),
+            ('content_type', self.gf('django.db.models.fields.related.ForeignKey')(related_name='scheduled_timeouts_instance', to=orm['contenttypes.ContentType'])),
+            ('object_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('state', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('message', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('created_at', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, blank=True)),
+            ('due_at', self.gf('django.db.models.fields.DateTimeField')(db_index=True)),
+            ('claimed_until', self.gf('django.db.models.fields.DateTimeField')(null=True, blank=True)),
+        ))
+        db.send_create_signal('scheduler', ['ScheduledTimeout'])
+
+        # Adding unique constraint on 'ScheduledTimeout', fields ['workflow_id', 'content_type', 'object_id', 'state']
+        db.create_unique('scheduler_scheduledtimeout', ['workflow_id', 'content_type_id', 'object_id', 'state'])
+
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'ScheduledTimeout', fields ['workflow_id', 'content_type', 'object_id', 'state']
+        db.delete_unique('scheduler_scheduledtimeout', ['workflow_id', 'content_type_id', 'object_id', 'state'])
+
+        # Deleting model 'ScheduledTimeout'
+        db.delete_table('scheduler_scheduledtimeout')
+
+
+    models = {
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'scheduler.scheduledtimeout': {
+            'Meta': {'unique_together': "(('workflow_id', 'content_type', 'object_id', 'state'),)", 'object_name': 'ScheduledTimeout'},
+            'claimed_until': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'scheduled_timeouts_instance'", 'to': "orm['contenttypes.ContentType']"}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'due_at': ('django.db.models.fields.DateTimeField', [], {'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'message': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'state': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'workflow_id': ('django.db.models.fields.CharField', [], {'max_length': '64'})
+        }
+    }
+
+    complete_apps = ['scheduler']
\ No newline at end of file
@@ -0,0 +1,59 @@
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes import generic
+
+from yawf.signals import transition_handled, bulk_transition_handled
+
+
+class ScheduledTimeout(models.Model):
+    '''
+    Message to dispatch when object stays in state until ``due_at``.
+
+    Records are maintained on every transition to or from a state listed in
+    workflow's ``timeouts``. Worker claims record by moving
+    ``claimed_until`` forward, so record of crashed worker is picked up
+    again after claim expires.
+    '''
+
+    class Meta:
+
+        unique_together = ('workflow_id', 'content_type', 'object_id', 'state')
+
+    workflow_id = models.CharField(max_length=64)
+
+    # Generic foreign key to waiting instance
+    content_type = models.ForeignKey(ContentType,
+            related_name='scheduled_timeouts_instance')
+    object_id = models.PositiveIntegerField()
+    instance = generic.GenericForeignKey()
+
+    state = models.CharField(max_length=32)
+    message = models.CharField(max_length=32)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    due_at = models.DateTimeField(db_index=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+
+def handle_transition(sender, **kwargs):
+    from yawf.scheduler.api import update_timeouts
+
+    store = kwargs.get('store')
+    if store is not None and not store.persistent:
+        return
+
+    update_timeouts(kwargs['workflow'],
+        kwargs['instance'], kwargs['new_instance'])
+
+transition_handled.connect(handle_transition,
+    dispatch_uid='yawf.scheduler.handle_transition')
+
+
+def handle_bulk_transition(sender, **kwargs):
+    from yawf.scheduler.api import update_timeouts_bulk
+
+    update_timeouts_bulk(kwargs['workflow'], kwargs['model_class'],
+        kwargs['object_ids'], kwargs['state_from'], kwargs['state_to'])
+
+bulk_transition_handled.connect(handle_bulk_transition,
+    dispatch_uid='yawf.scheduler.handle_bulk_transition')
@@ -1,5 +1,4 @@
 from datetime import datetime, date
-from operator import attrgetter
 from functools import partial
 
 from django.db import models
@@ -13,28 +12,101 @@ from django.utils.translation import force_unicode
 from yawf.handlers import SerializibleHandlerResult
 
 
+def _encode_promise(encoder, o):
+    return force_unicode(o)
+
+
+def _encode_datetime(encoder, o):
+    return o.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _encode_date(encoder, o):
+    return o.strftime("%Y-%m-%d")
+
+
+def _encode_model(encoder, o):
+    return force_unicode(o.pk)
+
+
+def _encode_natural_key(encoder, o):
+    # natural_key can make queries, so it's computed once per object
+    if o.pk is None:
+        return o.natural_key()
+    key = (type(o), o.pk)
+    try:
+        return encoder.natural_keys[key]
+    except KeyError:
+        natural_key = encoder.natural_keys[key] = o.natural_key()
+        return natural_key
+
+
+def _encode_queryset(encoder, o):
+    if o._result_cache is not None and not o._iter:
+        return [obj.pk for obj in o._result_cache]
+    # fetched in chunks by database cursor, no model instances are built
+    return list(o.values_list('pk', flat=True).iterator())
+
+
+def _encode_set(encoder, o):
+    return list(o)
+
+
+def _encode_handler_result(encoder, o):
+    return o.get_serializible_value()
+
+
+# (base class, encoder function) in order of precedence
+_ENCODERS = (
+    (Promise, _encode_promise),
+    (datetime, _encode_datetime),
+    (date, _encode_date),
+    (models.Model, _encode_model),
+    (models.query.QuerySet, _encode_queryset),
+    (set, _encode_set),
+    (SerializibleHandlerResult, _encode_handler_result),
+)
+
+# class -> encoder function or None (for default django encoding)
+_encoders_by_class = {}
+
+
+def _get_encoder(cls):
+    try:
+        return _encoders_by_class[cls]
+    except KeyError:
+        pass
+
+    encode = None
+    for base, base_encode in _ENCODERS:
+        if issubclass(cls, base):
+            encode = base_encode
+            break
+
+    if encode is _encode_model and hasattr(cls, 'natural_key'):
+        encode = _encode_natural_key
+
+    _encoders_by_class[cls] = encode
+    return encode
+
+
 class CustomJSONEncoder(DjangoJSONEncoder):
+    '''
+    JSON encoder of message params and handler results.
+
+    Encoding function is looked up once per class. Model instances are
+    encoded as natural key (computed once per object during single dump)
+    or pk, querysets as list of pks.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self.natural_keys = {}
+        super(CustomJSONEncoder, self).__init__(*args, **kwargs)
 
     def default(self, o):
-        if isinstance(o, Promise):
-            return force_unicode(o)
-        elif isinstance(o, datetime):
-            return o.strftime("%Y-%m-%dT%H:%M:%S")
-        elif isinstance(o, date):
-            return o.strftime("%Y-%m-%d")
-        elif isinstance(o, models.Model):
-            if hasattr(o, 'natural_key'):
-                return o.natural_key()
-            else:
-                return force_unicode(o.pk)
-        elif isinstance(o, models.query.QuerySet):
-            return map(attrgetter('pk'), o)
-        elif isinstance(o, set):
-            return list(o)
-        elif isinstance(o, SerializibleHandlerResult):
-            return o.get_serializible_value()
-        else:
+        encode = _get_encoder(type(o))
+        if encode is None:
             return super(CustomJSONEncoder, self).default(o)
+        return encode(self, o)
 
 dumps = partial(sj_dumps, cls=CustomJSONEncoder)
 
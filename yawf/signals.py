@@ -9,6 +9,7 @@ message_handled = Signal(
         'transition_result',
         'side_effect_result',
         'log_record',
+        'retries',
     ])
 
 transition_handled = Signal(
@@ -17,5 +18,25 @@ transition_handled = Signal(
         'message',
         'instance',
         'new_instance',
-        'transition_result'
+        'transition_result',
+        'store',
+    ])
+
+bulk_transition_handled = Signal(
+    providing_args=[
+        'workflow',
+        'message',
+        'model_class',
+        'object_ids',
+        'state_from',
+        'state_to',
+    ])
+
+message_retried = Signal(
+    providing_args=[
+        'workflow',
+        'message',
+        'instance',
+        'attempt',
+        'exception',
     ])
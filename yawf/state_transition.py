@@ -3,16 +3,15 @@ import copy
 import logging
 from types import GeneratorType
 
-from django.db import transaction
-
 from yawf.signals import transition_handled
-from yawf.utils import select_for_update
+from yawf.store import default_store
 from yawf.config import REVISION_ATTR, USE_SELECT_FOR_UPDATE,\
         TRANSACTIONAL_SIDE_EFFECT
 from yawf import get_workflow_by_instance
 from yawf.exceptions import OldStateInconsistenceError,\
          ConcurrentRevisionUpdate
 from yawf.messages.submessage import Submessage
+from yawf.effects import PendingEffects
 from yawf.transformation import TransformationResult
 
 logger = logging.getLogger(__name__)
@@ -21,14 +20,16 @@ logger = logging.getLogger(__name__)
 def transition(workflow, obj, message, state_transition,
         extra_context=None,
         transactional_side_effect=TRANSACTIONAL_SIDE_EFFECT,
-        need_lock_object=USE_SELECT_FOR_UPDATE):
+        need_lock_object=USE_SELECT_FOR_UPDATE,
+        store=None):
     '''
     Function-dispatcher that allows to control the performing of
     side-effect actions.
 
     :param transactional_side_effect:
         If `transactional_side_effect` is True, then side effect will be
-        performed by :py:func:`transactional_transition`.
+        performed by :py:func:`transactional_transition` (after commit if
+        some effect has compute step).
 
         Otherwise, it will be performed after handler commit.
 
@@ -41,22 +42,25 @@ def transition(workflow, obj, message, state_transition,
             state_transition,
             extra_context=extra_context,
             transactional_side_effect=transactional_side_effect,
-            need_lock_object=need_lock_object)
+            need_lock_object=need_lock_object,
+            store=store)
 
-    if not transactional_side_effect:
+    # effects with compute steps are left pending by transaction
+    if isinstance(effect_result, PendingEffects):
         effect_result = effect_result()
 
     return new_obj, transition_result, effect_result
 
 
-@transaction.commit_on_success
 def transactional_transition(workflow, obj, message, state_transition,
         extra_context=None,
         transactional_side_effect=True,
-        need_lock_object=True):
+        need_lock_object=True,
+        store=None):
     '''
     Performs an extended state transition for object `obj`. Uses
-    `commit_on_success` to wrap itself in single transaction.
+    store transaction (`commit_on_success` for database store) to wrap
+    itself in single transaction.
 
     :param workflow:
         :py:class:`yawf.workflow.WorkflowBase` instance, representing object's
@@ -80,42 +84,46 @@ def transactional_transition(workflow, obj, message, state_transition,
         be returned as a second element of result tuple.
     :param transactional_side_effect:
         Boolean flag. If `True`, then side effect actions will be performed
-        just after state_transition func in single transaction. Otherwise,
-        deferred side effect list will be returned (i.e. callable that
-        will actually evaluate side effects and return a list of results)
+        just after state_transition func in single transaction (unless
+        some of them has compute step, that mustn't run while object is
+        locked). Otherwise, deferred side effect list will be returned
+        (i.e. callable that will actually evaluate side effects and return
+        a list of results)
+    :param store:
+        :py:class:`yawf.store.BaseStore` instance used to fetch and lock
+        object. Defaults to :py:data:`yawf.store.default_store`.
     :return:
         Tuple with three values:
          * A new instance of workflow aware object (possibly changed after a
            state transition)
          * State transition result (list in the case of generator-based
            `state_transition` func, arbitrary object otherwise)
-         * Side effect results (either list or a callable to evaluate that list)
+         * Side effect results (either list or
+           :py:class:`yawf.effects.PendingEffects` to evaluate that list)
     '''
+    if store is None:
+        store = default_store
+
+    with store.transaction():
+        return _transactional_transition(workflow, obj, message,
+                state_transition,
+                extra_context=extra_context,
+                transactional_side_effect=transactional_side_effect,
+                need_lock_object=need_lock_object,
+                store=store)
+
+
+def _transactional_transition(workflow, obj, message, state_transition,
+        extra_context, transactional_side_effect, need_lock_object, store):
 
-    old_revision = getattr(obj, REVISION_ATTR, None)
     old_state = getattr(obj, workflow.state_attr_name)
-    obj_id = obj.id
 
     # We select for update object because since THIS point we cares
     # about serialization of access to our: we are going to change it's state
     if need_lock_object:
-        locked_obj = select_for_update(
-                workflow.model_class.objects.filter(id=obj_id)).get()
-        locked_revision = getattr(locked_obj, REVISION_ATTR, None)
-
-        # Checking that revision wasn't updated while we worked with object
-        # without locking
-        if old_revision is not None and locked_revision != old_revision:
-            raise ConcurrentRevisionUpdate(workflow.id, obj_id, old_state)
-
-        # Additional checking of state consistency. Matters only if revision
-        # check is disabled (getattr above returned None)
-        locked_old_state = getattr(locked_obj, workflow.state_attr_name)
-        if locked_old_state != old_state:
-            raise OldStateInconsistenceError(obj_id,
-                    old_state, locked_old_state)
+        locked_obj = lock_object(workflow, obj, store=store)
     else:
-        locked_obj = copy.copy(obj)
+        locked_obj = store.detach(workflow, obj)
 
     # All ok, perform db changes as transaction
     transition_result = state_transition(locked_obj)
@@ -125,7 +133,7 @@ def transactional_transition(workflow, obj, message, state_transition,
     # If action returned generator, evaluating it using special function
     if isinstance(transition_result, GeneratorType):
         handler_result, pending_calls, new_obj = _iterate_transition_result(
-            transition_result, message, locked_obj)
+            transition_result, message, locked_obj, store=store)
     else:
         handler_result = transition_result
         pending_calls = []
@@ -140,7 +148,8 @@ def transactional_transition(workflow, obj, message, state_transition,
             message=message,
             instance=obj,
             new_instance=new_obj,
-            transition_result=handler_result)
+            transition_result=handler_result,
+            store=store)
 
     performed_effects, deferred_effects = perform_side_effect(
                                     obj,
@@ -151,22 +160,94 @@ def transactional_transition(workflow, obj, message, state_transition,
                                     extra_context=extra_context)
 
 
+    side_effect_result = PendingEffects(deferred_effects.invocations,
+                                        pending_calls,
+                                        performed=performed_effects,
+                                        message_group=message.message_group,
+                                        levels=deferred_effects.levels)
+
     # decide to evaluate side effect actions now or defer to caller
-    if transactional_side_effect:
-        side_effect_result = (performed_effects +
-                                list(deferred_effects) +
-                                map(apply, pending_calls))
-    else:
-        side_effect_result = lambda: (performed_effects +
-                                list(deferred_effects) +
-                                map(apply, pending_calls))
+    if transactional_side_effect and not side_effect_result.has_compute:
+        # still inside transaction, so not on effects pool
+        side_effect_result = side_effect_result(concurrent=False)
 
     new_state = getattr(new_obj, workflow.state_attr_name)
-    logger.info("Performed state transition of object %d: %s -> %s",
-            obj_id, old_state, new_state)
+    logger.info("Performed state transition of object %s: %s -> %s",
+            new_obj.id, old_state, new_state)
     return new_obj, handler_result, side_effect_result
 
 
+def lock_object(workflow, obj, store=None):
+    '''
+    Locks object using `store` and checks that it wasn't changed since
+    `obj` was fetched.
+
+    :raise ConcurrentRevisionUpdate: if revision was updated.
+    :raise OldStateInconsistenceError: if state was changed.
+    :return: locked copy of object
+    '''
+    if store is None:
+        store = default_store
+
+    old_revision = getattr(obj, REVISION_ATTR, None)
+    old_state = getattr(obj, workflow.state_attr_name)
+
+    locked_obj = store.lock(workflow, obj)
+    locked_revision = getattr(locked_obj, REVISION_ATTR, None)
+
+    # Checking that revision wasn't updated while we worked with object
+    # without locking
+    if old_revision is not None and locked_revision != old_revision:
+        raise ConcurrentRevisionUpdate(workflow.id, obj.id, old_state)
+
+    # Additional checking of state consistency. Matters only if revision
+    # check is disabled (getattr above returned None)
+    locked_old_state = getattr(locked_obj, workflow.state_attr_name)
+    if locked_old_state != old_state:
+        raise OldStateInconsistenceError(obj.id,
+                old_state, locked_old_state)
+
+    return locked_obj
+
+
+def predict_transition(workflow, obj, message, state_transition):
+    '''
+    Performs `state_transition` on a detached copy of `obj` with saving
+    disabled to find out the outcome of transition without touching
+    database. Submessages are predicted the same way.
+
+    :return:
+        Tuple with three values:
+         * A detached copy of object with changes made by transition
+         * State transition result
+         * Tuple of transactional and deferrable effect lists that would be
+           performed after transition
+    '''
+    detached_obj = copy.copy(obj)
+    detached_obj.save = lambda *args, **kwargs: None
+
+    transition_result = state_transition(detached_obj)
+
+    new_obj = None
+
+    if isinstance(transition_result, GeneratorType):
+        handler_result, _pending_calls, new_obj = _iterate_transition_result(
+            transition_result, message, detached_obj, dry_run=True)
+    else:
+        handler_result = transition_result
+
+    if new_obj is None:
+        new_obj = detached_obj
+
+    old_state = getattr(obj, workflow.state_attr_name)
+    new_state = getattr(new_obj, workflow.state_attr_name)
+    transactional_effects, deferrable_effects = workflow.library\
+        .get_effects_for_transition(old_state, new_state, message.id)
+
+    return new_obj, handler_result,\
+        (transactional_effects or [], deferrable_effects or [])
+
+
 def perform_side_effect(old_obj, new_obj,
         message, workflow=None, extra_context=None, handler_result=None):
 
@@ -184,12 +265,35 @@ def perform_side_effect(old_obj, new_obj,
     if not transactional_effects and not deferrable_effects:
         logger.info(u"Effect undefined: object id %s, state %s -> %s",
                 new_obj.id, old_state, new_state)
-        return [], []
+        return [], PendingEffects()
+
+    effect_kwargs = get_effect_kwargs(old_obj, new_obj, message,
+        extra_context=extra_context, handler_result=handler_result)
 
+    if transactional_effects:
+        performed = [
+            _perform_side_effect(effect, effect_kwargs)
+            for effect in deferrable_effects]
+    else:
+        performed = []
+
+    # deferred effects are performed by PendingEffects in order of their
+    # dependencies
+    deferred = PendingEffects.from_plan(
+        workflow.library.get_effect_plan(old_state, new_state, message.id),
+        [effect_kwargs])
+    return performed, deferred
+
+
+def get_effect_kwargs(old_obj, new_obj, message, extra_context=None,
+        handler_result=None):
+    '''
+    Returns keyword arguments passed to side effects of transition.
+    '''
     if extra_context is None:
         extra_context = {}
 
-    effect_kwargs = dict(
+    return dict(
         old_obj=old_obj,
         obj=new_obj,
         sender=message.sender,
@@ -199,21 +303,6 @@ def perform_side_effect(old_obj, new_obj,
         handler_result=handler_result,
     )
 
-    if transactional_effects:
-        performed = [
-            _perform_side_effect(effect, effect_kwargs)
-            for effect in deferrable_effects]
-    else:
-        performed = []
-
-    if deferrable_effects:
-        deferred = (
-            _perform_side_effect(effect, effect_kwargs)
-            for effect in deferrable_effects)
-    else:
-        deferred = []
-    return performed, deferred
-
 
 def _perform_side_effect(effect, kwargs):
     effect_result = effect(**kwargs)
@@ -223,7 +312,8 @@ def _perform_side_effect(effect, kwargs):
         return effect_result
 
 
-def _iterate_transition_result(transition_result, message, obj):
+def _iterate_transition_result(transition_result, message, obj,
+        **dispatch_options):
 
     pending_calls = []
     handler_result = []
@@ -241,7 +331,8 @@ def _iterate_transition_result(transition_result, message, obj):
             sub_obj, _sub_result, side_effects_performer =\
                                         yielded_value.dispatch(
                                             parent_obj=obj,
-                                            parent_message=message)
+                                            parent_message=message,
+                                            **dispatch_options)
             pending_calls.append(side_effects_performer)
             to_send = sub_obj
         elif isinstance(yielded_value, TransformationResult):
@@ -0,0 +1,150 @@
+import copy
+
+from django.db import transaction
+
+from yawf.utils import select_for_update
+from yawf.message_log.models import MessageLog, log_message,\
+        build_log_record
+from yawf.revision import default_revision_manager
+
+__all__ = ['BaseStore', 'DatabaseStore', 'SessionStore', 'GroupStore',
+           'default_store']
+
+
+class NoTransaction(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class BaseStore(object):
+    '''
+    Storage backend used by dispatching routines.
+
+    Store knows how to fetch a working copy of workflow object (with or
+    without locking), how to wrap a transition in transaction and where to
+    write message log records. Default store is
+    :py:class:`DatabaseStore` that works with django ORM, other stores
+    (see :py:mod:`yawf.store.memory`) allow to run workflows without a
+    database at all.
+    '''
+
+    # revision manager class to use when dispatch_message was called
+    # without explicit revision_manager
+    revision_manager = None
+    # True if objects are written to database, so that database bound
+    # bookkeeping (e.g. timeouts scheduling) should be done
+    persistent = False
+
+    def transaction(self):
+        '''
+        Returns context manager that wraps single transition.
+        '''
+        raise NotImplementedError
+
+    def lock(self, workflow, obj):
+        '''
+        Returns fresh locked copy of object `obj`.
+        '''
+        raise NotImplementedError
+
+    def detach(self, workflow, obj):
+        '''
+        Returns copy of object `obj` to work with without locking.
+        '''
+        raise NotImplementedError
+
+    def refresh(self, workflow, obj):
+        '''
+        Returns fresh copy of object `obj` (without locking).
+        '''
+        raise NotImplementedError
+
+    def log_message(self, sender, **kwargs):
+        '''
+        Writes message log record. Takes the same arguments as
+        :py:func:`yawf.message_log.models.log_message`.
+        '''
+        raise NotImplementedError
+
+
+class DatabaseStore(BaseStore):
+
+    revision_manager = default_revision_manager
+    persistent = True
+
+    def transaction(self):
+        return transaction.commit_on_success()
+
+    def lock(self, workflow, obj):
+        return select_for_update(
+            workflow.model_class.objects.filter(id=obj.id)).get()
+
+    def detach(self, workflow, obj):
+        return copy.copy(obj)
+
+    def refresh(self, workflow, obj):
+        return workflow.model_class.objects.get(id=obj.id)
+
+    def log_message(self, sender, **kwargs):
+        return log_message(sender, **kwargs)
+
+
+class SessionStore(DatabaseStore):
+    '''
+    Store to dispatch several messages within an outer transaction that
+    already holds the lock on `locked_obj`.
+
+    Object is not locked again, message log records are collected and
+    written at once by :py:meth:`flush`.
+    '''
+
+    def __init__(self, workflow, locked_obj):
+        self._locked_key = (workflow.model_class, locked_obj.pk)
+        self.log_records = []
+        super(SessionStore, self).__init__()
+
+    def transaction(self):
+        return NoTransaction()
+
+    def lock(self, workflow, obj):
+        if (workflow.model_class, obj.pk) == self._locked_key:
+            return copy.copy(obj)
+        return super(SessionStore, self).lock(workflow, obj)
+
+    def log_message(self, sender, **kwargs):
+        log_record = build_log_record(sender, **kwargs)
+        self.log_records.append(log_record)
+        return log_record
+
+    def flush(self, revision_context=None):
+        '''
+        Writes collected log records. If `revision_context` is given, all
+        records are bound to its revision.
+        '''
+        if not self.log_records:
+            return
+
+        MessageLog.objects.bulk_create(self.log_records)
+
+        if revision_context is not None:
+            revision_context.bind_revision_many(
+                MessageLog.objects.filter(
+                    uuid__in=[r.uuid for r in self.log_records]))
+        self.log_records = []
+
+
+class GroupStore(DatabaseStore):
+    '''
+    Store to dispatch messages to different objects within an outer
+    transaction (see :py:class:`yawf.executor.GroupCommitExecutor`).
+    '''
+
+    def transaction(self):
+        return NoTransaction()
+
+
+default_store = DatabaseStore()
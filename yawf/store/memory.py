@@ -0,0 +1,93 @@
+import copy
+import itertools
+
+from yawf.config import REVISION_ATTR
+from yawf.revision.backends.dummy import DummyRevisionManager
+from . import BaseStore, NoTransaction
+
+__all__ = ['InMemoryStore']
+
+class InMemoryStore(BaseStore):
+    '''
+    Dict-backed store to simulate workflows without a database.
+
+    Objects are kept as snapshots keyed by (model class, pk). Every copy
+    handed out by the store has its ``save`` method replaced, so handlers
+    calling ``obj.save()`` write to the store instead of database. There is
+    no locking and no transactions, but revision and state consistency
+    checks work the same way as with database.
+
+    Example:
+
+    >>> store = InMemoryStore()
+    >>> new_obj, handler_result, effects = dispatch(
+    ...     obj, sender, 'edit', {'title': 'foo'}, store=store)
+    >>> store.get(Window, new_obj.pk).title
+    u'foo'
+
+    Message log records are collected in ``message_log`` list.
+    '''
+
+    revision_manager = DummyRevisionManager
+
+    def __init__(self):
+        self._objects = {}
+        self._pk_counter = itertools.count(1)
+        self.message_log = []
+        super(InMemoryStore, self).__init__()
+
+    def add(self, obj):
+        '''
+        Puts object to the store (assigning new pk if it has none) and
+        returns a copy bound to the store.
+        '''
+        obj = self._bind(obj)
+        if obj.pk is None:
+            obj.pk = self._pk_counter.next()
+        self._put(obj)
+        return obj
+
+    def get(self, model_class, pk):
+        return self._bind(self._objects[(model_class, pk)])
+
+    def save(self, obj):
+        if obj.pk is None:
+            obj.pk = self._pk_counter.next()
+        if getattr(obj, '_has_revision_support', False):
+            setattr(obj, REVISION_ATTR, getattr(obj, REVISION_ATTR) + 1)
+        self._put(obj)
+
+    def __contains__(self, obj):
+        return (type(obj), obj.pk) in self._objects
+
+    def __len__(self):
+        return len(self._objects)
+
+    def transaction(self):
+        return NoTransaction()
+
+    def lock(self, workflow, obj):
+        if obj.pk is None or obj not in self:
+            return self.add(obj)
+        return self.get(type(obj), obj.pk)
+
+    def detach(self, workflow, obj):
+        return self._bind(obj)
+
+    def refresh(self, workflow, obj):
+        return self.get(type(obj), obj.pk)
+
+    def log_message(self, sender, **kwargs):
+        record = dict(kwargs, workflow_id=sender)
+        self.message_log.append(record)
+        return record
+
+    def _put(self, obj):
+        snapshot = copy.copy(obj)
+        snapshot.__dict__.pop('save', None)
+        self._objects[(type(obj), obj.pk)] = snapshot
+
+    def _bind(self, obj):
+        obj = copy.copy(obj)
+        obj.save = lambda *args, **kwargs: self.save(obj)
+        return obj
@@ -1,3 +1,4 @@
 from __future__ import absolute_import
 from .permissions import *
 from .message_specs import *
+from .effects import *
@@ -0,0 +1,222 @@
+import threading
+
+from django.test import TestCase
+
+import yawf.effects
+from yawf.effects import SideEffect, PendingEffects, perform_pending,\
+        get_effect_levels
+from yawf.exceptions import EffectDependencyCycleError
+from yawf.library import Library
+
+__all__ = ('PendingEffectsTestCase', 'EffectPlanTestCase')
+
+
+def square(value):
+    return value * value
+
+
+class PendingEffectsTestCase(TestCase):
+
+    def test_batch(self):
+
+        calls = []
+
+        class Reindex(SideEffect):
+
+            def perform_batch(self, contexts):
+                calls.append([kwargs['obj'] for kwargs in contexts])
+                return ['reindexed %s' % kwargs['obj'] for kwargs in contexts]
+
+        class Notify(SideEffect):
+
+            def perform(self, obj, **kwargs):
+                calls.append(obj)
+                return 'notified %s' % obj
+
+        reindex, notify = Reindex(), Notify()
+
+        child = PendingEffects([(reindex, {'obj': 2}), (notify, {'obj': 2})])
+        parent = PendingEffects([(reindex, {'obj': 1})], [child],
+            performed=['transactional'])
+        other = PendingEffects([(reindex, {'obj': 3})])
+
+        results = perform_pending([parent, other])
+
+        self.assertListEqual(calls, [[1, 2, 3], 2])
+        self.assertListEqual(results[0], [
+            'transactional',
+            'reindexed 1',
+            ['reindexed 2', 'notified 2'],
+        ])
+        self.assertListEqual(results[1], ['reindexed 3'])
+
+        # performed only once
+        self.assertListEqual(parent(), results[0])
+        self.assertEqual(len(calls), 2)
+
+    def test_dedupe(self):
+
+        calls = []
+
+        class InvalidateParent(SideEffect):
+
+            def dedupe_key(self, obj, **kwargs):
+                return obj['parent']
+
+            def perform(self, obj, **kwargs):
+                calls.append(obj['parent'])
+                return 'invalidated %s' % obj['parent']
+
+        effect = InvalidateParent()
+        invocation = lambda parent: (effect, {'obj': {'parent': parent}})
+
+        children = [
+            PendingEffects([invocation(1)], message_group='a'),
+            PendingEffects([invocation(2)], message_group='a'),
+        ]
+        parent = PendingEffects([invocation(1)], children, message_group='a')
+        other_group = PendingEffects([invocation(1)], message_group='b')
+
+        results = perform_pending([parent, other_group])
+
+        self.assertListEqual(calls, [1, 2, 1])
+        self.assertListEqual(results[0], [
+            'invalidated 1', ['invalidated 1'], ['invalidated 2']])
+        self.assertListEqual(results[1], ['invalidated 1'])
+
+        class StaticKey(SideEffect):
+
+            dedupe_key = staticmethod(lambda obj, **kwargs: obj['parent'])
+
+        class FunctionKey(SideEffect):
+
+            dedupe_key = lambda obj, **kwargs: obj['parent']
+
+        context = {'obj': {'parent': 3}}
+        self.assertEqual(StaticKey().get_dedupe_key(context), 3)
+        self.assertEqual(FunctionKey().get_dedupe_key(context), 3)
+        self.assertEqual(effect.get_dedupe_key(context), 3)
+        self.assertEqual(
+            SideEffect(dedupe_key=lambda obj, **kwargs: obj['parent'])
+                .get_dedupe_key(context), 3)
+
+    def test_compute(self):
+
+        class Render(SideEffect):
+
+            compute = staticmethod(square)
+
+            def get_compute_args(self, obj, **kwargs):
+                return (obj,)
+
+            def perform(self, obj, computed, **kwargs):
+                return (obj, computed)
+
+        render = Render()
+        pending = PendingEffects([(render, {'obj': 2}), (render, {'obj': 3})])
+        self.assertTrue(pending.has_compute)
+        self.assertListEqual(pending(), [(2, 4), (3, 9)])
+        self.assertEqual(render(obj=4), (4, 16))
+        self.assertFalse(PendingEffects([(SideEffect(), {})]).has_compute)
+
+        # compute step mustn't run inside transaction
+        class TransactionalRender(Render):
+
+            is_transactional = True
+
+        library = Library()
+        library.states = ['new', 'done']
+        self.assertRaises(ValueError, library.effect, TransactionalRender())
+
+    def test_legacy_callable_child(self):
+        pending = PendingEffects(children=[lambda: ['legacy']])
+        self.assertListEqual(pending(), [['legacy']])
+
+
+class EffectPlanTestCase(TestCase):
+
+    def _make_effect(self, name, depends_on=(), log=None):
+
+        def performer(**kwargs):
+            if log is not None:
+                log.append(name)
+            return name
+        performer.__name__ = name
+
+        effect = SideEffect(message_id='go', depends_on=depends_on)
+        effect.set_performer(performer)
+        return effect
+
+    def test_levels(self):
+        render = self._make_effect('render_pdf')
+        email = self._make_effect('email_pdf', depends_on=['render_pdf'])
+        reindex = self._make_effect('reindex')
+        archive = self._make_effect('archive',
+            depends_on=['email_pdf', 'reindex', 'missing'])
+
+        self.assertDictEqual(
+            get_effect_levels([render, email, reindex, archive]),
+            {render: 0, email: 1, reindex: 0, archive: 2})
+
+        # effects with the same name don't collide
+        other_email = self._make_effect('email_pdf')
+        self.assertDictEqual(
+            get_effect_levels([render, email, other_email]),
+            {render: 0, email: 1, other_email: 0})
+
+    def test_cycle(self):
+        library = Library()
+        library.states = ['new', 'done']
+        library.effect(self._make_effect('a', depends_on=['b']))
+        self.assertRaises(EffectDependencyCycleError,
+            library.effect, self._make_effect('b', depends_on=['a']))
+        # failed effect is not registered
+        self.assertEqual(len(library._effect_patterns), 1)
+
+    def test_plan(self):
+        log = []
+        library = Library()
+        library.states = ['new', 'done']
+
+        email = self._make_effect('email_pdf', ['render_pdf'], log)
+        reindex = self._make_effect('reindex', log=log)
+        render = self._make_effect('render_pdf', log=log)
+        for effect in (email, reindex, render):
+            library.effect(effect)
+
+        plan = library.get_effect_plan('new', 'done', 'go')
+        self.assertEqual(plan, ((0, (reindex, render)), (1, (email,))))
+
+        pending = PendingEffects.from_plan(plan, [{}])
+        self.assertListEqual(pending(), ['reindex', 'render_pdf', 'email_pdf'])
+        self.assertListEqual(log, ['reindex', 'render_pdf', 'email_pdf'])
+
+    def test_parallel(self):
+        threads = []
+
+        class Wait(SideEffect):
+
+            def perform(self, **kwargs):
+                threads.append(threading.current_thread())
+                return 'done'
+
+        old_pool_size = yawf.effects.EFFECTS_POOL_SIZE
+        yawf.effects.EFFECTS_POOL_SIZE = 2
+        try:
+            pending = PendingEffects([(Wait(), {}), (Wait(), {})])
+            self.assertListEqual(pending(), ['done', 'done'])
+        finally:
+            yawf.effects.EFFECTS_POOL_SIZE = old_pool_size
+
+        self.assertNotIn(threading.current_thread(), threads)
+
+        # effects performed inside transaction stay in calling thread
+        del threads[:]
+        yawf.effects.EFFECTS_POOL_SIZE = 2
+        try:
+            pending = PendingEffects([(Wait(), {}), (Wait(), {})])
+            self.assertListEqual(pending(concurrent=False), ['done', 'done'])
+        finally:
+            yawf.effects.EFFECTS_POOL_SIZE = old_pool_size
+
+        self.assertListEqual(threads, [threading.current_thread()] * 2)
@@ -1,7 +1,10 @@
 from django.test import TestCase
 
+from yawf.library import Library
+from yawf.messages import Message
 from yawf.messages.spec import MessageSpec
 from yawf.messages.common import message_spec_fabric
+from yawf.messages.schema import Param
 
 __all__ = ('MessageSpecsTestCase',)
 
@@ -76,3 +79,83 @@ class MessageSpecsTestCase(TestCase):
         spec = message_spec_fabric(id='cancel')
         self.assertEqual(spec.id, 'cancel')
         self.assertTrue(isinstance(spec, MessageSpec))
+
+    def test_params_schema(self):
+
+        class Spec(MessageSpec):
+
+            id = 'move'
+            params_schema = {
+                'pos_x': int,
+                'pos_y': Param(int, min_value=0),
+                'mode': Param(unicode, required=False, default=u'fast',
+                              choices=[u'fast', u'slow']),
+                'title': Param(unicode, required=False, max_length=3),
+            }
+
+        validator_cls = Spec().validator_cls
+
+        v = validator_cls({'pos_x': '10', 'pos_y': 5, 'unknown': 'trash'})
+        self.assertTrue(v.is_valid())
+        self.assertEqual(v.cleaned_data,
+            {'pos_x': 10, 'pos_y': 5, 'mode': u'fast', 'title': None})
+
+        v = validator_cls({'pos_x': '1.5', 'pos_y': -1, 'mode': 'average',
+                           'title': 'long'})
+        self.assertFalse(v.is_valid())
+        self.assertItemsEqual(v.errors.keys(),
+            ['pos_x', 'pos_y', 'mode', 'title'])
+        self.assertFalse(hasattr(v, 'cleaned_data'))
+
+        v = validator_cls({})
+        self.assertEqual(v.errors['pos_x'], [u'This field is required.'])
+
+        self.assertRaises(TypeError, Param, dict)
+
+        # name of compute step result is reserved
+        class ComputedSpec(MessageSpec):
+
+            id = 'computed'
+            params_schema = {'computed': int}
+
+        self.assertRaises(ValueError, ComputedSpec)
+
+    def test_lazy_dehydration(self):
+        calls = []
+
+        class DehydratedSpec(MessageSpec):
+
+            id = 'dehydrated'
+
+            def dehydrate_params(self, obj, message):
+                calls.append(obj)
+                return {'obj': obj}
+
+        class PlainSpec(MessageSpec):
+
+            id = 'plain'
+
+        self.assertFalse(DehydratedSpec().skip_dehydration)
+        self.assertTrue(PlainSpec().skip_dehydration)
+
+        library = Library()
+        library.message(DehydratedSpec)
+        library.message(PlainSpec)
+
+        message = Message(None, 'dehydrated')
+        message.clean(library, 'obj').dehydrate_params(library, 'obj')
+        self.assertEqual(calls, ['obj'])
+        self.assertEqual(message.dehydrated_params, {'obj': 'obj'})
+
+        message = Message(None, 'dehydrated')
+        message.clean(library, 'obj')
+        message.dehydrate_params(library, 'stale', lazy=True)
+        message.dehydrate_params(library, 'fresh', lazy=True)
+        self.assertEqual(calls, ['obj'])
+        self.assertEqual(message.dehydrated_params, {'obj': 'fresh'})
+        self.assertEqual(message.dehydrated_params, {'obj': 'fresh'})
+        self.assertEqual(calls, ['obj', 'fresh'])
+
+        message = Message(None, 'plain')
+        message.clean(library, 'obj').dehydrate_params(library, 'obj')
+        self.assertIsNone(message.dehydrated_params)
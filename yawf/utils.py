@@ -1,8 +1,9 @@
 from itertools import ifilter
-from collections import defaultdict, Iterable
+from collections import defaultdict, Iterable, OrderedDict
 from operator import attrgetter
 from functools import wraps, partial
 import types
+import threading
 
 from yawf.config import STATE_TYPE_CONSTRAINT
 from yawf import get_workflow_by_instance
@@ -189,3 +190,45 @@ def filter_side_effect_results(results, cls_to_filter):
                 if isinstance(r, cls_to_filter)
             )
     return filtered
+
+
+class LRUCache(object):
+    '''
+    Thread safe mapping that keeps at most `max_size` recently used items.
+    '''
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        super(LRUCache, self).__init__()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -1,11 +1,78 @@
+import hashlib
+import logging
+
+from django.core.exceptions import ValidationError
 from django.template.response import TemplateResponse
-from django.http import Http404, HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, HttpResponse,\
+        HttpResponseForbidden, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+from django.views.generic.base import View
 from django.views.generic.edit import ProcessFormView
 from django.views.generic.detail import SingleObjectMixin
 
-from yawf import get_workflow
+from yawf import get_workflow, get_workflow_by_instance
 from yawf import dispatch
-from yawf.exceptions import MessageValidationError
+from yawf.allowed import get_allowed, get_sender_key
+from yawf.base_model import clarify_instances
+from yawf.describe import get_description
+from yawf.config import REVISION_ATTR, WORKFLOW_TYPE_ATTR
+from yawf.exceptions import YawfException, MessageValidationError,\
+        ResourcePermissionDeniedError, GroupRolledBackError
+from yawf.executor import GroupCommitExecutor
+from yawf.serialize_utils import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def get_revision_etag(model_class, pk, sender):
+    '''
+    Returns ETag of object state for `sender` built from workflow id, pk
+    and revision of object, fetched with one ``values_list`` query, or None
+    if there is no such object or model has no revision field.
+    '''
+    if not getattr(model_class, '_has_revision_support', False):
+        return None
+
+    fields = [REVISION_ATTR]
+    has_workflow_field = WORKFLOW_TYPE_ATTR in set(
+        f.name for f in model_class._meta.fields)
+    if has_workflow_field:
+        fields.append(WORKFLOW_TYPE_ATTR)
+
+    rows = list(model_class.objects.filter(pk=pk).values_list(*fields)[:1])
+    if not rows:
+        return None
+
+    if has_workflow_field:
+        revision, workflow_id = rows[0]
+    else:
+        revision, workflow_id = rows[0][0], getattr(model_class,
+                                                    WORKFLOW_TYPE_ATTR)
+
+    key = repr((workflow_id, pk, revision, get_sender_key(sender),
+                get_language()))
+    return hashlib.md5(key).hexdigest()
+
+
+def revision_condition(model_class, pk_kwarg='pk', get_sender=None):
+    '''
+    Decorator for views of single workflow object that answers
+    ``304 Not Modified`` (or ``412 Precondition Failed``) by revision based
+    ETag, before the view itself is called.
+
+    :param get_sender: function of request, returns ``request.user`` by
+        default
+    '''
+    if get_sender is None:
+        get_sender = lambda request: request.user
+
+    def etag_func(request, *args, **kwargs):
+        return get_revision_etag(model_class, kwargs.get(pk_kwarg),
+            get_sender(request))
+
+    return condition(etag_func=etag_func)
 
 
 class MessageViewMixin(object):
@@ -23,14 +90,204 @@ class MessageViewMixin(object):
         return self.request.user
 
 
+class RevisionConditionMixin(object):
+    '''
+    Class based view mixin with the same behaviour as
+    :py:func:`revision_condition` decorator.
+    '''
+
+    pk_url_kwarg = 'pk'
+
+    def get_etag_model(self):
+        return self.model
+
+    def get_etag(self, request, *args, **kwargs):
+        return get_revision_etag(self.get_etag_model(),
+            kwargs.get(self.pk_url_kwarg), self.get_sender())
+
+    def dispatch(self, request, *args, **kwargs):
+        # sender is taken from request before View.dispatch sets it
+        self.request, self.args, self.kwargs = request, args, kwargs
+        parent_dispatch = super(RevisionConditionMixin, self).dispatch
+        return condition(etag_func=self.get_etag)(parent_dispatch)(
+            request, *args, **kwargs)
+
+
+class WorkflowObjectView(MessageViewMixin, RevisionConditionMixin, View):
+    '''
+    Base JSON view of single workflow object with conditional GET support.
+    '''
+
+    model = None
+
+    def get_yawf_object(self):
+        obj = get_object_or_404(self.model, pk=self.kwargs[self.pk_url_kwarg])
+        if hasattr(obj, 'get_clarified_instance'):
+            obj = obj.get_clarified_instance()
+        return obj
+
+    def render_json(self, data):
+        return HttpResponse(dumps(data), content_type='application/json')
+
+
+class AllowedView(WorkflowObjectView):
+    '''
+    Returns :py:func:`yawf.allowed.get_allowed` result as JSON.
+    '''
+
+    def get(self, request, *args, **kwargs):
+        return self.render_json(
+            get_allowed(self.get_sender(), self.get_yawf_object()))
+
+
+class ResourceView(WorkflowObjectView):
+    '''
+    Calls workflow resource ``resource_id`` (from url kwargs or class
+    attribute) of object. Resource handler must return a response.
+    '''
+
+    resource_id = None
+
+    def get_resource_id(self):
+        return self.kwargs.get('resource_id', self.resource_id)
+
+    def get(self, request, *args, **kwargs):
+        obj = self.get_yawf_object()
+        workflow = get_workflow_by_instance(obj)
+        resource = workflow.get_resource(
+            getattr(obj, workflow.state_attr_name), self.get_resource_id())
+        if resource is None:
+            raise Http404
+
+        try:
+            return resource(request, obj, self.get_sender())
+        except ResourcePermissionDeniedError:
+            return HttpResponseForbidden()
+
+
+class BulkMessageView(MessageViewMixin, View):
+    '''
+    Dispatches messages to several objects of `model` posted as JSON list:
+
+        [{"object_id": 1, "message_id": "approve", "params": {}}, ...]
+
+    All objects are fetched with one query and messages are dispatched
+    in one transaction by :py:class:`yawf.executor.GroupCommitExecutor`,
+    each message in its own savepoint or, if `atomic` is set, all or
+    nothing. Response is JSON list of per item results in the same order:
+
+        [{"status": "ok", "state": "approved"},
+         {"status": "error", "code": "yawf_validation_error",
+          "context": {"comment": ["This field is required."]}}, ...]
+    '''
+
+    model = None
+    atomic = False
+    max_items = 1000
+
+    def post(self, request, *args, **kwargs):
+        try:
+            items = self.parse_items(request.body)
+        except ValueError as e:
+            return HttpResponseBadRequest(unicode(e))
+
+        objects = self.get_yawf_objects(
+            [item['object_id'] for item in items])
+        found = [item['object_id'] in objects for item in items]
+
+        results = [None] * len(items)
+        # atomic batch with missing objects is not dispatched at all
+        if all(found) or not self.atomic:
+            sender = self.get_sender()
+            with GroupCommitExecutor(max_size=len(items),
+                                     atomic=self.atomic) as executor:
+                for index, item in enumerate(items):
+                    if found[index]:
+                        results[index] = executor.submit(
+                            objects[item['object_id']], sender,
+                            item['message_id'], item['params'])
+
+        return HttpResponse(
+            dumps([self.wrap_item_result(is_found, result)
+                   for is_found, result in zip(found, results)]),
+            content_type='application/json')
+
+    def parse_items(self, body):
+        items = loads(body)
+        if not isinstance(items, list):
+            raise ValueError('List of messages expected')
+        if len(items) > self.max_items:
+            raise ValueError('Too many messages')
+
+        to_python = self.model._meta.pk.to_python
+        parsed = []
+        for item in items:
+            if not isinstance(item, dict) or 'object_id' not in item or\
+                    'message_id' not in item:
+                raise ValueError('object_id and message_id are required')
+            if not isinstance(item['message_id'], basestring):
+                raise ValueError('message_id must be a string')
+            params = item.get('params') or {}
+            if not isinstance(params, dict):
+                raise ValueError('params must be an object')
+            object_id = item['object_id']
+            if not isinstance(object_id, (dict, list)):
+                try:
+                    object_id = to_python(object_id)
+                except ValidationError:
+                    object_id = None
+            if object_id is None or isinstance(object_id, (dict, list)):
+                raise ValueError(
+                    'Invalid object_id: %r' % (item['object_id'],))
+            parsed.append({
+                'object_id': object_id,
+                'message_id': item['message_id'],
+                'params': params,
+            })
+        return parsed
+
+    def get_yawf_objects(self, object_ids):
+        objects = self.model.objects.in_bulk(object_ids)
+        pks = objects.keys()
+        return dict(zip(pks, clarify_instances(objects[pk] for pk in pks)))
+
+    def wrap_item_result(self, is_found, result):
+        if not is_found:
+            return {'status': 'error', 'code': 'object_not_found'}
+        if result is None:
+            return {'status': 'error', 'code': GroupRolledBackError.code}
+
+        try:
+            new_obj, _handler_result, _effect_result = result.get()
+        except YawfException as e:
+            return {'status': 'error', 'code': e.code, 'context': e.context}
+        except Exception as e:
+            logger.exception(u"Bulk message failed: %r", e)
+            return {'status': 'error', 'code': 'internal_error'}
+
+        workflow = get_workflow_by_instance(new_obj)
+        return {'status': 'ok',
+                'state': getattr(new_obj, workflow.state_attr_name)}
+
+
 class YawfMessageView(MessageViewMixin, SingleObjectMixin, ProcessFormView):
 
+    workflow_type = None
+
     @property
     def model(self):
         workflow = get_workflow(self.workflow_type)
         if hasattr(workflow, 'model_class'):
             return workflow.model_class
 
+    def get_queryset(self):
+        # object of workflow model class is fetched directly (even if view
+        # model is a parent model), so it is not fetched again to clarify
+        workflow = get_workflow(self.workflow_type)
+        if self.queryset is None and hasattr(workflow, 'model_class'):
+            return workflow.model_class._default_manager.all()
+        return super(YawfMessageView, self).get_queryset()
+
     def get_yawf_object(self):
         return self.object
 
@@ -97,34 +354,23 @@ def describe_workflow(request, workflow_id):
     if w is None:
         raise Http404
 
-    state_map = \
-        dict(
-            (state, {
-                'verbose_name': w.verbose_state_names.get(state),
-                'messages': sorted(
-                    message
-                    for (_checker, message)
-                    in w.library.get_available_messages(state)
-                ),
-            })
-            for state in w.states)
-
-    message_map = \
-        dict(
-            (message_id, {
-                'spec': spec,
-                'states_from':
-                    sorted(
-                        w.library
-                         .get_handlers_index_for_message(message_id)
-                         .keys()),
-            })
-            for (message_id, spec)
-            in w.library.get_message_specs().iteritems())
-
     return TemplateResponse(request, 'yawf/describe_workflow.html',
                             {
                                 'workflow': w,
-                                'state_map': state_map,
-                                'message_map': message_map
+                                'description': get_description(w).data,
                             })
+
+
+def _description_etag(request, workflow_id):
+    w = get_workflow(workflow_id)
+    return get_description(w).etag if w is not None else None
+
+
+@condition(etag_func=_description_etag)
+def describe_workflow_json(request, workflow_id):
+    w = get_workflow(workflow_id)
+    if w is None:
+        raise Http404
+
+    return HttpResponse(get_description(w).json,
+        content_type='application/json')
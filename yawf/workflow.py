@@ -67,6 +67,9 @@ class WorkflowBase(object):
     exportable_fields = ('rank', 'verbose_name',)
     # message id or callable that returns message context to start workflow
     start_workflow = DEFAULT_START_MESSAGE
+    # {state: (timedelta, message_id)} -- message to dispatch when object
+    # stays in state for too long (see yawf.scheduler)
+    timeouts = {}
 
     @property
     def extra_valid_states(self):
@@ -104,6 +107,12 @@ class WorkflowBase(object):
     def is_valid_state(self, state):
         return state in self._valid_states
 
+    def get_timeout(self, state):
+        '''
+        Returns (timedelta, message_id) pair for state or None.
+        '''
+        return self.timeouts.get(state)
+
     def is_valid_message(self, state, message_id):
         try:
             self._library.get_handler(state, message_id)
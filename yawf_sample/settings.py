@@ -39,6 +39,8 @@ INSTALLED_APPS = (
     'django.contrib.messages',
     'yawf',
     'yawf.message_log',
+    'yawf.mailbox',
+    'yawf.scheduler',
     'yawf_sample.simple',
     'reversion',
     'django.contrib.admin',
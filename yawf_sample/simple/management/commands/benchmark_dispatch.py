@@ -0,0 +1,73 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yawf import autodiscover
+from yawf.dispatch import dispatch
+from yawf.executor import adispatch, GroupCommitExecutor
+
+from yawf_sample.simple.models import Window, WINDOW_OPEN_STATUS
+
+MODES = ('sync', 'async', 'group')
+
+
+class Command(BaseCommand):
+
+    help = 'Measures dispatch throughput on sample windows.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--count', type='int', default=1000,
+            help='Number of messages (one per window)'),
+        make_option('--mode', choices=MODES, default='sync',
+            help='One of: %s' % ', '.join(MODES)),
+        make_option('--group-size', type='int', default=100,
+            help='Messages per transaction in group mode'),
+    )
+
+    def handle(self, **options):
+        autodiscover()
+
+        count = options['count']
+        windows = self._create_windows(count)
+
+        started_at = time.time()
+        getattr(self, '_run_%s' % options['mode'])(windows, **options)
+        elapsed = time.time() - started_at
+
+        if Window.objects.filter(id__in=[w.id for w in windows],
+                width=count).count() != count:
+            raise CommandError('Not all messages were dispatched')
+
+        print '%s: %d messages in %.2fs, %.1f messages/s' % (
+            options['mode'], count, elapsed, count / elapsed)
+
+    def _create_windows(self, count):
+        last_id = Window.objects.order_by('-id').values_list('id', flat=True)
+        last_id = last_id[0] if last_id else 0
+        Window.objects.bulk_create([
+            Window(title='benchmark', width=1, height=1,
+                open_status=WINDOW_OPEN_STATUS.NORMAL)
+            for _i in xrange(count)])
+        return list(Window.objects.filter(id__gt=last_id))
+
+    def _resize(self, count):
+        return 'edit__resize', {'width': count, 'height': count}
+
+    def _run_sync(self, windows, count, **options):
+        for window in windows:
+            dispatch(window, 'benchmark', *self._resize(count))
+
+    def _run_async(self, windows, count, **options):
+        results = [adispatch(window, 'benchmark', *self._resize(count))
+                   for window in windows]
+        for result in results:
+            result.get()
+
+    def _run_group(self, windows, count, group_size, **options):
+        with GroupCommitExecutor(max_size=group_size) as executor:
+            results = [executor.submit(window, 'benchmark',
+                                       *self._resize(count))
+                       for window in windows]
+        for result in results:
+            result.get()
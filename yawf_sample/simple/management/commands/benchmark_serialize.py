@@ -0,0 +1,83 @@
+import time
+from datetime import datetime
+from optparse import make_option
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.utils.translation import ugettext_lazy as _
+
+from yawf.handlers import SerializibleHandlerResult
+from yawf.message_log.models import MessageLog
+
+from yawf_sample.simple.models import Window, WINDOW_OPEN_STATUS
+
+
+class ResizeResult(SerializibleHandlerResult):
+
+    type = 'resize'
+
+
+class Command(BaseCommand):
+
+    help = 'Measures serialization of message log payloads.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--count', type='int', default=1000,
+            help='Number of payloads'),
+        make_option('--windows', type='int', default=100,
+            help='Number of windows in queryset param'),
+    )
+
+    def handle(self, **options):
+        count = options['count']
+        windows = self._create_windows(options['windows'])
+        children = Window.objects.filter(
+            id__in=[w.id for w in windows]).order_by('id')
+        permissions = list(Permission.objects.all()[:5])
+        transition_result = [ResizeResult(width=100, height=100)
+                             for _i in xrange(5)]
+
+        debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        reset_queries()
+        started_at = time.time()
+        try:
+            for _i in xrange(count):
+                log_record = MessageLog()
+                log_record.deserialized_params = self._payload(
+                    windows[0], children, permissions)
+                log_record.deserialized_transition_result = transition_result
+            elapsed = time.time() - started_at
+            queries = len(connection.queries)
+        finally:
+            connection.use_debug_cursor = debug_cursor
+
+        print '%d payloads in %.2fs, %.1fus per payload, %.1f queries' % (
+            count, elapsed, elapsed * 1e6 / count, float(queries) / count)
+
+    def _payload(self, window, children, permissions):
+        # fresh queryset and instances, as in dispatched messages; models
+        # with natural keys are repeated as different instances
+        permissions = [Permission(id=p.id, name=p.name,
+                content_type_id=p.content_type_id, codename=p.codename)
+            for p in permissions * 4]
+        return {
+            'width': 100,
+            'title': u'benchmark',
+            'reason': _('Window'),
+            'at': datetime.now(),
+            'window': window,
+            'children': children.all(),
+            'tags': set(['a', 'b']),
+            'permissions': permissions,
+        }
+
+    def _create_windows(self, count):
+        last_id = Window.objects.order_by('-id').values_list('id', flat=True)
+        last_id = last_id[0] if last_id else 0
+        Window.objects.bulk_create([
+            Window(title='benchmark', width=1, height=1,
+                open_status=WINDOW_OPEN_STATUS.NORMAL)
+            for _i in xrange(count)])
+        return list(Window.objects.filter(id__gt=last_id))
@@ -0,0 +1,43 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from yawf.messages.schema import compile_schema
+
+from yawf_sample.simple.workflows.simple import ClickForm
+
+ClickValidator = compile_schema({'pos_x': int, 'pos_y': int})
+
+
+class Command(BaseCommand):
+
+    help = 'Compares click params validation by form and by schema.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--count', type='int', default=10000,
+            help='Number of validations'),
+    )
+
+    def handle(self, **options):
+        count = options['count']
+        cases = (
+            ('valid', {'pos_x': '10', 'pos_y': '20'}),
+            ('invalid', {'pos_x': 'left'}),
+        )
+        for case, params in cases:
+            form_time = self._measure(ClickForm, params, count)
+            schema_time = self._measure(ClickValidator, params, count)
+            print '%s: form %.1fus, schema %.1fus, %.1fx faster' % (
+                case, form_time * 1e6 / count, schema_time * 1e6 / count,
+                form_time / schema_time)
+
+    def _measure(self, validator_cls, params, count):
+        started_at = time.time()
+        for _i in xrange(count):
+            validator = validator_cls(params)
+            if validator.is_valid():
+                validator.cleaned_data
+            else:
+                validator.errors
+        return time.time() - started_at
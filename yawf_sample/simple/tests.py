@@ -1,4 +1,12 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Permission
+from django.test import TestCase, TransactionTestCase
 from django.utils.unittest import skipIf
 import reversion
 
@@ -6,17 +14,46 @@ import yawf
 from yawf.exceptions import MessageSpecNotRegisteredError, UnhandledMessageError
 import yawf.creation
 import yawf.dispatch
+import yawf.graph
 from yawf.handlers import Handler
 from yawf.revision.utils import (
     diff_fields, versions_diff, deserialize_revision, previous_version)
-from yawf.message_log.models import main_record_for_revision
+from yawf.message_log.models import main_record_for_revision, MessageLog
+from yawf.library import Library
 from yawf.messages.spec import MessageSpec
-from yawf.allowed import get_allowed
+from yawf.messages.coalesce import LAST_WINS
+from yawf.base_model import WorkflowAwareModelBase, clarify_instances
+from yawf.allowed import get_allowed, get_cache_key, LRUAllowedCache,\
+        DjangoAllowedCache
+from yawf.permissions import C, not_cacheable, cache_key
+from yawf.store.memory import InMemoryStore
+from yawf.fuzz import random_walk
+from yawf.retry import RetryPolicy
+from yawf.signals import message_retried, transition_handled
+from yawf.mailbox import api as mailbox
+import yawf.mailbox.api
+from yawf.scheduler import api as scheduler
+from yawf.scheduler.models import ScheduledTimeout
+from yawf.bulk import bulk_transition
+from yawf.graph import get_graph_dot, render_graph
+from yawf.describe import build_description
+from yawf.forms import get_action_form_cls
+from yawf.utils import LRUCache
+from yawf.views import get_revision_etag
+from yawf.serialize_utils import dumps
+from yawf.executor import adispatch, GroupCommitExecutor
 
 yawf.autodiscover()
 from .models import Window, WINDOW_OPEN_STATUS
 
 
+class WindowProxy(WorkflowAwareModelBase, Window):
+    # parent model of workflow model class for clarification tests
+
+    class Meta:
+        proxy = True
+
+
 class WorkflowTestMixin(object):
 
     workflow_id = None
@@ -177,11 +214,373 @@ class SimpleWorkflowTest(WorkflowTestMixin, TestCase):
                 },
             ])
 
+    def test_predict(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        child, _, _ = self._new_window(parent=window)
+        log_count = MessageLog.objects.count()
+
+        new_window, _, (transactional, deferrable) = yawf.dispatch.predict(
+            window, self.sender, 'edit__resize', dict(width=200, height=400))
+        self.assertEqual(new_window.width, 200)
+        self.assertEqual(new_window.revision, window.revision)
+        self.assertListEqual(transactional, [])
+        self.assertListEqual(
+            [effect.name for effect in deferrable],
+            ['SignalizeEdit', 'SignalizeResize'])
+
+        _, handler_result, _ = yawf.dispatch.predict(
+            window, self.sender, 'minimize_all')
+        self.assertEqual(len(handler_result), 2)
+        new_window, new_child = handler_result
+        self.assertEqual(new_window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertEqual(new_child.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.width, 500)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.NORMAL)
+        child = Window.objects.get(id=child.id)
+        self.assertEqual(child.open_status, WINDOW_OPEN_STATUS.NORMAL)
+        self.assertEqual(MessageLog.objects.count(), log_count)
+
+    def test_dispatcher_session(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        log_count = MessageLog.objects.count()
+
+        dispatcher = yawf.dispatch.Dispatcher(window, self.sender)
+        with dispatcher.session() as d:
+            d.edit__resize(width=200, height=400)
+            _, _, effect_result = d.minimize()
+            self.assertIsNone(effect_result)
+
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.width, 200)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertEqual(dispatcher.obj.revision, window.revision)
+        self.assertListEqual(d.results[0][2], ['edit_effect', 'resize_effect'])
+        self.assertListEqual(d.results[1][2], [])
+
+        log_records = MessageLog.objects.all()[log_count:]
+        self.assertListEqual([r.message for r in log_records],
+            ['edit__resize', 'minimize'])
+        self.assertTrue(all(r.revision_id for r in log_records))
+
+        revision = reversion.get_for_object(window)[0].revision
+        main_record = main_record_for_revision(revision)
+        self.assertEqual(main_record.message, 'edit__resize')
+        self.assertIsNone(log_records[1].parent_uuid)
+
+    def test_retry(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        stale_window = Window.objects.get(id=window.id)
+        yawf.dispatch.dispatch(window, self.sender,
+            'edit__resize', dict(width=200, height=400))
+
+        self.assertRaises(yawf.exceptions.ConcurrentRevisionUpdate,
+            yawf.dispatch.dispatch, stale_window, self.sender, 'minimize',
+            need_lock_object=True)
+
+        retries = []
+        def on_retry(sender, attempt, **kwargs):
+            retries.append(attempt)
+
+        message_retried.connect(on_retry)
+        try:
+            window, _, _ = yawf.dispatch.dispatch(stale_window, self.sender,
+                'minimize', need_lock_object=True,
+                retry_policy=RetryPolicy(max_attempts=2, backoff=0))
+        finally:
+            message_retried.disconnect(on_retry)
+
+        self.assertListEqual(retries, [1])
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertEqual(window.width, 200)
+
+    def test_mailbox(self):
+        window, _, _ = self._new_window(width=500, height=300)
+
+        resize = mailbox.post(window, self.sender, 'edit__resize',
+            dict(width=200, height=400))
+        invalid = mailbox.post(window, self.sender, 'edit__resize',
+            dict(width=0, height=400))
+        minimize = mailbox.post(window, self.sender, 'minimize')
+        self.assertFalse(resize.ready())
+
+        self.assertEqual(mailbox.process_pending(), 3)
+        self.assertEqual(mailbox.process_pending(), 0)
+
+        self.assertEqual(resize.wait(timeout=0).new_state,
+            WINDOW_OPEN_STATUS.NORMAL)
+        self.assertEqual(minimize.wait(timeout=0).new_state,
+            WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertRaises(yawf.exceptions.MailboxMessageFailedError,
+            invalid.wait, timeout=0)
+
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.width, 200)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertEqual(
+            MessageLog.objects.get(uuid=minimize.get_record().uuid).message,
+            'minimize')
+
+    def test_mailbox_errors(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        resize = mailbox.post(window, self.sender, 'edit__resize',
+            dict(width=200, height=400))
+
+        # object changed between fetching and locking is fetched again
+        fetch = yawf.mailbox.api._fetch
+        calls = []
+
+        def stale_fetch(content_type, object_id):
+            obj = fetch(content_type, object_id)
+            if not calls:
+                obj.revision -= 1
+            calls.append(obj)
+            return obj
+
+        yawf.mailbox.api._fetch = stale_fetch
+        try:
+            self.assertEqual(mailbox.process_pending(), 1)
+        finally:
+            yawf.mailbox.api._fetch = fetch
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(resize.wait(timeout=0).new_state,
+            WINDOW_OPEN_STATUS.NORMAL)
+
+        # messages of deleted object fail
+        minimize = mailbox.post(window, self.sender, 'minimize')
+        Window.objects.filter(id=window.id).delete()
+        self.assertEqual(mailbox.process_pending(), 1)
+        self.assertEqual(mailbox.process_pending(), 0)
+        self.assertRaises(yawf.exceptions.MailboxMessageFailedError,
+            minimize.wait, timeout=0)
+
+    def _patch_spec(self, spec, **attrs):
+        # registered specs are shared by all tests, so they are restored
+        # even if test fails
+        for attr, value in attrs.iteritems():
+            if attr in spec.__dict__:
+                self.addCleanup(setattr, spec, attr, spec.__dict__[attr])
+            else:
+                self.addCleanup(delattr, spec, attr)
+            setattr(spec, attr, value)
+
+    def test_mailbox_coalescing(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        spec = yawf.get_workflow('simple').get_message_spec('edit__resize')
+
+        handles = [
+            mailbox.post(window, self.sender, 'edit__resize',
+                dict(width=200, height=400)),
+            mailbox.post(window, self.sender, 'edit__resize',
+                dict(width=300)),
+            mailbox.post(window, self.sender, 'minimize'),
+            mailbox.post(window, self.sender, 'minimize'),
+        ]
+
+        self._patch_spec(spec, coalesce=LAST_WINS)
+        self.assertEqual(mailbox.process_pending(), 4)
+
+        for handle in handles:
+            self.assertIsNotNone(handle.wait(timeout=0))
+
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.width, 300)
+        self.assertEqual(window.height, 400)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+
+        uuids = [handle.get_record().uuid for handle in handles]
+        self.assertEqual(
+            MessageLog.objects.get(uuid=uuids[0]).coalesced_into, uuids[1])
+        self.assertIsNone(MessageLog.objects.get(uuid=uuids[1]).coalesced_into)
+        self.assertEqual(
+            MessageLog.objects.get(uuid=uuids[3]).coalesced_into, uuids[2])
+
+    def test_timeouts(self):
+        window, _, _ = self._new_window()
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender, 'minimize')
+
+        timeout = ScheduledTimeout.objects.get(object_id=window.id)
+        self.assertEqual(timeout.state, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertEqual(timeout.message, 'to_normal')
+
+        self.assertEqual(scheduler.fire_due(), 0)
+        self.assertEqual(scheduler.fire_due(
+            now=timeout.due_at + datetime.timedelta(seconds=1)), 1)
+
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.NORMAL)
+        self.assertFalse(ScheduledTimeout.objects.exists())
+
+        # leaving the state cancels timeout
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender, 'minimize')
+        self.assertTrue(ScheduledTimeout.objects.exists())
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender,
+            'to_normal')
+        self.assertFalse(ScheduledTimeout.objects.exists())
+
+        # timeout is rescheduled if object stays in the state
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender, 'minimize')
+        timeout = ScheduledTimeout.objects.get(object_id=window.id)
+        now = timeout.due_at + datetime.timedelta(seconds=1)
+        # message isn't handled in the state, so dispatching fails
+        ScheduledTimeout.objects.filter(id=timeout.id).update(
+            message='minimize')
+        self.assertEqual(scheduler.fire_due(now=now), 1)
+
+        self.assertEqual(Window.objects.get(id=window.id).open_status,
+            WINDOW_OPEN_STATUS.MINIMIZED)
+        delta, _ = yawf.get_workflow('simple').get_timeout(
+            WINDOW_OPEN_STATUS.MINIMIZED)
+        timeout = ScheduledTimeout.objects.get(id=timeout.id)
+        self.assertEqual(timeout.due_at, now + delta)
+        self.assertIsNone(timeout.claimed_until)
+
+    def test_bulk_transition(self):
+        windows = [self._new_window()[0] for _i in range(3)]
+        queryset = Window.objects.filter(id__in=[w.id for w in windows])
+        revisions = dict(queryset.values_list('id', 'revision'))
+
+        library = yawf.get_workflow('simple').library
+        self.assertEqual(
+            library.get_static_transition(WINDOW_OPEN_STATUS.NORMAL,
+                'minimize'),
+            WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertIsNone(
+            library.get_static_transition(WINDOW_OPEN_STATUS.MINIMIZED,
+                'to_normal'))
+
+        self.assertEqual(
+            bulk_transition(queryset, 'minimize', self.sender, chunk_size=2),
+            3)
+
+        for window in queryset:
+            self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+            self.assertEqual(window.revision, revisions[window.id] + 1)
+
+        log_records = MessageLog.objects.filter(message='minimize')
+        self.assertEqual(log_records.count(), 3)
+        self.assertEqual(
+            len(set(log_records.values_list('group_uuid', flat=True))), 1)
+        self.assertEqual(ScheduledTimeout.objects.count(), 3)
+
+        # handler is not static, objects are dispatched one by one
+        self.assertEqual(
+            bulk_transition(queryset, 'to_normal', self.sender), 3)
+        self.assertItemsEqual(
+            queryset.values_list('open_status', flat=True),
+            [WINDOW_OPEN_STATUS.NORMAL] * 3)
+        self.assertFalse(ScheduledTimeout.objects.exists())
+
+        # message is not handled in current state
+        self.assertEqual(
+            bulk_transition(queryset, 'to_normal', self.sender), 0)
+
+        # failed objects are skipped
+        self.assertEqual(bulk_transition(queryset, 'edit__resize',
+            self.sender, dict(width=0, height=10)), 0)
+        self.assertEqual(bulk_transition(queryset, 'edit__resize',
+            self.sender, dict(width=10, height=10)), 3)
+
+    def test_compute(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        _, handler_result, _ = yawf.dispatch.dispatch(window, self.sender,
+            'click', dict(pos_x=10, pos_y=10))
+        self.assertEqual(handler_result, 'title')
+        _, handler_result, _ = yawf.dispatch.dispatch(window, self.sender,
+            'click', dict(pos_x=10, pos_y=400))
+        self.assertEqual(handler_result, 'outside')
+
+    def test_form_classes_cache(self):
+        workflow = yawf.get_workflow('simple')
+        specs = [workflow.get_message_spec(message_id)
+                 for message_id in ('click', 'edit__resize', 'minimize')]
+
+        form_cls = get_action_form_cls(workflow, specs)
+        self.assertTrue(issubclass(form_cls, specs[0].validator_cls))
+        self.assertIs(get_action_form_cls(workflow, specs[::-1]), form_cls)
+        self.assertIsNone(get_action_form_cls(workflow, specs[2:]))
+
+        self.assertIs(workflow.get_create_form_cls(),
+                      workflow.get_create_form_cls())
+        self.assertIs(
+            yawf.creation.class_by_dotted_name('yawf.utils.LRUCache'),
+            LRUCache)
+
+    def test_serialize_params(self):
+        ids = [self._new_window()[0].id for _i in range(2)]
+        permission = Permission.objects.all()[0]
+        natural_key = list(permission.natural_key())
+
+        # each copy would load its content type
+        copies = [Permission.objects.get(id=permission.id) for _i in range(3)]
+        windows = Window.objects.filter(id__in=ids).order_by('id')
+        window = Window.objects.get(id=ids[0])
+
+        with self.assertNumQueries(2):
+            content = dumps({'permissions': copies, 'windows': windows,
+                             'window': window, 'tags': set(['a'])})
+        self.assertDictEqual(json.loads(content), {
+            'permissions': [natural_key] * 3,
+            'windows': ids,
+            'window': unicode(ids[0]),
+            'tags': ['a'],
+        })
+
+        list(windows)
+        with self.assertNumQueries(0):
+            self.assertEqual(dumps(windows), json.dumps(ids))
+
+    def test_clarify_instances(self):
+        ids = [self._new_window()[0].id for _i in range(2)]
+        proxies = list(WindowProxy.objects.filter(id__in=ids).order_by('id'))
+
+        with self.assertNumQueries(1):
+            clarified = clarify_instances(proxies + ['not a model'])
+        self.assertListEqual([type(obj) for obj in clarified],
+            [Window, Window, str])
+        self.assertListEqual([obj.id for obj in clarified[:2]], ids)
+
+        Window.objects.filter(id=ids[0]).delete()
+        self.assertRaises(Window.DoesNotExist, clarify_instances, proxies)
+
     def test_allowed(self):
         window, _, _ = self._new_window()
         allowed = get_allowed(self.sender, window)
         self.assertItemsEqual(allowed.keys(), ['allowed_messages', 'allowed_resources'])
 
+    def test_allowed_cache(self):
+        window, _, _ = self._new_window()
+        workflow = yawf.get_workflow('simple')
+        cache = LRUAllowedCache(max_size=10)
+
+        allowed = get_allowed(self.sender, window, cache=cache)
+        self.assertIs(get_allowed(self.sender, window, cache=cache), allowed)
+        self.assertIsNot(get_allowed('other', window, cache=cache), allowed)
+
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender,
+            'minimize')
+        self.assertIsNone(cache.get(
+            get_cache_key(workflow, window, self.sender, [])))
+        self.assertNotEqual(
+            get_allowed(self.sender, window, cache=cache), allowed)
+
+        external = {'value': 1}
+        keyed = cache_key(lambda obj, sender: external['value'])(
+            lambda obj, sender: True)
+        key = get_cache_key(workflow, window, self.sender, [C(keyed)])
+        external['value'] = 2
+        self.assertNotEqual(
+            get_cache_key(workflow, window, self.sender, [C(keyed)]), key)
+
+        self.assertIsNone(get_cache_key(workflow, window, self.sender,
+            [C(not_cacheable(lambda obj, sender: True))]))
+
+        django_cache = DjangoAllowedCache()
+        allowed = get_allowed(self.sender, window, cache=django_cache)
+        self.assertEqual(django_cache.get(
+            get_cache_key(workflow, window, self.sender, [])), allowed)
+
 
     def test_view_handling(self):
         window, _, _ = self._new_window(width=500, height=300)
@@ -206,6 +605,42 @@ class SimpleWorkflowTest(WorkflowTestMixin, TestCase):
         window = Window.objects.get(pk=window.id)
         self.assertEqual(window.open_status, 'maximized')
 
+    def test_conditional_get(self):
+        window, _, _ = self._new_window(width=500, height=300)
+        url = '/simple/window/%d/allowed/' % window.id
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('geometry', response.content)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        resource_url = '/simple/window/%d/resources/geometry/' % window.id
+        response = self.client.get(resource_url)
+        self.assertEqual(response.content, '500x300')
+        self.assertEqual(
+            self.client.get(resource_url,
+                HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            304)
+        self.assertEqual(
+            self.client.get(
+                '/simple/window/%d/resources/unknown/' % window.id)
+                .status_code,
+            404)
+
+        yawf.dispatch.dispatch(window, self.sender, 'minimize')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # no ETag for models without revisions
+        permission = Permission.objects.all()[0]
+        self.assertIsNone(
+            get_revision_etag(Permission, permission.pk, self.sender))
+
 
     def _new_window(self, title='Main window', width=500, height=300,
             parent=None):
@@ -220,6 +655,231 @@ class SimpleWorkflowTest(WorkflowTestMixin, TestCase):
         return yawf.creation.start_workflow(window, self.sender)
 
 
+class DispatcherSessionTransactionTest(TransactionTestCase):
+
+    sender = '__sender__'
+
+    def test_rollback(self):
+        window = yawf.creation.create('simple', self.sender,
+            {'title': 'Main window', 'width': 500, 'height': 300})
+        window, _, _ = yawf.creation.start_workflow(window, self.sender)
+
+        def resize_and_fail():
+            with yawf.dispatch.Dispatcher(window, self.sender).session() as d:
+                d.edit__resize(width=200, height=400)
+                d.start_workflow()
+
+        self.assertRaises(UnhandledMessageError, resize_and_fail)
+        self.assertEqual(Window.objects.get(id=window.id).width, 500)
+
+    def test_group_commit(self):
+        windows = []
+        for _i in range(3):
+            window = yawf.creation.create('simple', self.sender,
+                {'title': 'Main window', 'width': 500, 'height': 300})
+            windows.append(
+                yawf.creation.start_workflow(window, self.sender)[0])
+
+        executor = GroupCommitExecutor(max_size=3)
+        first = executor.submit(windows[0], self.sender, 'edit__resize',
+            dict(width=200, height=400))
+        failed = executor.submit(windows[1], self.sender, 'edit__resize',
+            dict(width=0, height=400))
+        self.assertFalse(first.ready())
+        self.assertEqual(len(executor), 2)
+
+        last = executor.submit(windows[2], self.sender, 'edit__resize',
+            dict(width=300, height=400))
+        self.assertEqual(len(executor), 0)
+
+        window, _, effects = first.get()
+        self.assertEqual(window.width, 200)
+        self.assertListEqual(effects, ['edit_effect', 'resize_effect'])
+        self.assertEqual(last.get()[0].width, 300)
+        self.assertRaises(yawf.exceptions.MessageValidationError, failed.get)
+
+        self.assertItemsEqual(
+            Window.objects.values_list('width', flat=True),
+            [200, 500, 300])
+
+        # writes of message failed after saving are rolled back too
+        def fail_after_save(sender, **kwargs):
+            if kwargs['new_instance'].id == windows[1].id:
+                raise RuntimeError('Failed after save')
+
+        transition_handled.connect(fail_after_save)
+        try:
+            with GroupCommitExecutor() as executor:
+                executor.submit(window, self.sender, 'edit__resize',
+                    dict(width=250, height=400))
+                failed = executor.submit(windows[1], self.sender,
+                    'edit__resize', dict(width=250, height=400))
+        finally:
+            transition_handled.disconnect(fail_after_save)
+
+        self.assertRaises(RuntimeError, failed.get)
+        self.assertItemsEqual(
+            Window.objects.values_list('width', flat=True),
+            [250, 500, 300])
+
+    def test_mailbox_rollback(self):
+        window = yawf.creation.create('simple', self.sender,
+            {'title': 'Main window', 'width': 500, 'height': 300})
+        window, _, _ = yawf.creation.start_workflow(window, self.sender)
+        log_count = MessageLog.objects.count()
+
+        minimize = mailbox.post(window, self.sender, 'minimize')
+        failed = mailbox.post(window, self.sender, 'edit__resize',
+            dict(width=200, height=400))
+
+        # writes of message failed after saving are rolled back
+        def fail_after_save(sender, **kwargs):
+            if kwargs['message'].id == 'edit__resize':
+                raise RuntimeError('Failed after save')
+
+        transition_handled.connect(fail_after_save)
+        try:
+            self.assertEqual(mailbox.process_pending(), 2)
+        finally:
+            transition_handled.disconnect(fail_after_save)
+
+        self.assertRaises(yawf.exceptions.MailboxMessageFailedError,
+            failed.wait, timeout=0)
+        self.assertEqual(minimize.wait(timeout=0).new_state,
+            WINDOW_OPEN_STATUS.MINIMIZED)
+        window = Window.objects.get(id=window.id)
+        self.assertEqual(window.width, 500)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.MINIMIZED)
+        self.assertListEqual(
+            [r.message for r in MessageLog.objects.all()[log_count:]],
+            ['minimize'])
+
+    def test_bulk_view(self):
+        windows = []
+        for _i in range(2):
+            window = yawf.creation.create('simple', self.sender,
+                {'title': 'Main window', 'width': 500, 'height': 300})
+            windows.append(
+                yawf.creation.start_workflow(window, self.sender)[0])
+
+        def post(url, items):
+            response = self.client.post(url, json.dumps(items),
+                content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.content)
+
+        items = [
+            {'object_id': windows[0].id, 'message_id': 'edit__resize',
+             'params': {'width': 200, 'height': 100}},
+            {'object_id': windows[1].id, 'message_id': 'edit__resize',
+             'params': {'width': 0, 'height': 100}},
+            {'object_id': 0, 'message_id': 'minimize'},
+        ]
+
+        results = post('/simple/window/bulk/atomic/', items)
+        self.assertEqual(results[2]['code'], 'object_not_found')
+        self.assertEqual(results[0]['code'], 'group_rolled_back_error')
+
+        results = post('/simple/window/bulk/atomic/', items[:2])
+        self.assertEqual(results[0]['code'], 'group_rolled_back_error')
+        self.assertEqual(results[1]['code'], 'yawf_validation_error')
+        self.assertEqual(Window.objects.get(id=windows[0].id).width, 500)
+
+        results = post('/simple/window/bulk/', items)
+        self.assertEqual(results[0],
+            {'status': 'ok', 'state': WINDOW_OPEN_STATUS.NORMAL})
+        self.assertEqual(results[1]['code'], 'yawf_validation_error')
+        self.assertIn('width', results[1]['context'])
+        self.assertEqual(results[2]['code'], 'object_not_found')
+        self.assertEqual(Window.objects.get(id=windows[0].id).width, 200)
+
+        response = self.client.post('/simple/window/bulk/', '{}',
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        for object_id, message_id in (('abc', 'minimize'), ({}, 'minimize'),
+                                      ([1], 'minimize'), (None, 'minimize'),
+                                      (windows[0].id, ['minimize'])):
+            response = self.client.post('/simple/window/bulk/',
+                json.dumps([{'object_id': object_id,
+                             'message_id': message_id}]),
+                content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class SimulationTest(TestCase):
+
+    sender = '__sender__'
+
+    def test_simulation(self):
+        store = InMemoryStore()
+        window = Window(title='Main window', width=500, height=300)
+        window.workflow_type = 'simple'
+
+        window, _, _ = yawf.dispatch.dispatch(window, self.sender,
+            'start_workflow', store=store)
+        self.assertEqual(window.open_status, WINDOW_OPEN_STATUS.NORMAL)
+        self.assertIsNotNone(window.pk)
+        self.assertEqual(window.revision, 1)
+
+        resized_window, _, effects = yawf.dispatch.dispatch(window,
+            self.sender, 'edit__resize', dict(width=200, height=400),
+            store=store, need_lock_object=True)
+        self.assertListEqual(effects, ['edit_effect', 'resize_effect'])
+        self.assertEqual(resized_window.width, 200)
+        self.assertEqual(store.get(Window, window.pk).width, 200)
+        self.assertEqual(store.get(Window, window.pk).revision, 2)
+
+        # stale object is detected as in database
+        self.assertRaises(yawf.exceptions.ConcurrentRevisionUpdate,
+            yawf.dispatch.dispatch, window, self.sender, 'minimize',
+            store=store, need_lock_object=True)
+
+        self.assertEqual(len(store.message_log), 2)
+        self.assertFalse(Window.objects.exists())
+
+    def test_adispatch(self):
+        store = InMemoryStore()
+        windows = []
+        for _i in range(10):
+            window = Window(title='Window', width=1, height=1)
+            window.workflow_type = 'simple'
+            window.open_status = WINDOW_OPEN_STATUS.NORMAL
+            windows.append(store.add(window))
+
+        results = [
+            adispatch(window, self.sender, 'edit__resize',
+                dict(width=i + 1, height=1), store=store)
+            for i, window in enumerate(windows)]
+
+        for i, result in enumerate(results):
+            window, _, effects = result.get(timeout=5)
+            self.assertEqual(window.width, i + 1)
+            self.assertListEqual(effects, ['edit_effect', 'resize_effect'])
+
+        failed = adispatch(windows[0], self.sender, 'edit__resize',
+            dict(width=0, height=1), store=store)
+        self.assertRaises(yawf.exceptions.MessageValidationError,
+            failed.get, timeout=5)
+
+    def test_random_walk(self):
+        workflow = yawf.get_workflow('simple')
+        report = random_walk(workflow, steps=200, seed=1, sender=self.sender)
+        self.assertEqual(report.steps, 200)
+        self.assertTrue(report.transitions > 0)
+        self.assertListEqual(report.errors, [])
+        self.assertIn(('init', 'start_workflow'), report.visited_handler_keys)
+        # group keys can't be visited
+        self.assertIn(('normal', 'edit__resize'), report.handler_keys)
+        self.assertNotIn(('normal', 'edit'), report.handler_keys)
+
+        same_report = random_walk(workflow, steps=200, seed=1,
+            sender=self.sender)
+        self.assertEqual(report.transitions, same_report.transitions)
+        self.assertEqual(report.visited_effect_keys,
+            same_report.visited_effect_keys)
+
+
 def which(name):
     """Searches for name in exec path and returns full path (from pygraphviz)"""
     import os
@@ -245,6 +905,87 @@ class BuiltinViewTest(TestCase):
         response = self.client.get('/describe/some_nonexist_workflow/')
         self.assertEqual(response.status_code, 404)
 
+    def test_describe_json(self):
+        response = self.client.get('/describe/simple/json/')
+        self.assertEqual(response.status_code, 200)
+        description = json.loads(response.content)
+        self.assertEqual(description['id'], 'simple')
+        self.assertIn({'state_from': 'normal', 'message_id': 'minimize',
+                       'handler': 'ToMinimized', 'state_to': 'minimized',
+                       'states_to': ['minimized']},
+                      description['handlers'])
+        self.assertEqual(description['resources'][0]['id'], 'geometry')
+
+        # declared target state is described even if it isn't static
+        workflow = yawf.get_workflow('simple')
+        handler, = workflow.library.get_handlers_index_for_message(
+            'minimize')['normal']
+        self.addCleanup(setattr, handler, 'permission_checker',
+                        handler.permission_checker)
+        handler.permission_checker = C(lambda obj, sender: False)
+        self.assertIsNone(handler.static_state_to)
+        self.assertIn({'state_from': 'normal', 'message_id': 'minimize',
+                       'handler': 'ToMinimized', 'state_to': 'minimized',
+                       'states_to': ['minimized']},
+                      build_description(workflow)['handlers'])
+
+        self.assertEqual(
+            self.client.get('/describe/simple/json/',
+                HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            304)
+        self.assertEqual(
+            self.client.get('/describe/some_nonexist_workflow/json/')
+                .status_code,
+            404)
+
+    def test_graph_dot(self):
+        workflow = yawf.get_workflow('simple')
+        dot = get_graph_dot(workflow, 'handlers')
+        self.assertIn('"normal" -> "minimized" [label="minimize", '
+                      'style="solid"];', dot)
+        self.assertIs(get_graph_dot(workflow, 'handlers'), dot)
+
+        response = self.client.get(
+            '/describe/simple/graph/effects/?format=dot')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content,
+            get_graph_dot(workflow, 'effects'))
+
+        # rendered graphs are read from cache directory
+        cache_dir = tempfile.mkdtemp()
+        try:
+            digest = hashlib.md5(dot).hexdigest()
+            with open(os.path.join(cache_dir, digest + '.png'), 'wb') as f:
+                f.write('png')
+            self.assertEqual(
+                render_graph(workflow, 'handlers', cache_dir=cache_dir),
+                'png')
+
+            # rendered files are readable by other users
+            path = os.path.join(cache_dir, 'graph.svg')
+            umask = os.umask(022)
+            try:
+                yawf.graph._write_file(path, 'svg')
+            finally:
+                os.umask(umask)
+            self.assertEqual(os.stat(path).st_mode & 0777, 0644)
+            self.assertItemsEqual(os.listdir(cache_dir),
+                                  [digest + '.png', 'graph.svg'])
+        finally:
+            shutil.rmtree(cache_dir)
+
+        # throwaway workflow, registration in global one would leak
+        class GraphWorkflow(object):
+            id = 'graph_test'
+            _valid_states = set(['init'])
+            library = Library()
+
+        dot = get_graph_dot(GraphWorkflow, 'handlers')
+        version = GraphWorkflow.library.version
+        GraphWorkflow.library.message(MessageSpec(id='graph_test'))
+        self.assertEqual(GraphWorkflow.library.version, version + 1)
+        self.assertIsNot(get_graph_dot(GraphWorkflow, 'handlers'), dot)
+
     @skipIf(which('dot') is None,
             "graphviz is not installed")
     def test_handlers_graph(self):
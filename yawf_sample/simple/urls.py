@@ -3,4 +3,9 @@ from django.conf.urls import patterns, include, url
 urlpatterns = patterns('simple.views',
     url(r'^window/(?P<pk>\d+)/resize/$', 'window_resize'),
     url(r'^window/(?P<pk>\d+)/maximize/$', 'window_maximize'),
+    url(r'^window/(?P<pk>\d+)/allowed/$', 'window_allowed'),
+    url(r'^window/bulk/$', 'window_bulk'),
+    url(r'^window/bulk/atomic/$', 'window_bulk_atomic'),
+    url(r'^window/(?P<pk>\d+)/resources/(?P<resource_id>\w+)/$',
+        'window_resource'),
 )
@@ -1,7 +1,8 @@
 # Create your views here.
 from django import http
 
-from yawf.views import YawfMessageView, HandlerViewMixin
+from yawf.views import YawfMessageView, HandlerViewMixin, AllowedView,\
+        ResourceView, BulkMessageView
 
 from yawf_sample.simple.models import Window
 
@@ -33,3 +34,7 @@ class ToMaximizedView(HandlerViewMixin, YawfMessageView):
 
 window_resize = ResizeView.as_view()
 window_maximize = ToMaximizedView.as_view()
+window_allowed = AllowedView.as_view(model=Window)
+window_resource = ResourceView.as_view(model=Window)
+window_bulk = BulkMessageView.as_view(model=Window)
+window_bulk_atomic = BulkMessageView.as_view(model=Window, atomic=True)
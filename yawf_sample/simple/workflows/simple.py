@@ -1,7 +1,11 @@
+import datetime
+
 from django import forms
+from django import http
 
 from yawf.creation import CreationAwareWorkflow
 from yawf.messages.common import message_spec_fabric, BasicStartMessage, MessageSpec
+from yawf.messages.coalesce import DROP_DUPLICATES
 from yawf.messages.submessage import Submessage, RecursiveSubmessage
 
 from yawf.effects import SideEffect
@@ -21,6 +25,9 @@ class SimpleWorkflow(CreationAwareWorkflow):
     registrants = (
         'yawf_sample.simple.views',
     )
+    timeouts = {
+        WINDOW_OPEN_STATUS.MINIMIZED: (datetime.timedelta(days=1), 'to_normal'),
+    }
 
 simple_workflow = SimpleWorkflow()
 
@@ -48,8 +55,10 @@ class ResizeMessage(MessageSpec):
         return {'edit_fields': params}
 
 
-simple_workflow.register_message(MessageSpec(id='minimize', verb='Minimize window'))
+simple_workflow.register_message(MessageSpec(id='minimize', verb='Minimize window',
+    coalesce=DROP_DUPLICATES))
 simple_workflow.register_message(MessageSpec(id='maximize'))
+simple_workflow.register_message(MessageSpec(id='to_normal', verb='Restore window'))
 simple_workflow.register_message(message_spec_fabric(id='minimize_all'))
 simple_workflow.register_message(BasicStartMessage)
 
@@ -83,6 +92,27 @@ class MinimizeAll(ComplexStateTransition):
 def to_normal(obj, sender):
     return 'normal'
 
+def hit_test(width, height, pos_x, pos_y):
+    '''
+    Compute step of Click handler, runs in process pool.
+    '''
+    if not (0 <= pos_x < width and 0 <= pos_y < height):
+        return 'outside'
+    return 'title' if pos_y < 20 else 'body'
+
+@simple_workflow.register_handler
+class Click(ComplexStateTransition):
+
+    message_id = 'click'
+    states_from = ['normal', 'maximized']
+    compute = staticmethod(hit_test)
+
+    def get_compute_args(self, obj, sender, pos_x, pos_y):
+        return (obj.width, obj.height, pos_x, pos_y)
+
+    def transition(self, obj, sender, computed, **kwargs):
+        return computed
+
 @simple_workflow.register_handler
 class Edit(Handler):
 
@@ -110,4 +140,9 @@ class SignalizeResize(SideEffect):
     def perform(self, **kwargs):
         return 'resize_effect'
 
+
+@simple_workflow.register_resource('geometry', description='Window geometry')
+def geometry(request, obj, sender):
+    return http.HttpResponse('%dx%d' % (obj.width, obj.height))
+
 #simple_workflow._clean_deferred_chain()
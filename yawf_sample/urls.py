@@ -11,6 +11,8 @@ urlpatterns = patterns('',
     url(r'^simple/', include('simple.urls')),
     url(r'^describe/(?P<workflow_id>\w+)/$', 'yawf.views.describe_workflow',
         name='describe'),
+    url(r'^describe/(?P<workflow_id>\w+)/json/$',
+        'yawf.views.describe_workflow_json'),
     url(r'^describe/(?P<workflow_id>\w+)/graph/handlers/$',
         'yawf.graph_views.handlers_graph'),
     url(r'^describe/(?P<workflow_id>\w+)/graph/effects/$',